@@ -0,0 +1,87 @@
+"""
+Sync-session-in-threadpool vs AsyncSession under concurrent point lookups.
+
+The "sync" mode reproduces the old request path: every lookup runs a sync
+Session on AnyIO's worker threads (40 by default, the same limiter Starlette
+uses for `def` endpoints). The "async" mode uses the async engine from
+config/db.py. Set BENCH_DB_LATENCY_MS on Postgres to add a pg_sleep per query
+and emulate network/DB latency, which is where the thread limit shows up.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_db_concurrency.py --concurrency 200 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import anyio.to_thread
+from sqlalchemy import text
+from sqlmodel import Session, select
+from config.db import get_sync_engine, async_session_maker, async_engine
+from models.users import User
+
+LATENCY_MS = float(os.getenv("BENCH_DB_LATENCY_MS", "0"))
+engine = get_sync_engine()
+IS_POSTGRES = engine.dialect.name == "postgresql"
+
+
+def _sync_lookup(user_id):
+    with Session(engine) as session:
+        if LATENCY_MS and IS_POSTGRES:
+            session.exec(text(f"SELECT pg_sleep({LATENCY_MS / 1000})"))
+        return session.exec(select(User).where(User.id == user_id)).first()
+
+
+async def sync_lookup(user_id):
+    return await anyio.to_thread.run_sync(_sync_lookup, user_id)
+
+
+async def async_lookup(user_id):
+    async with async_session_maker() as session:
+        if LATENCY_MS and IS_POSTGRES:
+            await session.exec(text(f"SELECT pg_sleep({LATENCY_MS / 1000})"))
+        return (await session.exec(select(User).where(User.id == user_id))).first()
+
+
+async def run(lookup, total, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with sem:
+            start = time.perf_counter()
+            await lookup((i % 100) + 1)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, lookup in (("sync+threadpool", sync_lookup), ("async", async_lookup)):
+        await lookup(1)  # warm up the pools
+        print(name, await run(lookup, args.requests, args.concurrency))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
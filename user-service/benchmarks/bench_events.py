@@ -0,0 +1,160 @@
+"""
+Throughput of the user event outbox and feed (services/user_events.py).
+
+    python benchmarks/bench_events.py --events 50000 --json events.json
+    DATABASE_URL=postgresql://... python benchmarks/bench_events.py --producers 20
+
+Phases, on a scratch database (the user_event table is emptied first):
+
+- produce:  --producers concurrent writers, one event per committed transaction
+- relay:    numbering the resulting backlog (events/s)
+- consume:  reading the whole feed in pages of --page, serialised as served
+- latency:  commit (followed by relay.wake(), as the services do) ->
+            delivered to a long-polling reader in the same worker
+- compact:  compacting the log down to one event per user
+
+Throughputs are reported as throughput_rps (events or commits per second),
+so compare.py can diff two --json runs.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'user_service_events_bench.db')}")
+
+from sqlalchemy import delete
+from config.db import async_engine, async_session_maker, init_db
+from models.user_event import UserEvent
+from services.user_events import (
+    SNAPSHOT_FIELDS, USER_EVENTS_RELAY_SECONDS, EventRelay, dump_event_page, read_events, record_events,
+)
+from results import summarize, write_results
+
+USERS = 1000
+
+
+def snapshot(user_id):
+    values = {
+        "id": user_id, "username": f"user{user_id}", "token_version": 0, "name": "Bench User", "country": "RW",
+        "profile_photo_url": None, "role": "user", "status": "active", "creator_application_status": "none",
+        "email_verified": True, "updated_at": datetime.utcnow(),
+    }
+    return tuple(values[f] for f in SNAPSHOT_FIELDS)
+
+
+async def produce(total, producers):
+    latencies = []
+
+    async def producer(n, offset):
+        for i in range(n):
+            start = time.perf_counter()
+            async with async_session_maker() as db:
+                await record_events(db, "profile_updated", [snapshot((offset + i) % USERS + 1)])
+                await db.commit()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    per = total // producers
+    start = time.perf_counter()
+    await asyncio.gather(*(producer(per, p * per) for p in range(producers)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+async def relay_backlog(relay):
+    start = time.perf_counter()
+    total = 0
+    while True:
+        n = await relay.relay()
+        total += n
+        if n == 0:
+            break
+    elapsed = time.perf_counter() - start
+    return {"events": total, "seconds": round(elapsed, 3), "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0}
+
+
+async def consume(page):
+    after, total, size, pages = 0, 0, 0, 0
+    start = time.perf_counter()
+    while True:
+        rows = await read_events(after, page)
+        if not rows:
+            break
+        size += len(dump_event_page(rows, after, 0))
+        after = rows[-1].seq
+        total += len(rows)
+        pages += 1
+    elapsed = time.perf_counter() - start
+    return {
+        "events": total, "pages": pages, "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "mb_per_s": round(size / elapsed / 1e6, 2) if elapsed else 0.0,
+    }
+
+
+async def end_to_end(relay, samples):
+    """One producer commits an event, one reader long-polls for it; returns delivery latencies."""
+    after = relay.head
+    await relay.start()
+    latencies = []
+    try:
+        for i in range(samples):
+            async with async_session_maker() as db:
+                await record_events(db, "profile_updated", [snapshot(i % USERS + 1)])
+                await db.commit()
+            relay.wake()
+            committed = time.perf_counter()
+            rows = []
+            while not rows:
+                await relay.wait(after, 5)
+                rows = await read_events(after, 100)
+            latencies.append((time.perf_counter() - committed) * 1000)
+            after = rows[-1].seq
+    finally:
+        await relay.stop()
+    return summarize(latencies, sum(latencies) / 1000)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--producers", type=int, default=10)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--latency-samples", type=int, default=50)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    init_db()
+    async with async_session_maker() as db:
+        await db.exec(delete(UserEvent))
+        await db.commit()
+
+    relay = EventRelay()
+    results = {}
+    results["produce"] = await produce(args.events, args.producers)
+    r = results["produce"]
+    print(f"produce   {r['requests']} commits  {r['throughput_rps']:9.1f}/s  p50 {r['p50_ms']:.2f}  p99 {r['p99_ms']:.2f} ms")
+    results["relay"] = await relay_backlog(relay)
+    print(f"relay     {results['relay']['events']} events  {results['relay']['throughput_rps']:9.1f}/s")
+    results["consume"] = await consume(args.page)
+    r = results["consume"]
+    print(f"consume   {r['events']} events  {r['throughput_rps']:9.1f}/s  {r['mb_per_s']} MB/s")
+    results["latency"] = await end_to_end(relay, args.latency_samples)
+    r = results["latency"]
+    print(f"latency   p50 {r['p50_ms']:.1f}  p95 {r['p95_ms']:.1f}  p99 {r['p99_ms']:.1f} ms (relay every {USER_EVENTS_RELAY_SECONDS}s)")
+    start = time.perf_counter()
+    compacted = await relay.compact(older_than=timedelta(0))
+    results["compact"] = {"deleted": compacted, "seconds": round(time.perf_counter() - start, 3)}
+    print(f"compact   {compacted} events removed in {results['compact']['seconds']}s")
+
+    if args.json:
+        write_results(args.json, "load", {"events": args.events, "producers": args.producers, "page": args.page,
+                                          "database": async_engine.dialect.name}, results)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""
+Outbox dispatcher throughput/latency against the local SMTP sink.
+
+Compares the old behaviour (one SMTP connection per message, sent inline)
+with the dispatcher draining the outbox over pooled connections.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/bench_mail.py --messages 500
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import statistics
+import sys
+import time
+
+SINK_PORT = int(os.getenv("BENCH_SMTP_PORT", "8025"))
+os.environ.update({"SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(SINK_PORT), "SMTP_SSL": "false",
+                   "GMAIL_USER": "", "MAIL_FROM": "bench@competa.local"})
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlmodel import SQLModel, select
+from config.db import get_sync_engine, async_engine, async_session_maker
+from models.email_outbox import EmailOutbox, EmailStatus
+from services.mail_service import MailDispatcher, queue_email
+from utils.email import build_message
+from smtp_sink import start_sink
+
+
+def per_message_connections(n):
+    start = time.perf_counter()
+    for i in range(n):
+        with smtplib.SMTP("127.0.0.1", SINK_PORT) as smtp:
+            smtp.send_message(build_message(f"user{i}@bench.local", "bench", "hello"))
+    return time.perf_counter() - start
+
+
+async def outbox(n, workers, batch_size):
+    async with async_session_maker() as db:
+        for i in range(n):
+            await queue_email(db, f"user{i}@bench.local", "bench", f"hello {i}")
+        await db.commit()
+
+    dispatcher = MailDispatcher(workers=workers, batch_size=batch_size)
+    start = time.perf_counter()
+    await asyncio.gather(*(dispatcher.drain() for _ in range(workers)))
+    elapsed = time.perf_counter() - start
+
+    async with async_session_maker() as db:
+        rows = (await db.exec(select(EmailOutbox).where(EmailOutbox.status == EmailStatus.sent))).all()
+    latencies = sorted((r.sent_at - r.created_at).total_seconds() * 1000 for r in rows)
+    return elapsed, latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = get_sync_engine()
+    SQLModel.metadata.drop_all(engine, tables=[EmailOutbox.__table__])
+    SQLModel.metadata.create_all(engine, tables=[EmailOutbox.__table__])
+    controller, handler = start_sink(SINK_PORT)
+    try:
+        elapsed = per_message_connections(args.messages)
+        print(f"per-message connection: {args.messages / elapsed:.1f} msg/s, {handler.connections} connections")
+
+        handler.connections = 0
+        elapsed, latencies = await outbox(args.messages, args.workers, args.batch_size)
+        print(
+            f"outbox dispatcher: {args.messages / elapsed:.1f} msg/s, {handler.connections} connections, "
+            f"enqueue->sent p50 {statistics.median(latencies):.1f} ms, p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms"
+        )
+    finally:
+        controller.stop()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
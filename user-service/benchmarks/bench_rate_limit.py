@@ -0,0 +1,80 @@
+"""
+Cost of one rate-limit check per counter store, and (for shm) coherence
+across processes.
+
+    python benchmarks/bench_rate_limit.py --iterations 20000
+    DATABASE_URL=postgresql://... python benchmarks/bench_rate_limit.py --postgres
+
+The shm run forks --processes workers that hammer one key with a limit of
+--limit; exactly --limit checks should be admitted in total.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from rate_limiting import MemoryStorage, PostgresStorage, RateLimiter, SharedMemoryStorage
+
+
+async def per_check_us(limiter, iterations, keys):
+    start = time.perf_counter()
+    for i in range(iterations):
+        await limiter.check(f"bench:ip:10.0.{i % keys // 256}.{i % 256}", 1_000_000, 60)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def _shm_worker(path, checks, limit, results):
+    limiter = RateLimiter(SharedMemoryStorage(path))
+
+    async def run():
+        allowed = 0
+        for _ in range(checks):
+            if not await limiter.check("bench:shared", limit, 3600):
+                allowed += 1
+        return allowed
+
+    results.put(asyncio.run(run()))
+
+
+def shm_coherence(processes, checks, limit):
+    path = os.path.join(tempfile.mkdtemp(), "ratelimit")
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_shm_worker, args=(path, checks, limit, results)) for _ in range(processes)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sum(results.get() for _ in workers)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=5000)
+    parser.add_argument("--postgres", action="store_true", help="also benchmark the Postgres store (uses DATABASE_URL)")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    stores = [("memory", MemoryStorage()), ("shm", SharedMemoryStorage(os.path.join(tempfile.mkdtemp(), "ratelimit")))]
+    if args.postgres:
+        from config.db import init_db
+        init_db()
+        stores.append(("postgres", PostgresStorage()))
+
+    for name, storage in stores:
+        iterations = args.iterations if name != "postgres" else min(args.iterations, 2000)
+        us = await per_check_us(RateLimiter(storage), iterations, args.keys)
+        print(f"{name:8} {us:10.1f} us/check  ({iterations} checks over {args.keys} keys)")
+
+    allowed = shm_coherence(args.processes, args.limit, args.limit)
+    print(f"shm coherence: {args.processes} processes x {args.limit} checks, limit {args.limit} -> {allowed} admitted")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
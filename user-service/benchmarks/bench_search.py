@@ -0,0 +1,141 @@
+"""
+User search latency on a large synthetic table.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_search.py --rows 1000000 --json search.json
+    DATABASE_URL=postgresql://... python benchmarks/bench_search.py --explain     # show plans
+
+Fills the user table with --rows synthetic users (skipped when it already
+holds that many), applies migrations, then times each mode for a set of
+query lengths, following --pages pages of keyset continuation per query.
+Use a scratch database: rows are inserted into the real "user" table.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import func, insert, text
+from sqlmodel import select
+from config.db import async_engine, async_session_maker, init_db
+from models.users import User
+from services.search_service import IS_POSTGRES, search_users
+from results import summarize, write_results
+
+SYLLABLES = ["ka", "mi", "ro", "tsu", "an", "el", "li", "na", "jo", "be", "ti", "sa", "mu", "de", "ri", "yo", "ga", "ne", "zu", "lo"]
+COUNTRIES = ["RW", "KE", "UG", "TZ", "NG", "GH", "ZA", "US", "FR", "DE", "IN", "BR"]
+INSERT_CHUNK = 5000
+
+
+def synthetic_user(rng, i, now):
+    first = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    last = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+    return {
+        "username": f"{first}{last}_{i}", "email": f"user{i}@bench.example.com",
+        "name": f"{first.title()} {last.title()}", "country": rng.choice(COUNTRIES), "gender": "other",
+        "password": "x", "role": "user", "creator_application_status": "none", "status": "active",
+        "email_verified": True, "token_version": 0,
+        "created_at": now - timedelta(seconds=i), "updated_at": now,
+    }
+
+
+async def populate(rows):
+    async with async_session_maker() as db:
+        existing = (await db.exec(select(func.count()).select_from(User))).one()
+    if existing >= rows:
+        print(f"user table already has {existing} rows")
+        return
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    async with async_engine.begin() as conn:
+        for base in range(existing, rows, INSERT_CHUNK):
+            batch = [synthetic_user(rng, i, now) for i in range(base, min(rows, base + INSERT_CHUNK))]
+            await conn.execute(insert(User), batch)
+        if IS_POSTGRES:
+            await conn.execute(text('ANALYZE "user"'))
+    print(f"inserted {rows - existing} users in {time.perf_counter() - start:.1f}s")
+
+
+def queries():
+    rng = random.Random(7)
+    out = []
+    for length in (1, 2, 3, 4):
+        for _ in range(10):
+            q = "".join(rng.choice(SYLLABLES) for _ in range(3))[:length]
+            out.append(("prefix", q))
+    for _ in range(10):
+        q = "".join(rng.choice(SYLLABLES) for _ in range(2))
+        out.append(("contains", q[:4]))
+        # A typo: drop one character of a plausible name fragment
+        word = "".join(rng.choice(SYLLABLES) for _ in range(3))
+        cut = rng.randrange(len(word))
+        out.append(("fuzzy", word[:cut] + word[cut + 1:]))
+    return [(m, q) for m, q in out if m == "prefix" or len(q) >= 3]
+
+
+async def explain(mode, q):
+    from sqlalchemy.dialects import postgresql
+    captured = {}
+
+    class Capture:
+        async def exec(self, stmt):
+            captured["stmt"] = stmt
+            raise StopAsyncIteration
+
+    try:
+        await search_users(Capture(), q, mode, 10)
+    except StopAsyncIteration:
+        pass
+    sql = str(captured["stmt"].compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+    async with async_engine.connect() as conn:
+        plan = (await conn.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql))).scalars().all()
+    print(f"--- {mode} {q!r}")
+    print("\n".join(plan))
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=3, help="pages followed per query via the cursor")
+    parser.add_argument("--explain", action="store_true", help="print EXPLAIN ANALYZE for one query per mode (Postgres)")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    init_db()
+    await populate(args.rows)
+
+    latencies = {}
+    async with async_session_maker() as db:
+        for mode, q in queries():
+            cursor = None
+            for page in range(args.pages):
+                start = time.perf_counter()
+                rows, cursor = await search_users(db, q, mode, args.limit, cursor)
+                latencies.setdefault(f"{mode} len={len(q)}" if mode == "prefix" else mode, []).append((time.perf_counter() - start) * 1000)
+                if cursor is None:
+                    break
+
+    results = {}
+    for name, values in latencies.items():
+        results[name] = summarize(values, sum(values) / 1000)
+        r = results[name]
+        print(f"{name:14} {r['requests']:4d} pages  p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms")
+
+    if args.explain and IS_POSTGRES:
+        for mode, q in (("prefix", "ka"), ("contains", "mir"), ("fuzzy", "kamro")):
+            await explain(mode, q)
+
+    if args.json:
+        write_results(args.json, "load", {"rows": args.rows, "limit": args.limit, "pages": args.pages,
+                                          "database": async_engine.dialect.name}, results)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
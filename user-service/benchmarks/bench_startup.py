@@ -0,0 +1,99 @@
+"""
+Cold-start cost of one worker: `import main` plus the startup hooks, each
+measured in a fresh interpreter, and for comparison what the old per-boot
+create_all() cost against the same database.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --top 15     # also list the slowest imports
+
+Migrations are applied once up front, as a deploy would.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+CHILD = """
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def boot():
+    await main.app.router.startup()
+    t2 = time.perf_counter()
+    await main.app.router.shutdown()
+    return t2
+
+t2 = asyncio.run(boot())
+from sqlmodel import SQLModel
+from config.db import get_sync_engine
+engine = get_sync_engine()
+with engine.connect():
+    pass
+t3 = time.perf_counter()
+SQLModel.metadata.create_all(engine)
+t4 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "startup_ms": (t2 - t1) * 1000, "create_all_ms": (t4 - t3) * 1000}))
+"""
+
+
+def child_env():
+    env = dict(os.environ)
+    env.setdefault("MAIL_DISPATCHER_ENABLED", "false")
+    env["DB_AUTO_MIGRATE"] = "false"
+    return env
+
+
+def top_imports(n):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in out.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    # Top-level packages only, so nested modules are not double counted
+    rows = [r for r in rows if "." not in r[1]]
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=0, help="list the N slowest top-level imports")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    subprocess.run([sys.executable, "-m", "migrations", "upgrade"], cwd=ROOT, env=child_env(), check=True, capture_output=True)
+
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    results = {}
+    for key in ("import_ms", "startup_ms", "create_all_ms"):
+        values = [s[key] for s in samples]
+        results[key] = {"median": round(statistics.median(values), 1), "max": round(max(values), 1)}
+        print(f"{key:14} median {results[key]['median']:8.1f} ms   max {results[key]['max']:8.1f} ms")
+
+    if args.top:
+        results["top_imports_ms"] = {}
+        for us, name in top_imports(args.top):
+            results["top_imports_ms"][name] = round(us / 1000, 1)
+            print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
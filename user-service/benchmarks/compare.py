@@ -0,0 +1,57 @@
+"""
+Compares two result files from load_test.py or micro.py and exits non-zero
+when any metric regressed by more than --threshold.
+
+    python benchmarks/compare.py baseline.json current.json --threshold 0.15
+
+Load results compare p95 latency and throughput per endpoint; micro
+results compare cost per call.
+"""
+import argparse
+import json
+import sys
+
+# metric -> True when a larger value is worse
+METRICS = {
+    "load": {"p95_ms": True, "throughput_rps": False},
+    "micro": {"us_per_call": True},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative change (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline["kind"] != current["kind"]:
+        sys.exit(f"cannot compare {baseline['kind']} results with {current['kind']} results")
+
+    print(f"baseline {baseline.get('git_revision')} ({baseline['timestamp']})  ->  current {current.get('git_revision')} ({current['timestamp']})")
+    regressions = 0
+    for name, before in baseline["results"].items():
+        after = current["results"].get(name)
+        if after is None:
+            print(f"{name:32} missing from current results")
+            continue
+        for metric, higher_is_worse in METRICS[baseline["kind"]].items():
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > args.threshold if higher_is_worse else change < -args.threshold
+            regressions += worse
+            flag = "REGRESSION" if worse else ""
+            print(f"{name:32} {metric:15} {old:12.2f} -> {new:12.2f}  {change:+7.1%}  {flag}")
+    if regressions:
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
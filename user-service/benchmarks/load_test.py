@@ -0,0 +1,219 @@
+"""
+End-to-end load test: drives the user journey endpoint by endpoint at a fixed
+concurrency and reports p50/p95/p99 latency and throughput for each.
+
+    python benchmarks/load_test.py --users 200 --concurrency 20 --json load.json
+    DATABASE_URL=postgresql://... python benchmarks/load_test.py --bcrypt-rounds 12
+
+By default the app runs in-process behind httpx's ASGI transport, offline:
+SMTP is stubbed by leaving the mail dispatcher off (OTPs are read back from
+the email_outbox table), avatars use local storage, rate limiting is off and
+migrations are applied on startup. With --base-url the same journey runs
+against a live server instead; DATABASE_URL must then point at its database
+so OTPs can be read and an admin promoted.
+
+Client and server share one event loop in-process, so absolute numbers
+include client overhead; compare runs made the same way (see compare.py).
+"""
+import argparse
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from results import summarize, write_results
+
+PASSWORD = "Bench-Pass1!"
+
+
+def configure_env(args):
+    # Must happen before the app modules read their settings
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'user_service_bench.db')}")
+    os.environ.setdefault("MAIL_DISPATCHER_ENABLED", "false")
+    os.environ.setdefault("AVATAR_STORAGE", "local")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("DB_AUTO_MIGRATE", "true")
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+
+
+async def run_phase(name, items, request, concurrency):
+    """Runs request(item) for every item with `concurrency` in flight; returns the summary."""
+    latencies, errors = [], 0
+    queue = list(reversed(items))
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            item = queue.pop()
+            start = time.perf_counter()
+            ok = await request(item)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = summarize(latencies, time.perf_counter() - start, errors)
+    print(f"{name:16} {summary['requests']:6d} req  {summary['throughput_rps']:8.1f} rps  "
+          f"p50 {summary['p50_ms']:8.2f}  p95 {summary['p95_ms']:8.2f}  p99 {summary['p99_ms']:8.2f} ms  errors {errors}")
+    return summary
+
+
+async def read_otps(emails):
+    from sqlmodel import select
+    from config.db import async_session_maker
+    from models.email_outbox import EmailOutbox
+    otps = {}
+    async with async_session_maker() as db:
+        rows = (await db.exec(
+            select(EmailOutbox.to_email, EmailOutbox.body)
+            .where(EmailOutbox.to_email.in_(emails))
+            .order_by(EmailOutbox.id)
+        )).all()
+    for email, body in rows:
+        match = re.search(r"\b(\d{6})\b", body)
+        if match:
+            otps[email] = match.group(1)
+    return otps
+
+
+async def promote_admin(username):
+    from sqlmodel import update
+    from config.db import async_session_maker
+    from models.users import User, UserRole
+    async with async_session_maker() as db:
+        await db.exec(update(User).where(User.username == username).values(role=UserRole.admin))
+        await db.commit()
+
+
+async def journey(client, args):
+    run_id = uuid.uuid4().hex[:6]
+    users = [f"b{run_id}_{i}" for i in range(args.users)]
+    email = lambda u: f"{u}@bench.example.com"
+    tokens, cookies = {}, {}
+    results = {}
+    c = args.concurrency
+
+    async def register(u):
+        r = await client.post("/api/auth/register", json={
+            "username": u, "email": email(u), "name": "Bench User",
+            "country": "RW", "gender": "other", "password": PASSWORD,
+        })
+        return r.status_code == 201
+    results["register"] = await run_phase("register", users, register, c)
+
+    otps = await read_otps([email(u) for u in users])
+
+    async def verify(u):
+        r = await client.post("/api/auth/verify-email", json={"username": u, "otp": otps.get(email(u), "000000")})
+        return r.status_code == 200
+    results["verify-email"] = await run_phase("verify-email", users, verify, c)
+
+    async def login(u):
+        r = await client.post("/api/auth/login", json={"username_or_email": u, "password": PASSWORD})
+        if r.status_code != 200:
+            return False
+        tokens[u] = r.json()["access_token"]
+        cookies[u] = r.cookies.get("refresh_token")
+        return True
+    results["login"] = await run_phase("login", users, login, c)
+
+    active = [u for u in users if u in tokens]
+    auth = lambda u: {"Authorization": f"Bearer {tokens[u]}"}
+
+    async def refresh(u):
+        r = await client.post("/api/auth/refresh-token", headers={"Cookie": f"refresh_token={cookies[u]}"})
+        if r.status_code != 200:
+            return False
+        tokens[u] = r.json()["access_token"]
+        # Refresh tokens rotate: the old one is spent now
+        cookies[u] = r.cookies.get("refresh_token")
+        return True
+    results["refresh-token"] = await run_phase("refresh-token", active, refresh, c)
+
+    repeated = active * args.repeat
+
+    async def validate(u):
+        return (await client.get("/api/token/validate-token", headers=auth(u))).status_code == 200
+    results["validate-token"] = await run_phase("validate-token", repeated, validate, c)
+
+    async def me(u):
+        return (await client.get("/api/auth/me", headers=auth(u))).status_code == 200
+    results["me"] = await run_phase("me", repeated, me, c)
+
+    async def profile(u):
+        return (await client.get(f"/api/auth/{u}")).status_code == 200
+    results["public-profile"] = await run_phase("public-profile", repeated, profile, c)
+
+    if active:
+        admin = active[0]
+        await promote_admin(admin)
+        await login(admin)
+        admin_calls = list(range(args.admin_requests))
+
+        async def admin_users(_):
+            r = await client.get("/api/admin/users", params={"limit": args.page_size}, headers=auth(admin))
+            return r.status_code == 200
+        results["admin-users"] = await run_phase("admin-users", admin_calls, admin_users, c)
+
+        async def admin_count(_):
+            return (await client.get("/api/admin/users/count", headers=auth(admin))).status_code == 200
+        results["admin-count"] = await run_phase("admin-count", admin_calls, admin_count, c)
+
+        async def admin_stats(_):
+            return (await client.get("/api/admin/stats", headers=auth(admin))).status_code == 200
+        results["admin-stats"] = await run_phase("admin-stats", admin_calls, admin_stats, c)
+
+        # Roster-style resolution of every test user per call (internal route; admins may call it)
+        roster = {"usernames": users}
+
+        async def internal_lookup(_):
+            return (await client.post("/api/internal/users/lookup", json=roster, headers=auth(admin))).status_code == 200
+        results["internal-lookup"] = await run_phase("internal-lookup", admin_calls, internal_lookup, c)
+
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5, help="requests per user for the read endpoints")
+    parser.add_argument("--admin-requests", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--bcrypt-rounds", type=int, default=0, help="override BCRYPT_ROUNDS (in-process only)")
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+    configure_env(args)
+
+    import httpx
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+            results = await journey(client, args)
+    else:
+        from main import app
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+                results = await journey(client, args)
+        finally:
+            await app.router.shutdown()
+
+    if args.json:
+        config = {k: v for k, v in vars(args).items() if k != "json"}
+        config["database"] = os.environ["DATABASE_URL"].split("://")[0]
+        config["bcrypt_rounds"] = os.getenv("BCRYPT_ROUNDS", "12")
+        write_results(args.json, "load", config, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Micro-benchmarks for the per-request building blocks: bcrypt hashing and
+verification, access-token encode/decode, an untraced tracing span, and
+response serialisation.
+
+    python benchmarks/micro.py --json micro.json
+    BCRYPT_ROUNDS=12 JWT_ALGORITHM=EdDSA python benchmarks/micro.py
+
+Serialisation cases time a 10k-row admin page and one /me payload two ways:
+the `response_model` path (build the models, let FastAPI validate, dump to
+JSON-able Python and json.dumps) and the fast path in utils/serialization.py,
+plus gzip of the page at RESPONSE_GZIP_LEVEL. Each reports cost per row.
+"""
+import argparse
+import json
+import os
+import sys
+import gzip
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# No queries are made; the engine just needs a URL that accepts pool settings
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'user_service_bench.db')}")
+os.environ.setdefault("SECRET_KEY", "bench-secret")
+
+from pydantic import TypeAdapter
+from models.users import User
+from schemas.user_schemas import PublicUserProfile, UserDetail, UserPage
+from services.admin_service import PUBLIC_USER_COLUMNS
+from utils.serialization import dump_user_detail, dump_user_page
+from utils.auth import create_access_token, decode_access_token
+from utils.password import BCRYPT_ROUNDS, hash_password, verify_password
+from utils.tracing import span
+from results import time_per_call_us, write_results
+
+ROWS = 10_000
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
+# Stand-in for the SQLAlchemy Row returned by the admin listing query
+ListingRow = namedtuple("ListingRow", [c.key for c in PUBLIC_USER_COLUMNS])
+
+
+def sample_user(i):
+    now = datetime.utcnow()
+    return User(
+        id=i, username=f"user_{i}", email=f"user_{i}@example.com", name="Sample User",
+        country="RW", gender="other", password="x", profile_photo_url=None,
+        email_verified=True, last_login=now, created_at=now, updated_at=now,
+    )
+
+
+def response_model_path(model_type, value):
+    """What FastAPI does with a response_model: validate, dump in JSON mode, json.dumps."""
+    adapter = TypeAdapter(model_type)
+    return lambda: json.dumps(adapter.dump_python(adapter.validate_python(value, from_attributes=True), mode="json"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hash-iterations", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+
+    def record(name, us, per_row=None):
+        results[name] = {"us_per_call": us}
+        line = f"{name:28} {us:12.1f} us/call"
+        if per_row:
+            results[name]["us_per_row"] = round(us / per_row, 3)
+            line += f"   {us / per_row:8.2f} us/row"
+        print(line)
+
+    hashed = hash_password("Bench-Pass1!")
+    record(f"hash_password(rounds={BCRYPT_ROUNDS})", time_per_call_us(lambda: hash_password("Bench-Pass1!"), args.hash_iterations, repeat=1))
+    record("verify_password", time_per_call_us(lambda: verify_password("Bench-Pass1!", hashed), args.hash_iterations, repeat=1))
+
+    claims = {"sub": "42", "username": "bench", "role": "user", "ver": 0}
+    token = create_access_token(claims)
+    record("create_access_token", time_per_call_us(lambda: create_access_token(claims), args.iterations))
+    record("decode_access_token", time_per_call_us(lambda: decode_access_token(token), args.iterations))
+
+    def untraced_span():
+        # What every instrumented stage pays when tracing and the profiler are off
+        with span("bench"):
+            pass
+    record("span (tracing off)", time_per_call_us(untraced_span, args.iterations * 10))
+
+    users = [sample_user(i) for i in range(ROWS)]
+    rows = [ListingRow(*(getattr(u, f) for f in ListingRow._fields)) for u in users]
+    adapter = TypeAdapter(UserPage)
+
+    def old_page():
+        # What the admin handlers did: rebuild every row, then FastAPI validates and dumps again
+        page = UserPage(items=[PublicUserProfile(**r._asdict()) for r in rows], next_cursor=None)
+        return json.dumps(adapter.dump_python(adapter.validate_python(page), mode="json"))
+
+    serial_iterations = max(1, args.iterations // 500)
+    record(f"UserPage x{ROWS} (response_model)", time_per_call_us(old_page, serial_iterations), ROWS)
+    record(f"UserPage x{ROWS} (fast path)", time_per_call_us(lambda: dump_user_page(rows, None), serial_iterations), ROWS)
+    body = dump_user_page(rows, None)
+    record(f"gzip level {GZIP_LEVEL} ({len(body) // 1024} KB)", time_per_call_us(lambda: gzip.compress(body, GZIP_LEVEL), serial_iterations), ROWS)
+    record("UserDetail /me (response_model)", time_per_call_us(response_model_path(UserDetail, users[0]), args.iterations))
+    record("UserDetail /me (fast path)", time_per_call_us(lambda: dump_user_detail(users[0]), args.iterations))
+
+    if args.json:
+        write_results(args.json, "micro", {"bcrypt_rounds": BCRYPT_ROUNDS, "rows": ROWS, "iterations": args.iterations}, results)
+
+
+if __name__ == "__main__":
+    main()
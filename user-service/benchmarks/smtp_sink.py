@@ -0,0 +1,53 @@
+"""
+Local SMTP stand-in that accepts and counts every message, so the mail
+dispatcher can be exercised offline. Point the service at it with
+
+    SMTP_HOST=127.0.0.1 SMTP_PORT=8025 SMTP_SSL=false
+
+and run it standalone with `python benchmarks/smtp_sink.py [port]`.
+"""
+import sys
+import threading
+import time
+from aiosmtpd.controller import Controller
+
+
+class SinkHandler:
+    def __init__(self, delay: float = 0.0):
+        # Optional per-message delay to mimic a slow relay
+        self.delay = delay
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.messages.append((envelope.rcpt_tos, envelope.content.decode("utf8", errors="replace")))
+        return "250 Message accepted for delivery"
+
+
+def start_sink(port: int = 8025, delay: float = 0.0):
+    handler = SinkHandler(delay)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller, handler
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8025
+    controller, handler = start_sink(port)
+    print(f"SMTP sink listening on 127.0.0.1:{port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"{len(handler.messages)} messages over {handler.connections} connections")
+    except KeyboardInterrupt:
+        controller.stop()
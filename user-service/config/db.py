@@ -1,18 +1,77 @@
 import os
-from sqlmodel import SQLModel, create_engine, Session
-from dotenv import load_dotenv
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from utils.metrics import db_pool_wait, register_engine
+from utils.tracing import instrument_engine
 
-load_dotenv()
+DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool settings for the async engine used by request handlers
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Apply pending migrations on startup instead of refusing to start (single-process dev only)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, echo=False)
+
+def to_async_url(url: str) -> str:
+    """Maps a sync driver URL (psycopg2/sqlite) onto its asyncio driver."""
+    if url.startswith("postgresql+asyncpg://") or url.startswith("sqlite+aiosqlite://"):
+        return url
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """The default async pool, timing each checkout (queueing for a slot plus any new connect)."""
+
+    def _do_get(self):
+        with db_pool_wait.time():
+            return super()._do_get()
+
+
+_sync_engine = None
+
+def get_sync_engine():
+    """Sync engine for migrations and offline tooling; created (and its driver imported) on first use."""
+    global _sync_engine
+    if _sync_engine is None:
+        _sync_engine = create_engine(DATABASE_URL, echo=False)
+    return _sync_engine
+
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL),
+    echo=False,
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+# SQL time shows up as "db" spans in request traces; statement counts and
+# pool occupancy on /metrics
+instrument_engine(async_engine)
+register_engine(async_engine)
+
+# expire_on_commit=False: attributes stay readable after commit without an
+# implicit (and in async, illegal) lazy reload
+async_session_maker = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
-    print("Database created")
+    """Brings the schema up to date (what `python -m migrations upgrade` does)."""
+    from migrations import upgrade
+    upgrade(get_sync_engine())
 
 
-def get_session():
-    with Session(engine) as session:
+async def get_session():
+    async with async_session_maker() as session:
         yield session
@@ -1,101 +1,235 @@
-from fastapi import APIRouter, Depends, Body
-from sqlmodel import Session
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Body, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 from config.db import get_session
 from services.admin_service import (
     approve_creator,
+    count_users,
     get_all_users,
     list_creator_applications,
     assign_role,
     suspend_user,
     reactivate_user,
-    block_user
+    block_user,
+    bulk_approve_creators,
+    bulk_assign_role,
+    bulk_set_status
 )
 from utils.auth import require_admin
-from schemas.user_schemas import PublicUserProfile
+from utils.password import password_pool_stats
+from utils.tracing import profiler, slow_traces
+from services.mail_service import mail_dispatcher
+from services.user_events import event_relay
+from rate_limiting import limiter
+from services.export_service import export_users
+from services.search_service import search_users
+from services.user_stats import USER_STATS_MAX_DAYS, get_stats, stats_reconciler
+from schemas.user_schemas import (
+    BulkActionResponse, BulkRoleAction, BulkUserAction, ProfilerSettings, UserCount, UserFilter, UserPage, UserStats,
+)
+from utils.serialization import FastJSONResponse, dump_user_page
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 security = HTTPBearer()
 
 router = APIRouter()
 
-@router.get("/users/creator-applications", response_model=list[PublicUserProfile], dependencies=[Depends(security)])
-def get_creator_applications(
-    db: Session = Depends(get_session),
+@router.get("/users/creator-applications", response_model=UserPage, dependencies=[Depends(security)])
+async def get_creator_applications(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_session),
     admin=Depends(require_admin)
 ):
-    users = list_creator_applications(db)
-    return [PublicUserProfile(**{
-        "username": u.username,
-        "name": u.name,
-        "country": u.country,
-        "gender": u.gender,
-        "profile_photo_url": u.profile_photo_url,
-        "role": u.role,
-        "creator_application_status": u.creator_application_status,
-        "status": u.status
-    }) for u in users]
+    rows, next_cursor = await list_creator_applications(db, limit, cursor)
+    return FastJSONResponse(dump_user_page(rows, next_cursor))
 
 @router.put("/users/{username}/role", dependencies=[Depends(security)])
-def put_role(
+async def put_role(
     username: str,
     new_role: str = Body(...),
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     admin=Depends(require_admin)
 ):
-    assign_role(username, new_role, db)
+    await assign_role(username, new_role, db)
     return {"message": f"Role for {username} set to {new_role}"}
 
 @router.put("/users/{username}/suspend", dependencies=[Depends(security)])
-def put_suspend(
+async def put_suspend(
     username: str,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     admin=Depends(require_admin)
 ):
-    suspend_user(username, db)
+    await suspend_user(username, db)
     return {"message": f"User {username} suspended"}
 
 @router.put("/users/{username}/reactivate", dependencies=[Depends(security)])
-def put_reactivate(
+async def put_reactivate(
     username: str,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     admin=Depends(require_admin)
 ):
-    reactivate_user(username, db)
+    await reactivate_user(username, db)
     return {"message": f"User {username} reactivated"}
 
 @router.put("/users/{username}/block", dependencies=[Depends(security)])
-def put_block(
+async def put_block(
     username: str,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     admin=Depends(require_admin)
 ):
-    block_user(username, db)
+    await block_user(username, db)
     return {"message": f"User {username} blocked"}
 
-@router.get("/users", response_model=list[PublicUserProfile], dependencies=[Depends(security)])
-def getallusers(
-    db: Session = Depends(get_session),
+@router.get("/users", response_model=UserPage, dependencies=[Depends(security)])
+async def getallusers(
+    filters: UserFilter = Depends(),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_session),
+    admin=Depends(require_admin)
+):
+    rows, next_cursor = await get_all_users(db, filters, limit, cursor)
+    return FastJSONResponse(dump_user_page(rows, next_cursor))
+
+@router.get("/users/search", response_model=UserPage, dependencies=[Depends(security)])
+async def searchusers(
+    q: str = Query(..., min_length=1, max_length=50),
+    mode: Literal["prefix", "contains", "fuzzy"] = "prefix",
+    filters: UserFilter = Depends(),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_session),
+    admin=Depends(require_admin)
+):
+    rows, next_cursor = await search_users(db, q, mode, limit, cursor, filters)
+    return FastJSONResponse(dump_user_page(rows, next_cursor))
+
+@router.get("/users/count", response_model=UserCount, dependencies=[Depends(security)])
+async def getusercount(
+    filters: UserFilter = Depends(),
+    db: AsyncSession = Depends(get_session),
+    admin=Depends(require_admin)
+):
+    return UserCount(count=await count_users(db, filters))
+
+@router.get("/stats", response_model=UserStats, dependencies=[Depends(security)])
+async def getuserstats(
+    days: int = Query(30, ge=1, le=USER_STATS_MAX_DAYS),
+    db: AsyncSession = Depends(get_session),
     admin=Depends(require_admin)
 ):
-    users = get_all_users(db)
-    return [PublicUserProfile(**{
-        "username": u.username,
-        "name": u.name,
-        "country": u.country,
-        "gender": u.gender,
-        "profile_photo_url": u.profile_photo_url,
-        "role": u.role,
-        "creator_application_status": u.creator_application_status,
-        "status": u.status,
-        "count": len(users)
-    }) for u in users]
+    """Dashboard totals from the maintained counters; signups_per_day covers the last `days` days (UTC)."""
+    return await get_stats(db, days)
+
+@router.post("/stats/reconcile", dependencies=[Depends(security)])
+async def reconcileuserstats(admin=Depends(require_admin)):
+    return {"corrected": await stats_reconciler.reconcile()}
+
+@router.get("/users/export", dependencies=[Depends(security)])
+async def exportusers(
+    request: Request,
+    filters: UserFilter = Depends(),
+    format: Literal["ndjson", "csv"] = "ndjson",
+    admin=Depends(require_admin)
+):
+    """Streams every matching user; gzip-compressed when the client accepts it."""
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="users.{format}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(export_users(filters, format, compress), media_type=media_type, headers=headers)
 
 @router.put("/users/{username}/approve", dependencies=[Depends(security)])
-def approvecreator(
+async def approvecreator(
     username: str,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     admin=Depends(require_admin)
 ):
     
-    approve_creator(username, db)
-    return {"message": f"User {username} approved as creator"}
\ No newline at end of file
+    await approve_creator(username, db)
+    return {"message": f"User {username} approved as creator"}
+
+@router.post("/users/bulk/role", response_model=BulkActionResponse, dependencies=[Depends(security)])
+async def bulk_role(
+    req: BulkRoleAction,
+    db: AsyncSession = Depends(get_session),
+    admin=Depends(require_admin)
+):
+    updated, results = await bulk_assign_role(req, req.role, admin, db)
+    return {"updated": updated, "results": results}
+
+@router.post("/users/bulk/suspend", response_model=BulkActionResponse, dependencies=[Depends(security)])
+async def bulk_suspend(
+    req: BulkUserAction,
+    db: AsyncSession = Depends(get_session),
+    admin=Depends(require_admin)
+):
+    updated, results = await bulk_set_status(req, "suspended", admin, db)
+    return {"updated": updated, "results": results}
+
+@router.post("/users/bulk/block", response_model=BulkActionResponse, dependencies=[Depends(security)])
+async def bulk_block(
+    req: BulkUserAction,
+    db: AsyncSession = Depends(get_session),
+    admin=Depends(require_admin)
+):
+    updated, results = await bulk_set_status(req, "blocked", admin, db)
+    return {"updated": updated, "results": results}
+
+@router.post("/users/bulk/reactivate", response_model=BulkActionResponse, dependencies=[Depends(security)])
+async def bulk_reactivate(
+    req: BulkUserAction,
+    db: AsyncSession = Depends(get_session),
+    admin=Depends(require_admin)
+):
+    updated, results = await bulk_set_status(req, "active", admin, db)
+    return {"updated": updated, "results": results}
+
+@router.post("/users/bulk/approve", response_model=BulkActionResponse, dependencies=[Depends(security)])
+async def bulk_approve(
+    req: BulkUserAction,
+    db: AsyncSession = Depends(get_session),
+    admin=Depends(require_admin)
+):
+    updated, results = await bulk_approve_creators(req, admin, db)
+    return {"updated": updated, "results": results}
+
+@router.get("/password-pool-stats", dependencies=[Depends(security)])
+async def get_password_pool_stats(admin=Depends(require_admin)):
+    return password_pool_stats()
+
+@router.get("/mail-stats", dependencies=[Depends(security)])
+async def get_mail_stats(admin=Depends(require_admin)):
+    return mail_dispatcher.stats()
+
+@router.get("/rate-limit-stats", dependencies=[Depends(security)])
+async def get_rate_limit_stats(admin=Depends(require_admin)):
+    return limiter.stats()
+
+@router.get("/event-stats", dependencies=[Depends(security)])
+async def get_event_stats(admin=Depends(require_admin)):
+    return event_relay.stats()
+
+@router.get("/traces/slow", dependencies=[Depends(security)])
+async def get_slow_traces(admin=Depends(require_admin)):
+    return list(slow_traces)
+
+@router.post("/profiler", dependencies=[Depends(security)])
+async def set_profiler(settings: ProfilerSettings, admin=Depends(require_admin)):
+    # Per worker: each process samples only the requests it serves
+    profiler.configure(settings.enabled, settings.sample_rate, settings.interval_ms)
+    return {"enabled": profiler.enabled, "sample_rate": profiler.sample_rate, "interval_ms": profiler.interval * 1000}
+
+@router.get("/profiler", dependencies=[Depends(security)])
+async def get_profile(
+    last: int = Query(10, ge=1, le=1000),
+    format: Literal["json", "collapsed"] = "json",
+    admin=Depends(require_admin)
+):
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed(last))
+    return profiler.report(last)
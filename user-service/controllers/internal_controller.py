@@ -0,0 +1,62 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import get_session
+from schemas.user_schemas import UserLookupRequest
+from services.lookup_service import DISPLAY_FIELDS, lookup_users
+from services.user_events import (
+    USER_EVENTS_MAX_LIMIT,
+    USER_EVENTS_MAX_WAIT,
+    dump_event_page,
+    event_relay,
+    event_stream,
+    read_events,
+)
+from utils.auth import require_internal
+from utils.serialization import FastJSONResponse, dump_columnar, dump_ndjson
+
+router = APIRouter(dependencies=[Depends(require_internal)])
+
+@router.get("/events")
+async def get_events(
+    after: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=USER_EVENTS_MAX_LIMIT),
+    wait: float = Query(0, ge=0, le=USER_EVENTS_MAX_WAIT),
+):
+    """
+    User events after offset `after`, oldest first. With `wait`, an empty
+    result is held back up to that many seconds until an event arrives
+    (long-poll). Resume with `after=next`.
+    """
+    rows = await read_events(after, limit)
+    if not rows and wait and await event_relay.wait(after, wait):
+        rows = await read_events(after, limit)
+    head = max(event_relay.head, rows[-1].seq if rows else 0)
+    return FastJSONResponse(dump_event_page(rows, after, head))
+
+@router.get("/events/stream")
+async def stream_events(request: Request, after: Optional[int] = Query(None, ge=0)):
+    """The same feed as server-sent events; reconnecting clients resume from Last-Event-ID."""
+    if after is None:
+        last_id = request.headers.get("Last-Event-ID", "")
+        after = int(last_id) if last_id.isdigit() else 0
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(event_stream(after), media_type="text/event-stream", headers=headers)
+
+@router.post("/users/lookup")
+async def lookup(
+    req: UserLookupRequest,
+    format: Literal["columnar", "ndjson"] = "columnar",
+    db: AsyncSession = Depends(get_session),
+):
+    """
+    Display data for up to LOOKUP_MAX ids and usernames, in request order.
+    columnar: {"id": [...], "username": [...], ..., "missing": {...}};
+    ndjson: one user per line, then a {"missing": {...}} line.
+    """
+    rows, missing_ids, missing_usernames = await lookup_users(db, req.ids, req.usernames)
+    missing = {"missing": {"ids": missing_ids, "usernames": missing_usernames}}
+    if format == "ndjson":
+        return FastJSONResponse(dump_ndjson(DISPLAY_FIELDS, rows, missing), media_type="application/x-ndjson")
+    return FastJSONResponse(dump_columnar(DISPLAY_FIELDS, rows, missing))
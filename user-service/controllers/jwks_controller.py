@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+import json
+from utils.jwt_keys import JWT_ALGORITHM, get_keyring
+
+router = APIRouter()
+
+JWKS_MAX_AGE = 300
+
+@router.get("/.well-known/jwks.json")
+async def jwks():
+    """Public keys for verifying access tokens locally (empty while signing with HS256)."""
+    keys = get_keyring().jwks() if JWT_ALGORITHM != "HS256" else {"keys": []}
+    return Response(
+        content=json.dumps(keys),
+        media_type="application/json",
+        headers={"Cache-Control": f"public, max-age={JWKS_MAX_AGE}"}
+    )
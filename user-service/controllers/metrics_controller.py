@@ -0,0 +1,11 @@
+from fastapi import APIRouter, HTTPException, Response
+from utils.metrics import METRICS_ENABLED, metrics_exporter
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text format; with METRICS_MULTIPROC_DIR set, summed over all workers."""
+    if not METRICS_ENABLED:
+        raise HTTPException(404, "Not Found")
+    return Response(content=metrics_exporter.scrape(), media_type="text/plain; version=0.0.4; charset=utf-8")
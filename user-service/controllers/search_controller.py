@@ -0,0 +1,23 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import get_session
+from models.users import UserStatus
+from rate_limiting import rate_limit
+from schemas.user_schemas import UserFilter, UserPage
+from services.search_service import search_users
+from utils.serialization import FastJSONResponse, dump_user_page
+
+router = APIRouter()
+
+@router.get("/search", response_model=UserPage, dependencies=[rate_limit("search", "120/minute")])
+async def search(
+    q: str = Query(..., min_length=1, max_length=50),
+    mode: Literal["prefix", "contains", "fuzzy"] = "prefix",
+    limit: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_session),
+):
+    """Public search/autocomplete over active users (username, name, country)."""
+    rows, next_cursor = await search_users(db, q, mode, limit, cursor, UserFilter(status=UserStatus.active))
+    return FastJSONResponse(dump_user_page(rows, next_cursor))
@@ -1,91 +1,101 @@
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Body, Request
-from sqlmodel import Session, select
+import os
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Response, UploadFile, status, Body, Request
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from config.db import get_session
 from schemas.user_schemas import AvatarResponse, ChangePasswordRequest, ForgotPasswordRequest, PublicUserProfile, ResetPasswordRequest, UpdateMeRequest, UserCreate, UserDetail,MessageResponse
 from models.users import User
-from services.user_service import change_password, create_user, get_me, reset_password, send_password_reset_otp, update_avatar, update_me, verify_otp, resend_otp , get_public_profile 
-from rate_limiting import limiter
+from services.user_service import change_password, create_user, get_me, reset_password, send_password_reset_otp, update_avatar, update_me, verify_otp, resend_otp , get_public_profile_cached 
+from rate_limiting import rate_limit
 from utils.auth import decode_access_token, get_current_user
+from utils.serialization import FastJSONResponse, dump_user_detail
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 security = HTTPBearer()
 router = APIRouter()
 
-@router.post("/register", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-@limiter.limit("10/hour")
-def register_user(user_in: UserCreate, db: Session = Depends(get_session), request: Request = None):
-    user = create_user(user_in, db)
+PROFILE_CACHE_CONTROL = f"public, max-age={os.getenv('PROFILE_MAX_AGE', '30')}"
+
+@router.post("/register", response_model=MessageResponse, status_code=status.HTTP_201_CREATED, dependencies=[rate_limit("register", "10/hour")])
+async def register_user(user_in: UserCreate, db: AsyncSession = Depends(get_session)):
+    user = await create_user(user_in, db)
     return {"message": "User registered successfully Please verify your email"}
 
-@router.post("/verify-email")
-@limiter.limit("2/hour")
-def verify_email(username: str = Body(...), otp: str = Body(...), db: Session = Depends(get_session), request: Request = None):
-    user = db.exec(select(User).where(User.username == username)).first()
+@router.post("/verify-email", dependencies=[rate_limit("verify-email", "2/hour", keys=("ip", "username"))])
+async def verify_email(username: str = Body(...), otp: str = Body(...), db: AsyncSession = Depends(get_session)):
+    user = (await db.exec(select(User).where(User.username == username))).first()
     if not user:
         raise HTTPException(404, "User not found")
-    verify_otp(user, otp, db)
+    await verify_otp(user, otp, db)
     return {"message": "Email verified successfully"}
 
-@router.post("/resend-otp")
-@limiter.limit("1/hour")
-def resend_otp_endpoint(username: str = Body(...), db: Session = Depends(get_session), request: Request = None):
-    user = db.exec(select(User).where(User.username == username)).first()
+@router.post("/resend-otp", dependencies=[rate_limit("resend-otp", "1/hour", keys=("ip", "username"))])
+async def resend_otp_endpoint(username: str = Body(...), db: AsyncSession = Depends(get_session)):
+    user = (await db.exec(select(User).where(User.username == username))).first()
     if not user:
         raise HTTPException(404, "User not found")
-    resend_otp(user, db)
+    await resend_otp(user, db)
     return {"message": "OTP resent"}
 
-@router.post("/forgot-password")
-def forgot_password(
+@router.post("/forgot-password", dependencies=[
+    rate_limit("forgot-password", "10/hour"),
+    rate_limit("forgot-password-account", "3/hour", keys=("email",)),
+])
+async def forgot_password(
     req: ForgotPasswordRequest,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_session)
 ):
-    send_password_reset_otp(req.email, db)
+    await send_password_reset_otp(req.email, db)
     return {"message": "Reset OTP sent"}
 
-@router.post("/reset-password")
-def reset_password_endpoint(
+@router.post("/reset-password", dependencies=[rate_limit("reset-password", "10/hour", keys=("ip", "email"))])
+async def reset_password_endpoint(
     req: ResetPasswordRequest,
-    db: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_session)
 ):
-    reset_password(req.email, req.otp, req.new_password, db)
+    await reset_password(req.email, req.otp, req.new_password, db)
     return {"message": "Password reset successful"}
 
 @router.get("/me", response_model=UserDetail, dependencies=[Depends(security)])
-def me(
+async def me(
     user=Depends(get_current_user)
 ):
-    return get_me(user)
+    return FastJSONResponse(dump_user_detail(await get_me(user)))
 
 @router.put("/me", response_model=UserDetail,dependencies=[Depends(security)] )
-def update_me_endpoint(
+async def update_me_endpoint(
     update: UpdateMeRequest,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    return update_me(user, update.dict(exclude_unset=True), db)
+    return FastJSONResponse(dump_user_detail(await update_me(user, update.dict(exclude_unset=True), db)))
 
 @router.put("/me/password",dependencies=[Depends(security)])
-def change_password_endpoint(
+async def change_password_endpoint(
     req: ChangePasswordRequest,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    change_password(user, req.old_password, req.new_password, db)
+    await change_password(user, req.old_password, req.new_password, db)
     return {"message": "Password changed successfully"}
 
 
-@router.post("/me/avatar", response_model=AvatarResponse, status_code=status.HTTP_200_OK , dependencies = [Depends(security)])
+@router.post("/me/avatar", response_model=AvatarResponse, status_code=status.HTTP_202_ACCEPTED , dependencies = [Depends(security)])
 async def upload_avatar(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    db: Session = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    avatar_url = update_avatar(user, file.file, db)
-    return AvatarResponse(avatar_url=avatar_url)
+    await update_avatar(user, file, background_tasks)
+    return AvatarResponse()
 
 @router.get("/{username}", response_model=PublicUserProfile)
-def public_profile(username: str, db: Session = Depends(get_session)):
-    profile = get_public_profile(username, db)
-    return profile
+async def public_profile(username: str, request: Request, db: AsyncSession = Depends(get_session)):
+    # Served from pre-serialised bytes; a cache hit never opens a DB connection
+    etag, body = await get_public_profile_cached(username, db)
+    headers = {"ETag": etag, "Cache-Control": PROFILE_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
@@ -1,21 +1,26 @@
 from fastapi import APIRouter, Depends, status, Response, Request, HTTPException
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from config.db import get_session
 from schemas.user_schemas import UserLogin, TokenResponse
-from services.user_login import apply_creator, authenticate_user
-from utils.auth import decode_refresh_token, create_access_token, create_refresh_token, get_current_user
+from services.user_login import apply_creator, authenticate_user, logout_all_sessions, logout_session, refresh_tokens
+from services.session_service import REFRESH_TOKEN_DAYS
+from utils.auth import get_current_user
+from rate_limiting import rate_limit
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 security = HTTPBearer()
 router = APIRouter()
 
-@router.post("/login", response_model=TokenResponse)
-def login(
+@router.post("/login", response_model=TokenResponse, dependencies=[
+    rate_limit("login", "30/minute"),
+    rate_limit("login-account", "10/minute", keys=("username_or_email",)),
+])
+async def login(
     login_in: UserLogin,
     response: Response,
-    db: Session = Depends(get_session),
+    db: AsyncSession = Depends(get_session),
 ):
-    access_token, refresh_token = authenticate_user(login_in.username_or_email, login_in.password, db)
+    access_token, refresh_token = await authenticate_user(login_in.username_or_email, login_in.password, db)
     # Set HTTP-only refresh token cookie
     response.set_cookie(
         key="refresh_token",
@@ -23,49 +28,56 @@ def login(
         httponly=True,
         secure=True,
         samesite="lax",
-        max_age=7*24*60*60  # 7 days
+        max_age=REFRESH_TOKEN_DAYS*24*60*60
     )
     return TokenResponse(access_token=access_token)
 
 @router.post("/refresh-token", response_model=TokenResponse)
-def refresh_token(request: Request, response: Response):
+async def refresh_token(request: Request, response: Response, db: AsyncSession = Depends(get_session)):
     refresh_token = request.cookies.get("refresh_token")
     if not refresh_token:
         raise HTTPException(401, "Refresh token missing")
-    payload = decode_refresh_token(refresh_token)
-    if not payload:
-        raise HTTPException(401, "Invalid or expired refresh token")
-
-    user_claims = {
-        "sub": payload["sub"],
-        "username": payload["username"],
-        "role": payload["role"]
-    }
-    access_token = create_access_token(user_claims)
-    
-    new_refresh_token = create_refresh_token(user_claims)
+    access_token, new_refresh_token = await refresh_tokens(refresh_token, db)
     response.set_cookie(
         key="refresh_token",
         value=new_refresh_token,
         httponly=True,
         secure=True,
         samesite="lax",
-        max_age=7*24*60*60
+        max_age=REFRESH_TOKEN_DAYS*24*60*60
     )
     return TokenResponse(access_token=access_token)
 
 @router.post("/me/apply-creator", status_code=status.HTTP_200_OK, dependencies=[Depends(security)])
-def apply_creator_endpoint(
-    db: Session = Depends(get_session),
+async def apply_creator_endpoint(
+    db: AsyncSession = Depends(get_session),
     user=Depends(get_current_user)
 ):
-    apply_creator(user, db)
+    await apply_creator(user, db)
     return {"message": "Creator application submitted and is now pending admin review."}
 
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
-def logout(response: Response):
-    # Remove refresh token cookie by setting it to empty and expiring it
+async def logout(request: Request, response: Response, db: AsyncSession = Depends(get_session)):
+    # Revoke this login's refresh tokens server-side, then expire the cookie
+    await logout_session(request.cookies.get("refresh_token"), db)
+    response.delete_cookie(
+        key="refresh_token",
+        httponly=True,
+        secure=True,
+        samesite="lax",
+        path="/"
+    )
+    return {"message": "Logged out successfully"}
+
+
+@router.post("/logout-all", status_code=status.HTTP_200_OK, dependencies=[Depends(security)])
+async def logout_all(
+    response: Response,
+    db: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user)
+):
+    revoked = await logout_all_sessions(user.id, db)
     response.delete_cookie(
         key="refresh_token",
         httponly=True,
@@ -73,4 +85,4 @@ def logout(response: Response):
         samesite="lax",
         path="/"
     )
-    return {"message": "Logged out successfully"}
\ No newline at end of file
+    return {"message": "Logged out of all sessions", "revoked_sessions": revoked}
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status, Body, Request
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from config.db import get_session
-from schemas.user_schemas import AvatarResponse, ChangePasswordRequest, ForgotPasswordRequest, PublicUserProfile, ResetPasswordRequest, UpdateMeRequest, UserCreate, UserDetail,MessageResponse
+from schemas.user_schemas import AvatarResponse, ChangePasswordRequest, ForgotPasswordRequest, PublicUserProfile, ResetPasswordRequest, UpdateMeRequest, UserCreate, UserDetail,MessageResponse, TokenBatchRequest, TokenBatchResponse
 from models.users import User
 from services.user_service import change_password, create_user, get_me, reset_password, send_password_reset_otp, update_avatar, update_me, verify_otp, resend_otp , get_public_profile 
-from rate_limiting import limiter
-from utils.auth import decode_access_token, get_current_user
+from services.token_service import TOKEN_USER_COLUMNS, VALIDATE_BATCH_MAX, parse_user_id, token_cache_entry, token_error, validate_tokens_batch
+from utils.auth import decode_access_token, get_current_user, require_admin
+from utils.cache import token_cache
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 security = HTTPBearer()
@@ -13,7 +15,7 @@ router = APIRouter()
 
 
 @router.get("/validate-token")
-def validate_token(request: Request, db: Session = Depends(get_session)):
+async def validate_token(request: Request, db: AsyncSession = Depends(get_session)):
     """
     Validates the JWT access token and returns user info:
     {
@@ -22,7 +24,6 @@ def validate_token(request: Request, db: Session = Depends(get_session)):
     }
     """
     auth_header = request.headers.get("Authorization")
-    print("Authorization header:", auth_header)
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
 
@@ -30,34 +31,43 @@ def validate_token(request: Request, db: Session = Depends(get_session)):
 
     # Decode access token
     payload = decode_access_token(token)
-    print("Decoded token payload:", payload)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
-    user_id_raw = payload.get("sub")
-    role_from_token = payload.get("role")
+    user_id = parse_user_id(payload.get("sub"))
 
-    print("User ID from token (raw):", user_id_raw)
-
-    if user_id_raw is None:
+    if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
-    # Try to coerce numeric-looking IDs to int, otherwise use as-is (handles string/uuid ids)
-    try:
-        user_id = int(user_id_raw)
-    except (TypeError, ValueError):
-        user_id = user_id_raw
+    # Served from the in-process cache when possible, otherwise one point lookup
+    cached = token_cache.get(user_id)
+    if cached is None:
+        row = (await db.exec(select(*TOKEN_USER_COLUMNS).where(User.id == user_id))).first()
+        if not row:
+            raise HTTPException(status_code=401, detail="User not found")
+        cached = token_cache_entry(*row)
+        token_cache.set(user_id, cached)
 
-    # Fetch user from DB safely using the coerced id
-    db_user = db.exec(select(User).where(User.id == user_id)).first()
-    if not db_user:
-        raise HTTPException(status_code=401, detail="User not found")
+    # Revoked (token_version bumped), suspended/blocked, or role changed since issue
+    error = token_error(cached, payload)
+    if error:
+        raise HTTPException(status_code=401, detail=error)
 
-    # Optional: verify role from token matches DB role
-    if db_user.role != role_from_token:
-        raise HTTPException(status_code=401, detail="Token role mismatch")
+    return {"userId": cached["userId"], "role": cached["role"]}
 
-    return {
-        "userId": str(db_user.id),
-        "role": db_user.role
-    }
+
+@router.post("/validate-batch", response_model=TokenBatchResponse)
+async def validate_batch(req: TokenBatchRequest, db: AsyncSession = Depends(get_session)):
+    """
+    Validates up to VALIDATE_BATCH_MAX access tokens in one call and returns a
+    verdict per token (same order, same rules as validate-token).
+    """
+    if len(req.tokens) > VALIDATE_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {VALIDATE_BATCH_MAX} tokens per batch")
+    return {"results": await validate_tokens_batch(req.tokens, db)}
+
+
+@router.get("/cache-stats", dependencies=[Depends(security)])
+async def cache_stats(admin=Depends(require_admin)):
+    """Hit/miss counters of the validate-token cache in this worker."""
+    return token_cache.stats()
@@ -1,10 +1,35 @@
-from fastapi import FastAPI
+import os
 from dotenv import load_dotenv
+
+# Load .env once, before any module reads its settings from the environment
+load_dotenv()
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer
-from config.db import init_db
+from config.db import DB_AUTO_MIGRATE, async_engine, init_db
+from migrations import check_schema
+from utils.password import shutdown_password_pool, start_password_pool
+from services.mail_service import MAIL_DISPATCHER_ENABLED, mail_dispatcher, outbox_sweeper
+from utils.auth import AUTH_STATELESS
+from utils.token_versions import token_versions
+from services.write_behind import last_login_buffer
+from services.verification_codes import code_sweeper
+from services.user_stats import stats_reconciler
+from services.user_events import event_relay
+from services.session_service import session_revocations
 from url.user_url import api_router
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+from utils.metrics import MetricsMiddleware, metrics_exporter
+from utils.tracing import TracingMiddleware
+from utils.storage import AVATAR_STORAGE, AVATAR_LOCAL_DIR, AVATAR_LOCAL_BASE_URL
+
 
+# Compress responses larger than this when the client accepts gzip
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "4096"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "5"))
 
 # cors headers settings
 origins = [
@@ -12,25 +37,64 @@ origins = [
 ]
 
 
-
-#env leading
-load_dotenv()
-
 #initialize an app
 app=FastAPI(debug=False)
 #security schemes
 bearer_scheme = HTTPBearer()
 
 @app.on_event("startup")
-def on_startup():
-    init_db()
+async def on_startup():
+    # Migrations run out-of-band (`python -m migrations upgrade`); workers only check the version
+    if DB_AUTO_MIGRATE:
+        await run_in_threadpool(init_db)
+    await check_schema(async_engine)
+    start_password_pool()
+    if MAIL_DISPATCHER_ENABLED:
+        await mail_dispatcher.start()
+    if AUTH_STATELESS:
+        await token_versions.start()
+    await last_login_buffer.start()
+    await code_sweeper.start()
+    await outbox_sweeper.start()
+    await stats_reconciler.start()
+    await event_relay.start()
+    await session_revocations.start()
+    await metrics_exporter.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await mail_dispatcher.stop()
+    await token_versions.stop()
+    await last_login_buffer.stop()
+    await code_sweeper.stop()
+    await outbox_sweeper.stop()
+    await stats_reconciler.stop()
+    await event_relay.stop()
+    await session_revocations.stop()
+    await metrics_exporter.stop()
+    shutdown_password_pool()
 
 app.include_router(api_router)  
 
+# Serve avatars ourselves when they are stored on the local filesystem
+if AVATAR_STORAGE == "local":
+    os.makedirs(AVATAR_LOCAL_DIR, exist_ok=True)
+    app.mount(AVATAR_LOCAL_BASE_URL, StaticFiles(directory=AVATAR_LOCAL_DIR), name="avatars")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-) 
\ No newline at end of file
+)
+
+# Already-encoded responses (the gzip export stream) are passed through untouched
+app.add_middleware(GZipMiddleware, minimum_size=RESPONSE_GZIP_MIN_BYTES, compresslevel=RESPONSE_GZIP_LEVEL)
+
+# Request counts and latency per route template for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Outermost, so traced time includes the other middleware; a no-op unless
+# TRACE_ENABLED is set or the profiler is on
+app.add_middleware(TracingMiddleware)
@@ -0,0 +1,102 @@
+"""
+Versioned schema migrations.
+
+Migrations live in migrations/versions as NNNN_description.py modules, each
+defining upgrade(conn). They are applied in order, each in its own
+transaction together with the bump of the single-row schema_version table.
+
+Run them once per deploy, out-of-band:
+
+    python -m migrations upgrade
+
+Application workers only compare schema_version against head() on startup
+(one query), instead of every worker running create_all() on every boot.
+"""
+import importlib
+import os
+import pkgutil
+from datetime import datetime
+from sqlalchemy import text
+
+# Arbitrary key for pg_advisory_lock so concurrent upgrade runs serialise
+_LOCK_KEY = 72_110_015
+
+
+def load_migrations():
+    """[(version, name, module)] sorted by version."""
+    from migrations import versions
+    found = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        prefix, _, name = info.name.partition("_")
+        if prefix.isdigit():
+            found.append((int(prefix), name, importlib.import_module(f"migrations.versions.{info.name}")))
+    return sorted(found, key=lambda m: m[0])
+
+
+def head() -> int:
+    """Latest version, read from file names only (no migration module imports)."""
+    from migrations import versions
+    prefixes = [info.name.partition("_")[0] for info in pkgutil.iter_modules(versions.__path__)]
+    return max((int(p) for p in prefixes if p.isdigit()), default=0)
+
+
+def _ensure_version_table(conn):
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    )
+
+
+def current_version(conn) -> int:
+    _ensure_version_table(conn)
+    version = conn.execute(text("SELECT max(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def upgrade(engine, target: int = None):
+    """Applies pending migrations up to `target` (default: all). Returns the versions applied."""
+    applied = []
+    with engine.connect() as lock_conn:
+        is_postgres = engine.dialect.name == "postgresql"
+        if is_postgres:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+        try:
+            for version, name, module in load_migrations():
+                if target is not None and version > target:
+                    break
+                with engine.begin() as conn:
+                    if version <= current_version(conn):
+                        continue
+                    module.upgrade(conn)
+                    conn.execute(text("DELETE FROM schema_version"))
+                    conn.execute(
+                        text("INSERT INTO schema_version (version, applied_at) VALUES (:v, :t)"),
+                        {"v": version, "t": datetime.utcnow()},
+                    )
+                print(f"Applied migration {version:04d} {name}")
+                applied.append(version)
+        finally:
+            if is_postgres:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+    return applied
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+async def check_schema(async_engine):
+    """Startup check: one SELECT. Raises SchemaOutOfDate if migrations are pending."""
+    expected = head()
+    async with async_engine.connect() as conn:
+        try:
+            version = (await conn.execute(text("SELECT max(version) FROM schema_version"))).scalar() or 0
+        except Exception:
+            version = 0
+    if version < expected:
+        raise SchemaOutOfDate(
+            f"Database schema is at version {version}, this build needs {expected}; run `python -m migrations upgrade`"
+        )
+    if version > expected:
+        # Newer code already migrated (e.g. mid rolling deploy); migrations are additive
+        print(f"Database schema version {version} is ahead of this build ({expected})")
+    return version
@@ -0,0 +1,37 @@
+"""
+    python -m migrations upgrade [--to N]
+    python -m migrations current
+    python -m migrations check
+"""
+import argparse
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config.db import get_sync_engine
+from migrations import current_version, head, upgrade
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m migrations")
+    parser.add_argument("command", choices=["upgrade", "current", "check"])
+    parser.add_argument("--to", type=int, default=None, help="stop at this version")
+    args = parser.parse_args()
+
+    engine = get_sync_engine()
+    if args.command == "upgrade":
+        applied = upgrade(engine, args.to)
+        if not applied:
+            print("Database schema already up to date")
+        return
+    with engine.connect() as conn:
+        version = current_version(conn)
+        conn.commit()
+    print(f"current {version}, head {head()}")
+    if args.command == "check" and version < head():
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Small idempotent DDL helpers for migrations. Each checks the live catalog
+first, so a database first built by the old create_all() on startup can be
+brought under versioning by simply running every migration.
+"""
+from sqlalchemy import Column, Index, MetaData, Table, inspect
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+
+def has_table(conn, name: str) -> bool:
+    return inspect(conn).has_table(name)
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def has_index(conn, table: str, name: str) -> bool:
+    return any(i["name"] == name for i in inspect(conn).get_indexes(table))
+
+
+def create_table(conn, table: Table):
+    table.create(conn, checkfirst=True)
+
+
+def add_column(conn, table: str, column: Column):
+    if has_column(conn, table, column.name):
+        return
+    # Bind the column to a throwaway table so the dialect can render it
+    Table(table, MetaData(), column)
+    ddl = CreateColumn(column).compile(dialect=conn.dialect)
+    conn.exec_driver_sql(f"ALTER TABLE {conn.dialect.identifier_preparer.quote(table)} ADD COLUMN {ddl}")
+
+
+def create_index(conn, index: Index):
+    # IF NOT EXISTS rather than has_index(): reflection skips expression indexes
+    conn.execute(CreateIndex(index, if_not_exists=True))
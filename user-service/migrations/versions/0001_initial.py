@@ -0,0 +1,33 @@
+"""The user table as the original create_all() built it."""
+from sqlalchemy import Boolean, Column, DateTime, Enum, Index, Integer, MetaData, String, Table
+from migrations import ops
+
+
+def upgrade(conn):
+    user = Table(
+        "user", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("username", String, nullable=False),
+        Column("email", String, nullable=False),
+        Column("name", String, nullable=False),
+        Column("country", String, nullable=False),
+        Column("gender", String, nullable=False),
+        Column("phone", String),
+        Column("password", String, nullable=False),
+        Column("profile_photo_url", String),
+        Column("role", Enum("user", "creator", "admin", name="userrole"), nullable=False),
+        Column("creator_application_status", Enum("none", "pending", "approved", "rejected", name="creatorapplicationstatus"), nullable=False),
+        Column("status", Enum("active", "suspended", "blocked", name="userstatus"), nullable=False),
+        Column("email_verified", Boolean, nullable=False),
+        Column("last_login", DateTime),
+        Column("otp_code", String),
+        Column("otp_expiry", DateTime),
+        Column("reset_otp", String),
+        Column("reset_otp_expiry", DateTime),
+        Column("created_at", DateTime, nullable=False),
+        Column("updated_at", DateTime, nullable=False),
+        Index("ix_user_id", "id"),
+        Index("ix_user_username", "username", unique=True),
+        Index("ix_user_email", "email", unique=True),
+    )
+    ops.create_table(conn, user)
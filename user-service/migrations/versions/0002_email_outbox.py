@@ -0,0 +1,24 @@
+"""Persistent outbox drained by the mail dispatcher."""
+from sqlalchemy import Column, DateTime, Enum, Index, Integer, MetaData, String, Table
+from migrations import ops
+
+
+def upgrade(conn):
+    outbox = Table(
+        "email_outbox", MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("to_email", String, nullable=False),
+        Column("subject", String, nullable=False),
+        Column("body", String, nullable=False),
+        Column("dedupe_key", String),
+        Column("status", Enum("pending", "sending", "sent", "failed", "superseded", name="emailstatus"), nullable=False),
+        Column("attempts", Integer, nullable=False),
+        Column("next_attempt_at", DateTime, nullable=False),
+        Column("last_error", String),
+        Column("created_at", DateTime, nullable=False),
+        Column("sent_at", DateTime),
+        Index("ix_email_outbox_dedupe_key", "dedupe_key"),
+        Index("ix_email_outbox_status", "status"),
+        Index("ix_email_outbox_next_attempt_at", "next_attempt_at"),
+    )
+    ops.create_table(conn, outbox)
@@ -0,0 +1,8 @@
+"""Keyset pagination order for admin listings."""
+from sqlalchemy import Column, Index, MetaData, Table
+from migrations import ops
+
+
+def upgrade(conn):
+    user = Table("user", MetaData(), Column("created_at"), Column("id"))
+    ops.create_index(conn, Index("ix_user_created_at_id", user.c.created_at, user.c.id))
@@ -0,0 +1,7 @@
+"""Per-user token_version, carried by access tokens as the "ver" claim."""
+from sqlalchemy import Column, Integer
+from migrations import ops
+
+
+def upgrade(conn):
+    ops.add_column(conn, "user", Column("token_version", Integer, nullable=False, server_default="0"))
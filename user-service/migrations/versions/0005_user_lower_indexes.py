@@ -0,0 +1,9 @@
+"""Expression indexes for the case-insensitive login lookup."""
+from sqlalchemy import Column, Index, MetaData, Table, func
+from migrations import ops
+
+
+def upgrade(conn):
+    user = Table("user", MetaData(), Column("username"), Column("email"))
+    ops.create_index(conn, Index("ix_user_lower_username", func.lower(user.c.username)))
+    ops.create_index(conn, Index("ix_user_lower_email", func.lower(user.c.email)))
@@ -0,0 +1,15 @@
+"""Counters for the Postgres rate-limit store."""
+from sqlalchemy import BigInteger, Column, Index, Integer, MetaData, String, Table
+from migrations import ops
+
+
+def upgrade(conn):
+    counter = Table(
+        "rate_limit_counter", MetaData(),
+        Column("key", String, primary_key=True),
+        Column("window_start", BigInteger, primary_key=True),
+        Column("count", Integer, nullable=False),
+        Column("expires_at", BigInteger, nullable=False),
+        Index("ix_rate_limit_counter_expires_at", "expires_at"),
+    )
+    ops.create_table(conn, counter)
@@ -0,0 +1,24 @@
+"""
+Verification codes move out of the user table.
+
+The old otp_code/otp_expiry/reset_otp/reset_otp_expiry columns are no longer
+mapped but are kept, so builds still reading them keep working during a
+rolling deploy; a later migration drops them. Codes pending at deploy time
+are not carried over (they expire within minutes; users can ask for a new one).
+"""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+from migrations import ops
+
+
+def upgrade(conn):
+    codes = Table(
+        "verification_code", MetaData(),
+        Column("user_id", Integer, primary_key=True),
+        Column("purpose", String, primary_key=True),
+        Column("code_hash", String, nullable=False),
+        Column("attempts", Integer, nullable=False),
+        Column("expires_at", DateTime, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Index("ix_verification_code_expires_at", "expires_at"),
+    )
+    ops.create_table(conn, codes)
@@ -0,0 +1,25 @@
+"""
+Indexes for user search (services/search_service.py), Postgres only.
+
+- lower(col) COLLATE "C" btrees: LIKE 'q%' becomes an index range scan, and
+  for username the index also yields the (lower(username), id) page order
+- pg_trgm GIN indexes for substring and similarity matching
+
+CREATE EXTENSION needs a role allowed to create pg_trgm (superuser, or a
+trusted extension on PG13+). On a large table run this migration off-peak:
+plain CREATE INDEX blocks writes to "user" while it builds.
+"""
+
+
+def upgrade(conn):
+    if conn.dialect.name != "postgresql":
+        return
+    conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for ddl in (
+        'CREATE INDEX IF NOT EXISTS ix_user_search_username ON "user" (lower(username) COLLATE "C", id)',
+        'CREATE INDEX IF NOT EXISTS ix_user_search_name ON "user" (lower(name) COLLATE "C")',
+        'CREATE INDEX IF NOT EXISTS ix_user_search_country ON "user" (lower(country) COLLATE "C")',
+        'CREATE INDEX IF NOT EXISTS ix_user_username_trgm ON "user" USING gin (lower(username) gin_trgm_ops)',
+        'CREATE INDEX IF NOT EXISTS ix_user_name_trgm ON "user" USING gin (lower(name) gin_trgm_ops)',
+    ):
+        conn.exec_driver_sql(ddl)
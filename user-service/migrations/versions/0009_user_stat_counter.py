@@ -0,0 +1,34 @@
+"""
+Dashboard counters (services/user_stats.py), seeded from the user table so
+they are right from the first deploy. Later drift is fixed by the periodic
+reconciliation.
+"""
+from sqlalchemy import BigInteger, Column, MetaData, String, Table
+from migrations import ops
+
+DIMENSIONS = ("role", "status", "creator_application_status", "country")
+
+
+def upgrade(conn):
+    counter = Table(
+        "user_stat_counter", MetaData(),
+        Column("dimension", String, primary_key=True),
+        Column("value", String, primary_key=True),
+        Column("count", BigInteger, nullable=False),
+    )
+    ops.create_table(conn, counter)
+    conn.exec_driver_sql("DELETE FROM user_stat_counter")
+    for dimension in DIMENSIONS:
+        conn.exec_driver_sql(
+            f"INSERT INTO user_stat_counter (dimension, value, count) "
+            f"SELECT '{dimension}', CAST({dimension} AS VARCHAR), count(*) FROM \"user\" GROUP BY {dimension}"
+        )
+    conn.exec_driver_sql(
+        "INSERT INTO user_stat_counter (dimension, value, count) "
+        "SELECT 'email_verified', CASE WHEN email_verified THEN 'true' ELSE 'false' END, count(*) "
+        "FROM \"user\" GROUP BY email_verified"
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO user_stat_counter (dimension, value, count) "
+        "SELECT 'signup_day', CAST(date(created_at) AS VARCHAR), count(*) FROM \"user\" GROUP BY date(created_at)"
+    )
@@ -0,0 +1,63 @@
+"""
+User event outbox (services/user_events.py).
+
+Existing users get one "snapshot" event each, already sequenced, so a
+consumer reading the feed from offset 0 sees every user.
+"""
+import json
+from datetime import datetime
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, Index, Integer, MetaData, String, Table, Text, insert, select, text,
+)
+from migrations import ops
+
+# Keep in step with SNAPSHOT_FIELDS in services/user_events.py
+SNAPSHOT_FIELDS = (
+    "id", "username", "token_version", "name", "country", "profile_photo_url",
+    "role", "status", "creator_application_status", "email_verified", "updated_at",
+)
+BATCH = 5000
+
+
+def upgrade(conn):
+    metadata = MetaData()
+    events = Table(
+        "user_event", metadata,
+        Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True),
+        Column("seq", BigInteger, unique=True),
+        Column("user_id", Integer, nullable=False),
+        Column("type", String, nullable=False),
+        Column("payload", Text, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Index("ix_user_event_user_id_seq", "user_id", "seq"),
+        Index("ix_user_event_unsequenced", "id", postgresql_where=text("seq IS NULL"), sqlite_where=text("seq IS NULL")),
+        Index("ix_user_event_created_at", "created_at"),
+    )
+    if ops.has_table(conn, "user_event"):
+        return
+    ops.create_table(conn, events)
+
+    users = Table(
+        "user", metadata,
+        Column("id", Integer, primary_key=True),
+        Column("username", String), Column("token_version", Integer), Column("name", String),
+        Column("country", String), Column("profile_photo_url", String), Column("role", String),
+        Column("status", String), Column("creator_application_status", String),
+        Column("email_verified", Boolean), Column("updated_at", DateTime),
+    )
+    now = datetime.utcnow()
+    last_id, seq = 0, 0
+    while True:
+        rows = conn.execute(
+            select(*(users.c[f] for f in SNAPSHOT_FIELDS)).where(users.c.id > last_id).order_by(users.c.id).limit(BATCH)
+        ).all()
+        if not rows:
+            break
+        batch = []
+        for row in rows:
+            seq += 1
+            data = dict(zip(SNAPSHOT_FIELDS, row))
+            data["updated_at"] = data["updated_at"].isoformat()
+            batch.append({"seq": seq, "user_id": row.id, "type": "snapshot", "payload": json.dumps(data, separators=(",", ":"), ensure_ascii=False), "created_at": now})
+        conn.execute(insert(events), batch)
+        last_id = rows[-1].id
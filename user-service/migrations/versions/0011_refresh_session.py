@@ -0,0 +1,21 @@
+"""Server-side refresh-token sessions (services/session_service.py)."""
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+from migrations import ops
+
+
+def upgrade(conn):
+    sessions = Table(
+        "refresh_session", MetaData(),
+        Column("id", String, primary_key=True),
+        Column("family_id", String, nullable=False),
+        Column("user_id", Integer, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("expires_at", DateTime, nullable=False),
+        Column("used_at", DateTime),
+        Column("revoked_at", DateTime),
+        Index("ix_refresh_session_family_id", "family_id"),
+        Index("ix_refresh_session_user_id", "user_id"),
+        Index("ix_refresh_session_expires_at", "expires_at"),
+        Index("ix_refresh_session_revoked_at", "revoked_at"),
+    )
+    ops.create_table(conn, sessions)
@@ -0,0 +1,8 @@
+"""Age index for the email outbox retention sweep."""
+from sqlalchemy import Column, Index, MetaData, Table
+from migrations import ops
+
+
+def upgrade(conn):
+    outbox = Table("email_outbox", MetaData(), Column("created_at"))
+    ops.create_index(conn, Index("ix_email_outbox_created_at", outbox.c.created_at))
@@ -0,0 +1,11 @@
+"""
+Trigram index on lower(country) for contains search, Postgres only (see
+0008 for the other search indexes and the pg_trgm requirements).
+"""
+
+
+def upgrade(conn):
+    if conn.dialect.name != "postgresql":
+        return
+    conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_user_country_trgm ON "user" USING gin (lower(country) gin_trgm_ops)')
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+from enum import Enum
+from sqlmodel import SQLModel, Field
+
+class EmailStatus(str, Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    failed = "failed"
+    superseded = "superseded"
+
+class EmailOutbox(SQLModel, table=True):
+    __tablename__ = "email_outbox"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    to_email: str = Field(nullable=False)
+    subject: str = Field(nullable=False)
+    # Emptied once the message is sent, failed or superseded
+    body: str = Field(nullable=False)
+    # Messages sharing a key replace each other while still pending (e.g. "otp:<email>")
+    dedupe_key: Optional[str] = Field(default=None, index=True)
+    status: EmailStatus = Field(default=EmailStatus.pending, nullable=False, index=True)
+    attempts: int = Field(default=0, nullable=False)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
+    last_error: Optional[str] = None
+    # Retention sweeps delete by age (services/mail_service.py OutboxSweeper)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
+    sent_at: Optional[datetime] = None
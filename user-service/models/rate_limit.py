@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger
+from sqlmodel import SQLModel, Field
+
+class RateLimitCounter(SQLModel, table=True):
+    """Per-key fixed-window hit counts backing the Postgres rate-limit storage."""
+    __tablename__ = "rate_limit_counter"
+
+    key: str = Field(primary_key=True)
+    window_start: int = Field(primary_key=True, sa_type=BigInteger)
+    count: int = Field(default=0, nullable=False)
+    # Epoch seconds after which the row is no longer needed (two windows later)
+    expires_at: int = Field(nullable=False, index=True, sa_type=BigInteger)
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import SQLModel, Field
+
+class RefreshSession(SQLModel, table=True):
+    """
+    One issued refresh token, identified by a SHA-256 of its jti claim (the
+    token itself is never stored). Tokens rotated from the same login share
+    a family_id; revoking a session revokes its whole family.
+    """
+    __tablename__ = "refresh_session"
+
+    id: str = Field(primary_key=True)
+    family_id: str = Field(nullable=False, index=True)
+    user_id: int = Field(nullable=False, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+    expires_at: datetime = Field(nullable=False, index=True)
+    # Set when the token was exchanged for its successor
+    used_at: Optional[datetime] = None
+    revoked_at: Optional[datetime] = Field(default=None, index=True)
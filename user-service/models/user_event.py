@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import BigInteger, Index, Integer, Text, text
+from sqlmodel import SQLModel, Field
+
+# SQLite only auto-increments a plain INTEGER primary key
+EventId = BigInteger().with_variant(Integer, "sqlite")
+
+class UserEvent(SQLModel, table=True):
+    """
+    Outbox of user changes. `id` follows insert order; `seq`, the feed offset,
+    is assigned after commit by the relay (services/user_events.py), so it
+    follows commit order and never skips over a transaction still in flight.
+    """
+    __tablename__ = "user_event"
+    __table_args__ = (
+        Index("ix_user_event_user_id_seq", "user_id", "seq"),
+        Index("ix_user_event_unsequenced", "id", postgresql_where=text("seq IS NULL"), sqlite_where=text("seq IS NULL")),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True, sa_type=EventId)
+    seq: Optional[int] = Field(default=None, unique=True, sa_type=BigInteger)
+    user_id: int = Field(nullable=False)
+    type: str = Field(nullable=False)
+    # JSON snapshot of the user's replicated fields after the change
+    payload: str = Field(nullable=False, sa_type=Text)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False, index=True)
@@ -0,0 +1,10 @@
+from sqlalchemy import BigInteger
+from sqlmodel import SQLModel, Field
+
+class UserStatCounter(SQLModel, table=True):
+    """Number of users per value of a dashboard dimension (role, status, signup_day, ...)."""
+    __tablename__ = "user_stat_counter"
+
+    dimension: str = Field(primary_key=True)
+    value: str = Field(primary_key=True)
+    count: int = Field(default=0, nullable=False, sa_type=BigInteger)
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
 from enum import Enum
+from sqlalchemy import Index, func
 from sqlmodel import SQLModel, Field
 
 class UserRole(str, Enum):
@@ -20,6 +21,9 @@ class UserStatus(str, Enum):
     blocked = "blocked"
 
 class User(SQLModel, table=True):
+    # Keyset pagination order for admin listings
+    __table_args__ = (Index("ix_user_created_at_id", "created_at", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True, index=True)
     username: str = Field(index=True, nullable=False, unique=True)
     email: str = Field(index=True, nullable=False, unique=True)
@@ -33,10 +37,13 @@ class User(SQLModel, table=True):
     creator_application_status: CreatorApplicationStatus = Field(default=CreatorApplicationStatus.none, nullable=False)
     status: UserStatus = Field(default=UserStatus.active, nullable=False)
     email_verified: bool = Field(default=False, nullable=False)
+    # Bumped on revocation/role changes; access tokens carry it as the "ver" claim
+    token_version: int = Field(default=0, nullable=False)
     last_login: Optional[datetime] = None
-    otp_code: Optional[str] = None
-    otp_expiry: Optional[datetime] = None
-    reset_otp: str = Field(default=None, nullable=True)
-    reset_otp_expiry: datetime = Field(default=None, nullable=True)
+    # Pending verification/reset codes live in verification_code (services/verification_codes.py)
     created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
-    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
+
+# Case-insensitive login lookups (expression indexes need the mapped columns)
+Index("ix_user_lower_username", func.lower(User.username))
+Index("ix_user_lower_email", func.lower(User.email))
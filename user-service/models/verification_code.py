@@ -0,0 +1,13 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+
+class VerificationCode(SQLModel, table=True):
+    """One pending code per user and purpose; only an HMAC of the code is stored."""
+    __tablename__ = "verification_code"
+
+    user_id: int = Field(primary_key=True)
+    purpose: str = Field(primary_key=True)  # "email" or "reset"
+    code_hash: str = Field(nullable=False)
+    attempts: int = Field(default=0, nullable=False)
+    expires_at: datetime = Field(nullable=False, index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow, nullable=False)
@@ -1,4 +1,248 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+"""
+Sliding-window-counter rate limiting.
 
-limiter = Limiter(key_func=get_remote_address)
+Each rule ("10/hour") keeps one counter per key per fixed window. A request
+is allowed while
+
+    previous_window_count * (1 - elapsed_fraction) + current_window_count <= limit
+
+which approximates a true sliding window with two integers per key. Counters
+live in a pluggable storage (RATE_LIMIT_STORAGE):
+
+- memory:   per-process dict (single worker)
+- shm:      fixed-size table in a shared memory file, for several workers on one host
+- postgres: rate_limit_counter table, for workers spread over several hosts
+            (also runs on SQLite, for tests and single-host development)
+
+Every attempt counts, including rejected ones, so a client hammering an
+endpoint stays blocked until it backs off.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import text
+from config.db import async_engine
+from models.rate_limit import RateLimitCounter  # registers the table for create_all
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory")
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+_default_shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+RATE_LIMIT_SHM_PATH = os.getenv("RATE_LIMIT_SHM_PATH", os.path.join(_default_shm_dir, "competa-ratelimit"))
+RATE_LIMIT_SHM_SLOTS = int(os.getenv("RATE_LIMIT_SHM_SLOTS", "65536"))
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rule(rule: str):
+    """"10/hour" -> (10, 3600)"""
+    count, period = rule.split("/")
+    return int(count), _PERIODS[period.strip().rstrip("s")]
+
+
+class MemoryStorage:
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    async def hit(self, key: str, window_start: int, window: int, cost: int = 1):
+        with self._lock:
+            cur_key = (key, window_start)
+            current = self._counts.get(cur_key, 0) + cost
+            self._counts[cur_key] = current
+            previous = self._counts.get((key, window_start - window), 0)
+            self._ops += 1
+            if self._ops % 10000 == 0:
+                self._purge(window_start - window)
+        return current, previous
+
+    def _purge(self, oldest_needed: int):
+        # Windows differ per rule, so only drop entries well past the longest one
+        cutoff = oldest_needed - _PERIODS["day"]
+        for k in [k for k in self._counts if k[1] < cutoff]:
+            del self._counts[k]
+
+
+class SharedMemoryStorage:
+    """
+    Open-addressed table of (key hash, window start, count) slots in a
+    memory-mapped file shared by all workers on the host, guarded by flock.
+    When a probe run is full the stalest slot is recycled, so under extreme
+    key cardinality limits err on the permissive side.
+    """
+
+    SLOT = struct.Struct("<QqI4x")
+    PROBES = 8
+
+    def __init__(self, path: str = RATE_LIMIT_SHM_PATH, slots: int = RATE_LIMIT_SHM_SLOTS):
+        self.slots = slots
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    def _find(self, h: int, window_start: int, create: bool):
+        base = (h ^ (window_start * 0x9E3779B97F4A7C15)) % self.slots
+        victim, victim_window = None, None
+        for i in range(self.PROBES):
+            idx = (base + i) % self.slots
+            slot_h, slot_window, count = self.SLOT.unpack_from(self._mm, idx * self.SLOT.size)
+            if slot_h == h and slot_window == window_start:
+                return idx, count
+            if create and (victim is None or slot_window < victim_window):
+                victim, victim_window = idx, slot_window
+        if not create:
+            return None, 0
+        return victim, 0
+
+    def _hit(self, key: str, window_start: int, window: int, cost: int):
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                idx, current = self._find(h, window_start, create=True)
+                current += cost
+                self.SLOT.pack_into(self._mm, idx * self.SLOT.size, h, window_start, current)
+                _, previous = self._find(h, window_start - window, create=False)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return current, previous
+
+    async def hit(self, key: str, window_start: int, window: int, cost: int = 1):
+        # A few microseconds under an uncontended flock; not worth a thread hop
+        return self._hit(key, window_start, window, cost)
+
+
+class PostgresStorage:
+    _HIT = text("""
+        WITH cur AS (
+            INSERT INTO rate_limit_counter (key, window_start, count, expires_at)
+            VALUES (:key, :window_start, :cost, :expires_at)
+            ON CONFLICT (key, window_start)
+            DO UPDATE SET count = rate_limit_counter.count + EXCLUDED.count
+            RETURNING count
+        )
+        SELECT (SELECT count FROM cur),
+               COALESCE((SELECT count FROM rate_limit_counter
+                         WHERE key = :key AND window_start = :previous_start), 0)
+    """)
+    # SQLite (tests, single-host dev) has no data-modifying CTEs: the same
+    # upsert, then a second read in the same transaction
+    _UPSERT = text("""
+        INSERT INTO rate_limit_counter (key, window_start, count, expires_at)
+        VALUES (:key, :window_start, :cost, :expires_at)
+        ON CONFLICT (key, window_start)
+        DO UPDATE SET count = rate_limit_counter.count + EXCLUDED.count
+        RETURNING count
+    """)
+    _PREVIOUS = text("SELECT count FROM rate_limit_counter WHERE key = :key AND window_start = :previous_start")
+    _PURGE = text("DELETE FROM rate_limit_counter WHERE expires_at < :now")
+
+    async def hit(self, key: str, window_start: int, window: int, cost: int = 1):
+        params = {
+            "key": key,
+            "window_start": window_start,
+            "previous_start": window_start - window,
+            "cost": cost,
+            "expires_at": window_start + 2 * window,
+        }
+        async with async_engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                current, previous = (await conn.execute(self._HIT, params)).one()
+            else:
+                current = (await conn.execute(self._UPSERT, params)).scalar_one()
+                previous = (await conn.execute(self._PREVIOUS, params)).scalar() or 0
+            if random.random() < 0.001:
+                await conn.execute(self._PURGE, {"now": int(time.time())})
+        return current, previous
+
+
+_storages = {
+    "memory": MemoryStorage,
+    "shm": SharedMemoryStorage,
+    "postgres": PostgresStorage,
+}
+
+
+class RateLimiter:
+    def __init__(self, storage):
+        self.storage = storage
+        self.checks = 0
+        self.rejected = 0
+        self.total_check_ms = 0.0
+
+    async def check(self, key: str, limit: int, window: int):
+        """Counts one hit for `key`; returns 0 when allowed, else seconds to wait."""
+        start = time.perf_counter()
+        now = time.time()
+        window_start = int(now // window) * window
+        current, previous = await self.storage.hit(key, window_start, window)
+        elapsed_fraction = (now - window_start) / window
+        estimate = previous * (1 - elapsed_fraction) + current
+        self.checks += 1
+        self.total_check_ms += (time.perf_counter() - start) * 1000
+        if estimate <= limit:
+            return 0
+        self.rejected += 1
+        return max(1, int(window_start + window - now))
+
+    def stats(self) -> dict:
+        return {
+            "storage": type(self.storage).__name__,
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "avg_check_ms": round(self.total_check_ms / self.checks, 4) if self.checks else 0.0,
+        }
+
+
+limiter = RateLimiter(_storages[RATE_LIMIT_STORAGE]())
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit(scope: str, rule: str, keys=("ip",)):
+    """
+    Dependency enforcing `rule` (e.g. "5/minute") on `scope` separately for
+    each key: "ip" is the client address, anything else names a field of the
+    JSON body (e.g. "email"), compared case-insensitively.
+    """
+    limit, window = parse_rule(rule)
+
+    async def check_rate_limit(request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+        body = None
+        for key in keys:
+            if key == "ip":
+                value = client_ip(request)
+            else:
+                if body is None:
+                    try:
+                        body = await request.json()
+                    except ValueError:
+                        body = {}
+                value = body.get(key) if isinstance(body, dict) else None
+                if not isinstance(value, str):
+                    continue
+                value = value.strip().lower()
+            retry_after = await limiter.check(f"{scope}:{key}:{value}", limit, window)
+            if retry_after:
+                raise HTTPException(429, "Too many requests, please try again later", headers={"Retry-After": str(retry_after)})
+
+    return Depends(check_rate_limit)
@@ -97,7 +97,9 @@ class MessageResponse(BaseModel):
 
 
 class AvatarResponse(BaseModel):
-    avatar_url: str
+    # Upload finishes in the background; the new URL shows up on /me
+    status: str = "processing"
+    avatar_url: Optional[str] = None
 
 class PublicUserProfile(BaseModel):
     username: str
@@ -109,3 +111,71 @@ class PublicUserProfile(BaseModel):
     creator_application_status: str
     status: str
     # Optionally: standing, ranking, etc.
+
+class UserFilter(BaseModel):
+    role: Optional[UserRole] = None
+    status: Optional[UserStatus] = None
+    country: Optional[str] = None
+    creator_application_status: Optional[CreatorApplicationStatus] = None
+
+class UserPage(BaseModel):
+    items: list[PublicUserProfile]
+    next_cursor: Optional[str] = None
+
+class UserCount(BaseModel):
+    count: int
+
+class DailyCount(BaseModel):
+    day: str
+    count: int
+
+class UserStats(BaseModel):
+    total: int
+    role: dict[str, int]
+    status: dict[str, int]
+    creator_application_status: dict[str, int]
+    country: dict[str, int]
+    email_verified: dict[str, int]
+    signups_per_day: list[DailyCount]
+    as_of: datetime
+
+class BulkUserAction(BaseModel):
+    # Target users by username, by id, or by filter (filter is ignored when a list is given)
+    usernames: list[str] = []
+    ids: list[int] = []
+    filter: Optional[UserFilter] = None
+    # Other admins are skipped unless set; the acting admin always is
+    include_admins: bool = False
+
+class BulkRoleAction(BulkUserAction):
+    role: UserRole
+
+class BulkOutcome(BaseModel):
+    id: Optional[int] = None
+    username: Optional[str] = None
+    outcome: str
+
+class BulkActionResponse(BaseModel):
+    updated: int
+    results: list[BulkOutcome]
+
+class ProfilerSettings(BaseModel):
+    enabled: bool
+    sample_rate: float = Field(1.0, gt=0, le=1)
+    interval_ms: float = Field(5.0, ge=1, le=1000)
+
+class UserLookupRequest(BaseModel):
+    ids: list[int] = []
+    usernames: list[str] = []
+
+class TokenBatchRequest(BaseModel):
+    tokens: list[str]
+
+class TokenVerdict(BaseModel):
+    valid: bool
+    userId: Optional[str] = None
+    role: Optional[str] = None
+    error: Optional[str] = None
+
+class TokenBatchResponse(BaseModel):
+    results: list[TokenVerdict]
@@ -1,66 +1,276 @@
+import base64
+import os
+from datetime import datetime
 from fastapi import HTTPException
-from sqlmodel import Session, select
+from sqlalchemy import func, tuple_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import async_engine
 from models.users import User
+from utils.cache import invalidate_user
+from utils.token_versions import token_versions
+from services.session_service import revoke_user_sessions
+from services.user_stats import DIMENSIONS as STAT_DIMENSIONS, apply_deltas, change_deltas, record_changes
+from services.user_events import ROLE_CHANGED, SNAPSHOT_COLUMNS, STATUS_EVENTS, event_relay, record_event, record_events
+from schemas.user_schemas import BulkUserAction, UserFilter
 
-def list_creator_applications(db: Session):
-    return db.exec(select(User).where(User.creator_application_status == "pending")).all()
+BULK_MAX = int(os.getenv("ADMIN_BULK_MAX", "1000"))
 
-def approve_creator(username: str, db: Session):
-    user = db.exec(select(User).where(User.username == username)).first()
+IS_POSTGRES = async_engine.dialect.name == "postgresql"
+
+# Columns needed for admin listings; password and OTP columns are never loaded
+PUBLIC_USER_COLUMNS = (
+    User.id,
+    User.username,
+    User.name,
+    User.country,
+    User.gender,
+    User.profile_photo_url,
+    User.role,
+    User.creator_application_status,
+    User.status,
+    User.created_at,
+)
+
+def apply_user_filters(stmt, filters: UserFilter):
+    if filters.role:
+        stmt = stmt.where(User.role == filters.role)
+    if filters.status:
+        stmt = stmt.where(User.status == filters.status)
+    if filters.country:
+        stmt = stmt.where(User.country == filters.country)
+    if filters.creator_application_status:
+        stmt = stmt.where(User.creator_application_status == filters.creator_application_status)
+    return stmt
+
+def encode_cursor(created_at: datetime, user_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{user_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, user_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(user_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+async def list_users(db: AsyncSession, filters: UserFilter, limit: int = 50, cursor: str = None):
+    """
+    One page of users ordered by (created_at, id), continuing after `cursor`.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    stmt = apply_user_filters(select(*PUBLIC_USER_COLUMNS), filters)
+    if cursor:
+        stmt = stmt.where(tuple_(User.created_at, User.id) > tuple_(*decode_cursor(cursor)))
+    stmt = stmt.order_by(User.created_at, User.id).limit(limit + 1)
+    rows = (await db.exec(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+async def count_users(db: AsyncSession, filters: UserFilter) -> int:
+    stmt = apply_user_filters(select(func.count()).select_from(User), filters)
+    return (await db.exec(stmt)).one()
+
+async def list_creator_applications(db: AsyncSession, limit: int = 50, cursor: str = None):
+    return await list_users(db, UserFilter(creator_application_status="pending"), limit, cursor)
+
+async def approve_creator(username: str, db: AsyncSession):
+    user = (await db.exec(select(User).where(User.username == username).with_for_update())).first()
     if not user:
         raise HTTPException(404, "User not found")
     if user.creator_application_status != "pending":
         raise HTTPException(400, "User is not pending approval")
+    await record_changes(db, ("creator_application_status", user.creator_application_status, "approved"), ("role", user.role, "creator"))
     user.creator_application_status = "approved"
     user.role = "creator"
+    user.token_version += 1
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, ROLE_CHANGED)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    token_versions.note(user.id, user.token_version)
+    invalidate_user(user.id, user.username)
+    event_relay.wake()
     return True
 
-def assign_role(username: str, new_role: str, db: Session):
-    user = db.exec(select(User).where(User.username == username)).first()
+async def assign_role(username: str, new_role: str, db: AsyncSession):
+    user = (await db.exec(select(User).where(User.username == username).with_for_update())).first()
     if not user:
         raise HTTPException(404, "User not found")
+    await record_changes(db, ("role", user.role, new_role))
     user.role = new_role
+    user.token_version += 1
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, ROLE_CHANGED)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    token_versions.note(user.id, user.token_version)
+    invalidate_user(user.id, user.username)
+    event_relay.wake()
     return True
 
-def suspend_user(username: str, db: Session):
-    user = db.exec(select(User).where(User.username == username)).first()
+async def suspend_user(username: str, db: AsyncSession):
+    user = (await db.exec(select(User).where(User.username == username).with_for_update())).first()
     if not user:
         raise HTTPException(404, "User not found")
+    await record_changes(db, ("status", user.status, "suspended"))
     user.status = "suspended"
+    user.token_version += 1
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, STATUS_EVENTS["suspended"])
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await revoke_user_sessions(db, [user.id])
+    await db.commit()
+    await db.refresh(user)
+    token_versions.note(user.id, user.token_version)
+    invalidate_user(user.id, user.username)
+    event_relay.wake()
     return True
 
-def reactivate_user(username: str, db: Session):
-    user = db.exec(select(User).where(User.username == username)).first()
+async def reactivate_user(username: str, db: AsyncSession):
+    user = (await db.exec(select(User).where(User.username == username).with_for_update())).first()
     if not user:
         raise HTTPException(404, "User not found")
+    await record_changes(db, ("status", user.status, "active"))
     user.status = "active"
+    user.token_version += 1
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, STATUS_EVENTS["active"])
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    token_versions.note(user.id, user.token_version)
+    invalidate_user(user.id, user.username)
+    event_relay.wake()
     return True
 
-def block_user(username: str, db: Session):
-    user = db.exec(select(User).where(User.username == username)).first()
+async def block_user(username: str, db: AsyncSession):
+    user = (await db.exec(select(User).where(User.username == username).with_for_update())).first()
     if not user:
         raise HTTPException(404, "User not found")
+    await record_changes(db, ("status", user.status, "blocked"))
     user.status = "blocked"
+    user.token_version += 1
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, STATUS_EVENTS["blocked"])
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await revoke_user_sessions(db, [user.id])
+    await db.commit()
+    await db.refresh(user)
+    token_versions.note(user.id, user.token_version)
+    invalidate_user(user.id, user.username)
+    event_relay.wake()
     return True
 
 # get all users - for admin dashboard
-def get_all_users(db: Session):
-    user=db.exec(select(User)).all()
-    if not user:
-        raise HTTPException(404, "No users found")
-    return user
+async def get_all_users(db: AsyncSession, filters: UserFilter, limit: int = 50, cursor: str = None):
+    return await list_users(db, filters, limit, cursor)
+
+
+async def bulk_update_users(target: BulkUserAction, values: dict, event_type: str, admin, db: AsyncSession, only_if=None):
+    """
+    Applies `values` to every targeted user with a single
+    UPDATE ... WHERE ... RETURNING in one transaction. `only_if` is an extra
+    condition (e.g. application still pending); matching users that fail it
+    are reported as "skipped". The acting admin is always skipped, other
+    admins unless target.include_admins. Each updated user gets an
+    `event_type` event. Returns (updated_count, per-user outcomes).
+    """
+    eligible = User.id != admin.id
+    if not target.include_admins:
+        eligible &= User.role != "admin"
+    only_if = eligible if only_if is None else (only_if & eligible)
+    if len(target.usernames) + len(target.ids) > BULK_MAX:
+        raise HTTPException(413, f"At most {BULK_MAX} users per bulk action")
+    if target.usernames or target.ids:
+        conds = []
+        if target.usernames:
+            conds.append(User.username.in_(target.usernames))
+        if target.ids:
+            conds.append(User.id.in_(target.ids))
+        where = conds[0] if len(conds) == 1 else (conds[0] | conds[1])
+    elif target.filter is not None:
+        where = apply_user_filters(select(User.id), target.filter).whereclause
+        if where is None:
+            raise HTTPException(400, "Refusing a bulk action without any filter")
+        # Same cap as explicit lists; the UPDATE then stays on these ids
+        ids = (await db.exec(select(User.id).where(where, only_if).limit(BULK_MAX + 1))).all()
+        if len(ids) > BULK_MAX:
+            raise HTTPException(413, f"Filter matches more than {BULK_MAX} users; narrow it down")
+        where = where & User.id.in_(ids)
+    else:
+        raise HTTPException(400, "Provide usernames, ids or a filter")
+
+    # The targets' previous values of the counted fields, so the dashboard
+    # counters move in the same transaction
+    counted = [f for f in STAT_DIMENSIONS if f in values]
+    old = select(User.id, *(getattr(User, f) for f in counted)).where(where, only_if)
+    new_values = dict(values, token_version=User.token_version + 1, updated_at=datetime.utcnow())
+    # RETURNING the event snapshot (id, username and token_version first)
+    returning = SNAPSHOT_COLUMNS
+    width = len(returning)
+    if IS_POSTGRES:
+        # One statement: the CTE locks the targets and hands their old values to RETURNING
+        old = old.with_for_update().cte("old")
+        stmt = update(User).where(User.id == old.c.id).values(**new_values).returning(*returning, *(old.c[f] for f in counted))
+        rows = (await db.exec(stmt.execution_options(synchronize_session=False))).all()
+    else:
+        # SQLite cannot return another table's columns; its writers are serialised anyway
+        previous = {row[0]: tuple(row[1:]) for row in (await db.exec(old)).all()}
+        stmt = update(User).where(User.id.in_(previous)).values(**new_values).returning(*returning)
+        rows = [(*row, *previous[row[0]]) for row in (await db.exec(stmt.execution_options(synchronize_session=False))).all()]
+    deltas = None
+    for row in rows:
+        deltas = change_deltas([(f, row[width + i], values[f]) for i, f in enumerate(counted)], deltas)
+    if deltas:
+        await apply_deltas(db, deltas)
+    await record_events(db, event_type, [row[:width] for row in rows])
+    if values.get("status") in ("suspended", "blocked") and rows:
+        await revoke_user_sessions(db, [row[0] for row in rows])
+    await db.commit()
+    updated = [tuple(row[:3]) for row in rows]
+    for user_id, username, version in updated:
+        token_versions.note(user_id, version)
+        invalidate_user(user_id, username)
+    event_relay.wake()
+
+    results = [{"id": user_id, "username": username, "outcome": "updated"} for user_id, username, _ in updated]
+    done_ids = {user_id for user_id, _, _ in updated}
+    done_names = {username for _, username, _ in updated}
+    missing_names = [u for u in dict.fromkeys(target.usernames) if u not in done_names]
+    missing_ids = [i for i in dict.fromkeys(target.ids) if i not in done_ids]
+    existing_names, existing_ids = set(), set()
+    if missing_names or missing_ids:
+        # Tell "exists but not eligible" apart from "no such user"
+        rows = (await db.exec(
+            select(User.id, User.username).where(User.username.in_(missing_names) | User.id.in_(missing_ids))
+        )).all()
+        existing_ids = {r.id for r in rows}
+        existing_names = {r.username for r in rows}
+    for username in missing_names:
+        results.append({"username": username, "outcome": "skipped" if username in existing_names else "not_found"})
+    for user_id in missing_ids:
+        results.append({"id": user_id, "outcome": "skipped" if user_id in existing_ids else "not_found"})
+    return len(updated), results
+
+async def bulk_assign_role(target: BulkUserAction, new_role: str, admin, db: AsyncSession):
+    return await bulk_update_users(target, {"role": new_role}, ROLE_CHANGED, admin, db)
+
+async def bulk_set_status(target: BulkUserAction, new_status: str, admin, db: AsyncSession):
+    return await bulk_update_users(target, {"status": new_status}, STATUS_EVENTS[new_status], admin, db)
+
+async def bulk_approve_creators(target: BulkUserAction, admin, db: AsyncSession):
+    return await bulk_update_users(
+        target,
+        {"creator_application_status": "approved", "role": "creator"},
+        ROLE_CHANGED,
+        admin,
+        db,
+        only_if=User.creator_application_status == "pending",
+    )
@@ -0,0 +1,73 @@
+import csv
+import io
+import os
+import zlib
+import orjson
+from datetime import datetime
+from enum import Enum
+from sqlmodel import select
+from config.db import async_session_maker
+from models.users import User
+from schemas.user_schemas import UserFilter
+from services.admin_service import PUBLIC_USER_COLUMNS, apply_user_filters
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+EXPORT_COLUMNS = PUBLIC_USER_COLUMNS + (User.email_verified, User.last_login, User.updated_at)
+EXPORT_FIELDS = [c.key for c in EXPORT_COLUMNS]
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_ndjson(rows) -> bytes:
+    # orjson encodes enums and datetimes itself
+    return b"".join(orjson.dumps(dict(zip(EXPORT_FIELDS, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def _encode_csv(rows, header: bool = False) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows([_plain(v) for v in row] for row in rows)
+    return buf.getvalue().encode()
+
+
+async def export_users(filters: UserFilter, fmt: str = "ndjson", compress: bool = False):
+    """
+    Yields the filtered users as NDJSON or CSV bytes, chunk by chunk, from a
+    server-side cursor. Opens its own session because the response body is
+    produced after request-scoped dependencies have been closed.
+    """
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    stmt = (
+        apply_user_filters(select(*EXPORT_COLUMNS), filters)
+        .order_by(User.created_at, User.id)
+        .execution_options(yield_per=EXPORT_CHUNK_ROWS)
+    )
+    first = True
+    async with async_session_maker() as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            if fmt == "csv":
+                chunk = _encode_csv(rows, header=first)
+            else:
+                chunk = _encode_ndjson(rows)
+            first = False
+            if gz:
+                chunk = gz.compress(chunk)
+            if chunk:
+                yield chunk
+    if fmt == "csv" and first:
+        # Empty export still gets a header row
+        chunk = _encode_csv([], header=True)
+        yield gz.compress(chunk) if gz else chunk
+    if gz:
+        yield gz.flush()
@@ -0,0 +1,59 @@
+"""
+Bulk id/username -> display data resolution for other services
+(leaderboards, contest rosters).
+
+Hits come from lookup_cache; the misses are resolved with one query
+projecting only the display columns. Users that do not exist are reported
+back rather than failing the whole request.
+"""
+import os
+from fastapi import HTTPException
+from sqlalchemy import or_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models.users import User
+from utils.cache import lookup_cache
+
+LOOKUP_MAX = int(os.getenv("LOOKUP_MAX", "5000"))
+
+DISPLAY_FIELDS = ("id", "username", "name", "country", "profile_photo_url", "role", "status")
+DISPLAY_COLUMNS = tuple(getattr(User, f) for f in DISPLAY_FIELDS)
+
+
+def _plain(row) -> tuple:
+    # Enum members -> their values, so cached rows serialise the same everywhere
+    return tuple(getattr(v, "value", v) for v in row)
+
+
+async def lookup_users(db: AsyncSession, ids: list, usernames: list):
+    """
+    Returns (rows, missing_ids, missing_usernames). Rows are DISPLAY_FIELDS
+    tuples in request order (ids first, then usernames), each user once.
+    """
+    ids = list(dict.fromkeys(ids))
+    usernames = list(dict.fromkeys(usernames))
+    if len(ids) + len(usernames) > LOOKUP_MAX:
+        raise HTTPException(413, f"At most {LOOKUP_MAX} ids and usernames per lookup")
+
+    found = lookup_cache.get_many(ids + usernames)
+    missing_ids = [i for i in ids if i not in found]
+    missing_names = [u for u in usernames if u not in found]
+    if missing_ids or missing_names:
+        conds = []
+        if missing_ids:
+            conds.append(User.id.in_(missing_ids))
+        if missing_names:
+            conds.append(User.username.in_(missing_names))
+        fetched = [_plain(r) for r in (await db.exec(select(*DISPLAY_COLUMNS).where(or_(*conds)))).all()]
+        lookup_cache.set_many([(r[0], r) for r in fetched] + [(r[1], r) for r in fetched])
+        for r in fetched:
+            found[r[0]] = r
+            found[r[1]] = r
+
+    rows, seen = [], set()
+    for key in ids + usernames:
+        row = found.get(key)
+        if row is not None and row[0] not in seen:
+            seen.add(row[0])
+            rows.append(row)
+    return rows, [i for i in ids if i not in found], [u for u in usernames if u not in found]
@@ -0,0 +1,253 @@
+import asyncio
+import os
+import smtplib
+from datetime import datetime, timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, or_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import async_session_maker
+from models.email_outbox import EmailOutbox, EmailStatus
+from utils.email import SMTPSession, build_message, otp_email, password_reset_email
+from utils.tracing import traced
+
+MAIL_DISPATCHER_ENABLED = os.getenv("MAIL_DISPATCHER_ENABLED", "true").lower() in ("1", "true", "yes")
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "1"))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "50"))
+MAIL_POLL_INTERVAL = float(os.getenv("MAIL_POLL_INTERVAL", "5"))
+MAIL_MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "5"))
+MAIL_RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "5"))
+MAIL_RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", "600"))
+# A claimed message is retried by another worker if not finished within this time
+MAIL_LEASE_SECONDS = float(os.getenv("MAIL_LEASE_SECONDS", "120"))
+# Finished rows (sent, failed, superseded) are deleted after this many days
+MAIL_RETENTION_DAYS = float(os.getenv("MAIL_RETENTION_DAYS", "7"))
+MAIL_RETENTION_SWEEP_SECONDS = float(os.getenv("MAIL_RETENTION_SWEEP_SECONDS", "3600"))
+MAIL_RETENTION_SWEEP_BATCH = int(os.getenv("MAIL_RETENTION_SWEEP_BATCH", "5000"))
+
+# Bodies carry one-time codes; once a row can no longer be sent its body is
+# overwritten with this, so the outbox never keeps a usable code around
+REDACTED_BODY = ""
+FINISHED = (EmailStatus.sent, EmailStatus.failed, EmailStatus.superseded)
+
+
+async def queue_email(db: AsyncSession, to_email: str, subject: str, body: str, dedupe_key: str = None):
+    """
+    Adds a message to the outbox in the caller's transaction; nothing is sent
+    until the caller commits. A pending message with the same dedupe_key is
+    superseded so only the latest one goes out.
+    """
+    if dedupe_key:
+        await db.exec(
+            update(EmailOutbox)
+            .where(EmailOutbox.dedupe_key == dedupe_key, EmailOutbox.status == EmailStatus.pending)
+            .values(status=EmailStatus.superseded, body=REDACTED_BODY)
+        )
+    db.add(EmailOutbox(to_email=to_email, subject=subject, body=body, dedupe_key=dedupe_key))
+
+async def queue_otp_email(db: AsyncSession, to_email: str, otp_code: str):
+    subject, body = otp_email(otp_code)
+    await queue_email(db, to_email, subject, body, dedupe_key=f"otp:{to_email}")
+
+async def queue_password_reset_email(db: AsyncSession, to_email: str, otp_code: str):
+    subject, body = password_reset_email(otp_code)
+    await queue_email(db, to_email, subject, body, dedupe_key=f"reset:{to_email}")
+
+
+def _send_batch(smtp: SMTPSession, batch):
+    """Runs on a worker thread; returns {id: error or None}."""
+    results = {}
+    seen = {}
+    for msg_id, to_email, subject, body in batch:
+        # Identical messages in one batch go out once
+        key = (to_email, subject, body)
+        if key in seen:
+            results[msg_id] = results[seen[key]]
+            continue
+        seen[key] = msg_id
+        try:
+            smtp.send(build_message(to_email, subject, body))
+            results[msg_id] = None
+        except smtplib.SMTPRecipientsRefused as e:
+            results[msg_id] = str(e)
+        except (smtplib.SMTPException, OSError) as e:
+            # Connection is in an unknown state; start the next send on a fresh one
+            smtp.close()
+            results[msg_id] = str(e)
+    return results
+
+
+class MailDispatcher:
+    """
+    Background workers that drain the email outbox. Rows are claimed with
+    FOR UPDATE SKIP LOCKED so several app processes can run dispatchers
+    against the same table.
+    """
+
+    def __init__(self, workers: int = MAIL_WORKERS, batch_size: int = MAIL_BATCH_SIZE):
+        self.workers = workers
+        self.batch_size = batch_size
+        self._tasks = []
+        self._wake = None
+        self._stopping = False
+        self.counters = {"sent": 0, "retried": 0, "failed": 0, "batches": 0}
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self):
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        self.wake()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def drain(self):
+        """Sends everything that is due right now; used by tools and benchmarks."""
+        smtp = SMTPSession()
+        try:
+            while await self._run_once(smtp):
+                pass
+        finally:
+            await run_in_threadpool(smtp.close)
+
+    async def _worker(self):
+        smtp = SMTPSession()
+        try:
+            while not self._stopping:
+                try:
+                    if await self._run_once(smtp):
+                        continue
+                except Exception as e:
+                    print("Mail dispatcher error:", e)
+                try:
+                    await asyncio.wait_for(self._wake.wait(), MAIL_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+        finally:
+            await run_in_threadpool(smtp.close)
+
+    async def _run_once(self, smtp: SMTPSession) -> bool:
+        batch = await self._claim()
+        if not batch:
+            return False
+        # Mail goes out here, not in the request that queued it: trace the batch on its own
+        with traced("mail batch"):
+            results = await run_in_threadpool(_send_batch, smtp, [(m.id, m.to_email, m.subject, m.body) for m in batch])
+            await self._finish(batch, results)
+        self.counters["batches"] += 1
+        return True
+
+    async def _claim(self):
+        now = datetime.utcnow()
+        async with async_session_maker() as db:
+            rows = (await db.exec(
+                select(EmailOutbox)
+                .where(
+                    or_(EmailOutbox.status == EmailStatus.pending, EmailOutbox.status == EmailStatus.sending),
+                    EmailOutbox.next_attempt_at <= now,
+                )
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                return []
+            await db.exec(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_([m.id for m in rows]))
+                .values(status=EmailStatus.sending, next_attempt_at=now + timedelta(seconds=MAIL_LEASE_SECONDS))
+            )
+            await db.commit()
+            return rows
+
+    async def _finish(self, batch, results):
+        now = datetime.utcnow()
+        sent_ids = [msg_id for msg_id, error in results.items() if error is None]
+        async with async_session_maker() as db:
+            if sent_ids:
+                await db.exec(
+                    update(EmailOutbox)
+                    .where(EmailOutbox.id.in_(sent_ids))
+                    .values(status=EmailStatus.sent, sent_at=now, last_error=None, body=REDACTED_BODY)
+                )
+                self.counters["sent"] += len(sent_ids)
+            for m in batch:
+                error = results.get(m.id)
+                if error is None:
+                    continue
+                attempts = m.attempts + 1
+                if attempts >= MAIL_MAX_ATTEMPTS:
+                    values = {"status": EmailStatus.failed, "attempts": attempts, "last_error": error, "body": REDACTED_BODY}
+                    self.counters["failed"] += 1
+                else:
+                    delay = min(MAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAIL_RETRY_MAX_SECONDS)
+                    values = {
+                        "status": EmailStatus.pending,
+                        "attempts": attempts,
+                        "last_error": error,
+                        "next_attempt_at": now + timedelta(seconds=delay),
+                    }
+                    self.counters["retried"] += 1
+                await db.exec(update(EmailOutbox).where(EmailOutbox.id == m.id).values(**values))
+            await db.commit()
+
+    def stats(self) -> dict:
+        return {"workers": len(self._tasks), "batch_size": self.batch_size, **self.counters}
+
+
+class OutboxSweeper:
+    """Deletes finished outbox rows older than `retention_days` every `interval` seconds, `batch` rows per statement."""
+
+    def __init__(self, retention_days: float = MAIL_RETENTION_DAYS,
+                 interval: float = MAIL_RETENTION_SWEEP_SECONDS, batch: int = MAIL_RETENTION_SWEEP_BATCH):
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch = batch
+        self._task = None
+        self.purged = 0
+
+    async def sweep(self) -> int:
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        expired = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.created_at < cutoff, EmailOutbox.status.in_(FINISHED))
+            .limit(self.batch)
+        )
+        total = 0
+        while True:
+            async with async_session_maker() as db:
+                deleted = (await db.exec(delete(EmailOutbox).where(EmailOutbox.id.in_(expired)))).rowcount
+                await db.commit()
+            total += deleted
+            if deleted < self.batch:
+                break
+            await asyncio.sleep(0)
+        self.purged += total
+        return total
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print("email outbox sweep failed:", e)
+
+
+mail_dispatcher = MailDispatcher()
+outbox_sweeper = OutboxSweeper()
@@ -0,0 +1,118 @@
+"""
+User search over username, name and country.
+
+Modes:
+
+- prefix:   autocomplete; `lower(col) LIKE 'q%'` on C-collated expression
+            indexes (btree prefix range scans)
+- contains: substring match on plain `lower(col)`, served by pg_trgm GIN
+            indexes (migrations 0008 and 0013)
+- fuzzy:    trigram similarity (typos), best matches first
+
+prefix/contains pages are ordered by (lower(username), id); fuzzy by
+(score desc, id). Both continue from an opaque cursor. On SQLite (local
+runs) fuzzy falls back to contains and the indexes are not used.
+"""
+import base64
+import os
+from fastapi import HTTPException
+from sqlalchemy import Float, and_, bindparam, func, literal, or_, tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import async_engine
+from models.users import User
+from schemas.user_schemas import UserFilter
+from services.admin_service import PUBLIC_USER_COLUMNS, apply_user_filters
+
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", "50"))
+# Trigram matching needs at least one full trigram to use the index
+SEARCH_MIN_SUBSTRING_LENGTH = 3
+
+IS_POSTGRES = async_engine.dialect.name == "postgresql"
+
+
+def _key(column):
+    # Must match the btree expression indexes of migration 0008 exactly to use them
+    expr = func.lower(column)
+    return expr.collate("C") if IS_POSTGRES else expr
+
+
+def _escape_like(q: str) -> str:
+    # "!" rather than backslash: no dialect-specific string escaping to worry about
+    return q.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def _encode(*parts) -> str:
+    return base64.urlsafe_b64encode("|".join(str(p) for p in parts).encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str, kind: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, value, user_id = raw.rsplit("|", 2)
+        if prefix != kind:
+            raise ValueError
+        return value, int(user_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+
+async def search_users(
+    db: AsyncSession,
+    q: str,
+    mode: str = "prefix",
+    limit: int = 20,
+    cursor: str = None,
+    filters: UserFilter = None,
+):
+    """Returns (rows with the public columns, next_cursor)."""
+    q = q.strip().lower()
+    if not q:
+        raise HTTPException(400, "Search query must not be empty")
+    if mode != "prefix" and len(q) < SEARCH_MIN_SUBSTRING_LENGTH:
+        raise HTTPException(400, f"Search query must be at least {SEARCH_MIN_SUBSTRING_LENGTH} characters for {mode} search")
+    limit = min(limit, SEARCH_MAX_LIMIT)
+    if mode == "fuzzy" and not IS_POSTGRES:
+        mode = "contains"
+
+    username_key = _key(User.username)
+    if mode == "fuzzy":
+        score = func.greatest(
+            func.similarity(func.lower(User.username), q),
+            func.similarity(func.lower(User.name), q),
+        ).label("score")
+        stmt = select(*PUBLIC_USER_COLUMNS, score).where(or_(
+            func.lower(User.username).op("%")(q),
+            func.lower(User.name).op("%")(q),
+        ))
+        if cursor:
+            last_score, last_id = _decode(cursor, "s")
+            try:
+                s = bindparam("last_score", float(last_score), type_=Float)
+            except ValueError:
+                raise HTTPException(400, "Invalid cursor")
+            stmt = stmt.where(or_(score < s, and_(score == s, User.id > last_id)))
+        stmt = stmt.order_by(score.desc(), User.id)
+    else:
+        if mode == "prefix":
+            pattern, match = _escape_like(q) + "%", _key
+        else:
+            # The trigram indexes are on plain lower(col): the C collation would bypass them
+            pattern, match = "%" + _escape_like(q) + "%", func.lower
+        stmt = select(*PUBLIC_USER_COLUMNS, username_key.label("username_key")).where(or_(
+            *(match(c).like(pattern, escape="!") for c in (User.username, User.name, User.country))
+        ))
+        if cursor:
+            last_key, last_id = _decode(cursor, "u")
+            stmt = stmt.where(tuple_(username_key, User.id) > tuple_(literal(last_key), literal(last_id)))
+        stmt = stmt.order_by(username_key, User.id)
+
+    if filters is not None:
+        stmt = apply_user_filters(stmt, filters)
+    rows = (await db.exec(stmt.limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode("s", repr(last.score), last.id) if mode == "fuzzy" else _encode("u", last.username_key, last.id)
+    return rows, next_cursor
@@ -0,0 +1,226 @@
+"""
+Server-side state for refresh tokens.
+
+Each refresh token carries a random `jti` and a family id (`fam`). The
+refresh_session table stores SHA-256(jti), never the token. Logging in opens
+a family; every refresh spends the presented token and issues its successor
+in the same family:
+
+- spending is one conditional UPDATE (unused, unrevoked, unexpired), so two
+  refreshes racing with the same token cannot both succeed
+- presenting a token that was already spent means someone else holds a
+  copy: the whole family is revoked, the thief's chain and the owner's alike.
+  Within REFRESH_REUSE_GRACE_SECONDS of the spend the request is only
+  refused, so two tabs refreshing at once do not log each other out.
+
+Revoked families are replicated into every worker's memory (incrementally on
+revoked_at, like utils/token_versions.py), so a revoked token is refused with
+one dict lookup before the database is touched. The same background task
+deletes expired sessions.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+import time
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import delete, func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import async_session_maker
+from models.refresh_session import RefreshSession
+
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "7"))
+REFRESH_REUSE_GRACE_SECONDS = float(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "10"))
+# Accept refresh tokens issued before sessions existed (no jti); each one
+# starts a new family. Only for the first REFRESH_TOKEN_DAYS after rolling
+# sessions out: such a token cannot be revoked until it is exchanged.
+REFRESH_ACCEPT_LEGACY = os.getenv("REFRESH_ACCEPT_LEGACY", "false").lower() == "true"
+REFRESH_REVOCATION_SYNC_SECONDS = float(os.getenv("REFRESH_REVOCATION_SYNC_SECONDS", "2"))
+REFRESH_SESSION_SWEEP_SECONDS = float(os.getenv("REFRESH_SESSION_SWEEP_SECONDS", "600"))
+REFRESH_SESSION_SWEEP_BATCH = int(os.getenv("REFRESH_SESSION_SWEEP_BATCH", "5000"))
+# Re-read a little before the watermark so rows written by hosts with a
+# slightly different clock are not missed
+REFRESH_REVOCATION_OVERLAP_SECONDS = 5
+
+INVALID = "Invalid or expired refresh token"
+
+logger = logging.getLogger(__name__)
+
+
+def hash_token_id(jti: str) -> str:
+    return hashlib.sha256(jti.encode()).hexdigest()
+
+
+def open_session(db: AsyncSession, user_id: int, family_id: str = None) -> dict:
+    """Stages a new session (a new family unless given); returns its jti/fam claims. The caller commits."""
+    jti = secrets.token_urlsafe(16)
+    family_id = family_id or uuid.uuid4().hex
+    now = datetime.utcnow()
+    db.add(RefreshSession(
+        id=hash_token_id(jti), family_id=family_id, user_id=user_id,
+        created_at=now, expires_at=now + timedelta(days=REFRESH_TOKEN_DAYS),
+    ))
+    return {"jti": jti, "fam": family_id}
+
+
+async def rotate_session(db: AsyncSession, jti: str, family_id: str) -> dict:
+    """Spends session `jti` and stages its successor; returns the new claims. The caller commits."""
+    # Revoked families are refused from memory, without a round trip
+    if session_revocations.is_revoked(family_id):
+        raise HTTPException(401, INVALID)
+    token_id = hash_token_id(jti)
+    now = datetime.utcnow()
+    spent = (await db.exec(
+        update(RefreshSession)
+        .where(
+            RefreshSession.id == token_id,
+            RefreshSession.used_at.is_(None),
+            RefreshSession.revoked_at.is_(None),
+            RefreshSession.expires_at > now,
+        )
+        .values(used_at=now)
+        .returning(RefreshSession.family_id, RefreshSession.user_id)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if spent is None:
+        row = (await db.exec(
+            select(RefreshSession.family_id, RefreshSession.used_at, RefreshSession.revoked_at)
+            .where(RefreshSession.id == token_id)
+        )).first()
+        if row is not None and row.revoked_at is None and row.used_at is not None \
+                and row.used_at < now - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS):
+            logger.warning("refresh token reuse detected, revoking family %s", row.family_id)
+            await revoke_family(db, row.family_id)
+            await db.commit()
+        raise HTTPException(401, INVALID)
+    family_id, user_id = spent
+    return open_session(db, user_id, family_id)
+
+
+async def revoke_family(db: AsyncSession, family_id: str):
+    """Stages revoking every session of a family; the caller commits."""
+    await db.exec(
+        update(RefreshSession)
+        .where(RefreshSession.family_id == family_id, RefreshSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    session_revocations.note(family_id, datetime.utcnow() + timedelta(days=REFRESH_TOKEN_DAYS))
+
+
+async def revoke_user_sessions(db: AsyncSession, user_ids):
+    """Stages revoking every live session of these users (logout everywhere, block); the caller commits."""
+    now = datetime.utcnow()
+    rows = (await db.exec(
+        update(RefreshSession)
+        .where(
+            RefreshSession.user_id.in_(list(user_ids)),
+            RefreshSession.revoked_at.is_(None),
+            RefreshSession.expires_at > now,
+        )
+        .values(revoked_at=now)
+        .returning(RefreshSession.family_id, RefreshSession.expires_at)
+        .execution_options(synchronize_session=False)
+    )).all()
+    for family_id, expires_at in rows:
+        session_revocations.note(family_id, expires_at)
+    return len(rows)
+
+
+class SessionRevocations:
+    """
+    In-memory set of revoked families, each kept until its newest session
+    expires. Refreshed incrementally on revoked_at, so staleness across
+    workers is bounded by the sync interval; revocations made by this
+    process are applied immediately via note(). Also sweeps expired sessions
+    every `sweep_interval` seconds.
+    """
+
+    def __init__(self, interval: float = REFRESH_REVOCATION_SYNC_SECONDS,
+                 sweep_interval: float = REFRESH_SESSION_SWEEP_SECONDS, batch: int = REFRESH_SESSION_SWEEP_BATCH):
+        self.interval = interval
+        self.sweep_interval = sweep_interval
+        self.batch = batch
+        self._families = {}
+        self._watermark = None
+        self._task = None
+        self._next_sweep = 0.0
+        self.purged = 0
+
+    def is_revoked(self, family_id: str) -> bool:
+        return family_id in self._families
+
+    def note(self, family_id: str, expires_at: datetime):
+        current = self._families.get(family_id)
+        if current is None or expires_at > current:
+            self._families[family_id] = expires_at
+
+    async def sync(self):
+        now = datetime.utcnow()
+        stmt = (
+            select(RefreshSession.family_id, func.max(RefreshSession.expires_at), func.max(RefreshSession.revoked_at))
+            .group_by(RefreshSession.family_id)
+        )
+        if self._watermark is None:
+            # First load: every revoked family that still has an unexpired session
+            watermark = now
+            stmt = stmt.where(RefreshSession.revoked_at.is_not(None), RefreshSession.expires_at > now)
+        else:
+            watermark = self._watermark
+            stmt = stmt.where(RefreshSession.revoked_at >= watermark - timedelta(seconds=REFRESH_REVOCATION_OVERLAP_SECONDS))
+        async with async_session_maker() as db:
+            rows = (await db.exec(stmt)).all()
+        for family_id, expires_at, revoked_at in rows:
+            self.note(family_id, expires_at)
+            if revoked_at > watermark:
+                watermark = revoked_at
+        self._watermark = watermark
+        # Expired families can no longer present a valid token
+        for family_id in [f for f, expires_at in self._families.items() if expires_at <= now]:
+            del self._families[family_id]
+
+    async def sweep(self) -> int:
+        """Deletes expired sessions, `batch` rows per statement; returns the count."""
+        expired = select(RefreshSession.id).where(RefreshSession.expires_at < datetime.utcnow()).limit(self.batch)
+        total = 0
+        while True:
+            async with async_session_maker() as db:
+                deleted = (await db.exec(delete(RefreshSession).where(RefreshSession.id.in_(expired)))).rowcount
+                await db.commit()
+            total += deleted
+            if deleted < self.batch:
+                break
+            await asyncio.sleep(0)
+        self.purged += total
+        return total
+
+    def stats(self) -> dict:
+        return {"revoked_families": len(self._families), "purged": self.purged}
+
+    async def start(self):
+        await self.sync()
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sync()
+                if time.monotonic() >= self._next_sweep:
+                    self._next_sweep = time.monotonic() + self.sweep_interval
+                    await self.sweep()
+            except Exception as e:
+                print("refresh session sync failed:", e)
+
+
+session_revocations = SessionRevocations()
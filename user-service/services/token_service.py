@@ -0,0 +1,90 @@
+import os
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from models.users import User
+from utils.auth import decode_access_token
+from utils.cache import token_cache
+from utils.token_versions import token_versions
+
+VALIDATE_BATCH_MAX = int(os.getenv("VALIDATE_BATCH_MAX", "500"))
+
+
+def parse_user_id(user_id_raw):
+    """The integer user id of a token's `sub` claim, or None when it is missing or not an integer."""
+    if isinstance(user_id_raw, bool):
+        return None
+    try:
+        return int(user_id_raw)
+    except (TypeError, ValueError):
+        return None
+
+
+# What validate-token reads per user. Cached as a dict so an entry is
+# self-describing: the response fields plus what the revocation checks need.
+TOKEN_USER_COLUMNS = (User.id, User.role, User.status, User.token_version)
+
+
+def token_cache_entry(user_id, role, status, token_version) -> dict:
+    return {"userId": str(user_id), "role": role, "status": status, "ver": token_version}
+
+
+def token_error(entry: dict, payload: dict):
+    """Why a decoded token is refused for the user described by `entry`, or None if it is valid."""
+    ver = payload.get("ver", 0)
+    # The in-memory map (AUTH_STATELESS) catches bumps made by other workers before this entry expires
+    if ver < entry["ver"] or not token_versions.is_current(int(entry["userId"]), ver):
+        return "Token revoked"
+    if entry["status"] != "active":
+        return "Account is not active"
+    if entry["role"] != payload.get("role"):
+        return "Token role mismatch"
+    return None
+
+
+async def validate_tokens_batch(tokens: list[str], db: AsyncSession):
+    """
+    Validates many access tokens at once. Users missing from the token cache
+    are resolved with a single `WHERE id IN (...)` query. Returns one verdict
+    per token, in input order.
+    """
+    results = [None] * len(tokens)
+    pending = {}  # user_id -> [(index, payload)]
+
+    for i, token in enumerate(tokens):
+        payload = decode_access_token(token)
+        if not payload:
+            results[i] = {"valid": False, "error": "Invalid or expired token"}
+            continue
+        # A malformed sub must not reach the IN (...) below, where it would fail the whole batch
+        user_id = parse_user_id(payload.get("sub"))
+        if user_id is None:
+            results[i] = {"valid": False, "error": "Invalid token payload"}
+            continue
+        pending.setdefault(user_id, []).append((i, payload))
+
+    resolved = {}
+    missing = []
+    for user_id in pending:
+        cached = token_cache.get(user_id)
+        if cached is None:
+            missing.append(user_id)
+        else:
+            resolved[user_id] = cached
+
+    if missing:
+        rows = (await db.exec(select(*TOKEN_USER_COLUMNS).where(User.id.in_(missing)))).all()
+        for row in rows:
+            entry = token_cache_entry(*row)
+            token_cache.set(row.id, entry)
+            resolved[row.id] = entry
+
+    for user_id, refs in pending.items():
+        entry = resolved.get(user_id)
+        for i, payload in refs:
+            error = "User not found" if entry is None else token_error(entry, payload)
+            if error:
+                results[i] = {"valid": False, "error": error}
+            else:
+                results[i] = {"valid": True, "userId": entry["userId"], "role": entry["role"]}
+
+    return results
@@ -0,0 +1,253 @@
+"""
+Transactional outbox of user changes, read by other services as a feed.
+
+Every service function that changes a replicated field stages a user_event
+row in its own transaction (record_event / record_events), carrying a full
+snapshot of the user's replicated fields. A consumer keeps a local replica
+by upserting snapshots by user id, in feed order.
+
+Feed offsets (`seq`) are handed out after commit by the relay, one worker
+at a time, in the order rows become visible. An offset therefore never
+appears behind a transaction that is still running, and "everything after
+my last seq" is exact. The relay also tracks the newest seq, and long-poll
+and SSE readers in this worker wait on it instead of polling the table.
+
+Retention is log compaction: events older than USER_EVENTS_COMPACT_AFTER_HOURS
+are deleted once a newer event exists for the same user. The latest
+snapshot of every user always stays, so reading from offset 0 rebuilds a
+full replica, and a consumer that fell behind still converges.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from operator import attrgetter
+import orjson
+from sqlalchemy import delete, exists, func, insert, text
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import async_engine, async_session_maker
+from models.user_event import UserEvent
+from models.users import User
+
+USER_EVENTS_RELAY_SECONDS = float(os.getenv("USER_EVENTS_RELAY_SECONDS", "0.2"))
+USER_EVENTS_RELAY_BATCH = int(os.getenv("USER_EVENTS_RELAY_BATCH", "5000"))
+USER_EVENTS_COMPACT_AFTER_HOURS = float(os.getenv("USER_EVENTS_COMPACT_AFTER_HOURS", "24"))
+USER_EVENTS_COMPACT_SECONDS = float(os.getenv("USER_EVENTS_COMPACT_SECONDS", "300"))
+USER_EVENTS_COMPACT_BATCH = int(os.getenv("USER_EVENTS_COMPACT_BATCH", "5000"))
+USER_EVENTS_MAX_LIMIT = int(os.getenv("USER_EVENTS_MAX_LIMIT", "1000"))
+USER_EVENTS_MAX_WAIT = float(os.getenv("USER_EVENTS_MAX_WAIT", "30"))
+USER_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("USER_EVENTS_HEARTBEAT_SECONDS", "15"))
+
+CREATED = "created"
+VERIFIED = "verified"
+PROFILE_UPDATED = "profile_updated"
+CREATOR_APPLIED = "creator_applied"
+ROLE_CHANGED = "role_changed"
+SUSPENDED = "suspended"
+BLOCKED = "blocked"
+REACTIVATED = "reactivated"
+TOKENS_REVOKED = "tokens_revoked"
+STATUS_EVENTS = {"suspended": SUSPENDED, "blocked": BLOCKED, "active": REACTIVATED}
+
+# Replicated fields; the first three double as bulk_update_users' RETURNING
+SNAPSHOT_FIELDS = (
+    "id", "username", "token_version", "name", "country", "profile_photo_url",
+    "role", "status", "creator_application_status", "email_verified", "updated_at",
+)
+SNAPSHOT_COLUMNS = tuple(getattr(User, f) for f in SNAPSHOT_FIELDS)
+_snapshot_values = attrgetter(*SNAPSHOT_FIELDS)
+
+IS_POSTGRES = async_engine.dialect.name == "postgresql"
+# Arbitrary constant: one worker sequences and compacts at a time
+_RELAY_LOCK_ID = 0x75657674
+
+
+def snapshot_payload(values) -> str:
+    return orjson.dumps(dict(zip(SNAPSHOT_FIELDS, values))).decode()
+
+
+def record_event(db: AsyncSession, user: User, event_type: str):
+    """Stages an event with the user's current (already modified) fields; the caller commits."""
+    db.add(UserEvent(user_id=user.id, type=event_type, payload=snapshot_payload(_snapshot_values(user))))
+
+
+async def record_events(db: AsyncSession, event_type: str, snapshots):
+    """Stages one event per row of SNAPSHOT_COLUMNS values (bulk actions); the caller commits."""
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": values[0], "type": event_type, "payload": snapshot_payload(values), "created_at": now}
+        for values in snapshots
+    ]
+    if rows:
+        await db.exec(insert(UserEvent), params=rows)
+
+
+def dump_event(row) -> bytes:
+    # The payload is stored as JSON already: splice it in rather than decode and re-encode it
+    head = orjson.dumps({"seq": row.seq, "type": row.type, "user_id": row.user_id, "at": row.created_at})
+    return head[:-1] + b',"data":' + row.payload.encode() + b"}"
+
+
+async def read_events(after: int, limit: int):
+    """Sequenced events after offset `after`, oldest first (own short session: callers may hold them open)."""
+    async with async_session_maker() as db:
+        return (await db.exec(
+            select(UserEvent.seq, UserEvent.type, UserEvent.user_id, UserEvent.created_at, UserEvent.payload)
+            .where(UserEvent.seq > after)
+            .order_by(UserEvent.seq)
+            .limit(limit)
+        )).all()
+
+
+def dump_event_page(rows, after: int, head: int) -> bytes:
+    next_offset = rows[-1].seq if rows else after
+    return (
+        b'{"events":[' + b",".join(dump_event(r) for r in rows)
+        + b'],"next":' + str(next_offset).encode() + b',"head":' + str(head).encode() + b"}"
+    )
+
+
+async def event_stream(after: int, batch: int = USER_EVENTS_MAX_LIMIT):
+    """Server-sent events from offset `after` on; the SSE id is the seq, so Last-Event-ID resumes."""
+    while True:
+        rows = await read_events(after, batch)
+        if rows:
+            yield b"".join(b"id: %d\nevent: %s\ndata: %s\n\n" % (r.seq, r.type.encode(), dump_event(r)) for r in rows)
+            after = rows[-1].seq
+            if len(rows) == batch:
+                continue
+        if not await event_relay.wait(after, USER_EVENTS_HEARTBEAT_SECONDS):
+            # Keeps proxies from closing an idle stream
+            yield b": keepalive\n\n"
+
+
+class EventRelay:
+    """
+    Every `interval` seconds, or right away after wake(): numbers newly
+    committed events (when this worker gets the relay lock), refreshes the
+    newest seq and wakes waiting readers. Compacts the log every
+    USER_EVENTS_COMPACT_SECONDS.
+    """
+
+    _SEQUENCE = text("""
+        UPDATE user_event SET seq = numbered.n
+        FROM (
+            SELECT id, :base + row_number() OVER (ORDER BY id) AS n
+            FROM user_event WHERE seq IS NULL ORDER BY id LIMIT :batch
+        ) AS numbered
+        WHERE user_event.id = numbered.id
+    """)
+
+    def __init__(self, interval: float = USER_EVENTS_RELAY_SECONDS, batch: int = USER_EVENTS_RELAY_BATCH):
+        self.interval = interval
+        self.batch = batch
+        self.head = 0
+        self.sequenced = 0
+        self.compacted = 0
+        self._advanced = asyncio.Event()
+        self._task = None
+        self._wake = None
+        self._next_compaction = 0.0
+
+    def wake(self):
+        """Called after committing events, so readers get them without waiting for the next tick."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _try_lock(self, db: AsyncSession) -> bool:
+        if not IS_POSTGRES:
+            return True  # SQLite serialises writers
+        return (await db.exec(text("SELECT pg_try_advisory_xact_lock(:id)").bindparams(id=_RELAY_LOCK_ID))).scalar()
+
+    async def relay(self) -> int:
+        """One pass; returns how many events were sequenced."""
+        sequenced = 0
+        async with async_session_maker() as db:
+            locked = await self._try_lock(db)
+            # Read after taking the lock: sees everything the previous holder numbered
+            head = (await db.exec(select(func.coalesce(func.max(UserEvent.seq), 0)))).one()
+            if locked:
+                result = await db.exec(self._SEQUENCE, params={"base": head, "batch": self.batch})
+                sequenced = result.rowcount
+                head += sequenced
+            await db.commit()
+        self.sequenced += sequenced
+        if head > self.head:
+            self.head = head
+            advanced, self._advanced = self._advanced, asyncio.Event()
+            advanced.set()
+        return sequenced
+
+    async def wait(self, after: int, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for an event past `after`; True if there is one."""
+        advanced = self._advanced
+        if self.head > after:
+            return True
+        try:
+            await asyncio.wait_for(advanced.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.head > after
+
+    async def compact(self, older_than: timedelta = timedelta(hours=USER_EVENTS_COMPACT_AFTER_HOURS),
+                      batch: int = USER_EVENTS_COMPACT_BATCH) -> int:
+        """Deletes old events superseded by a newer one for the same user; returns the count."""
+        horizon = datetime.utcnow() - older_than
+        newer = aliased(UserEvent)
+        superseded = (
+            select(UserEvent.id)
+            .where(
+                UserEvent.seq.is_not(None),
+                UserEvent.created_at < horizon,
+                exists().where(newer.user_id == UserEvent.user_id, newer.seq > UserEvent.seq),
+            )
+            .limit(batch)
+        )
+        total = 0
+        while True:
+            async with async_session_maker() as db:
+                if not await self._try_lock(db):
+                    return total
+                deleted = (await db.exec(delete(UserEvent).where(UserEvent.id.in_(superseded)))).rowcount
+                await db.commit()
+            total += deleted
+            if deleted < batch:
+                break
+            await asyncio.sleep(0)
+        self.compacted += total
+        return total
+
+    def stats(self) -> dict:
+        return {"head": self.head, "sequenced": self.sequenced, "compacted": self.compacted}
+
+    async def start(self):
+        self._next_compaction = time.monotonic() + USER_EVENTS_COMPACT_SECONDS
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                # Keep going without sleeping while a backlog is being numbered
+                if await self.relay() >= self.batch:
+                    continue
+                if time.monotonic() >= self._next_compaction:
+                    self._next_compaction = time.monotonic() + USER_EVENTS_COMPACT_SECONDS
+                    await self.compact()
+            except Exception as e:
+                print("user event relay failed:", e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+
+event_relay = EventRelay()
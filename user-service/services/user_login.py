@@ -1,42 +1,120 @@
-from utils.auth import create_access_token, create_refresh_token
-from sqlmodel import Session, select
+from utils.auth import AUTH_STATELESS, create_access_token, create_refresh_token, decode_refresh_token
+from utils.token_versions import token_versions
+from datetime import datetime
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import HTTPException
 from models.users import User
-from utils.password import verify_password
-
-def authenticate_user(username_or_email: str, password: str, db: Session):
-    user = db.exec(
-        select(User).where(
-            (User.username == username_or_email) | (User.email == username_or_email)
-        )
-    ).first()
-    if not user or not verify_password(password, user.password):
+from utils.cache import invalidate_profile
+from utils.password import verify_and_update_password_async
+from services.write_behind import last_login_buffer
+from services.user_stats import record_changes
+from services.user_events import CREATOR_APPLIED, event_relay, record_event
+from services.user_service import lock_user, revoke_user_tokens
+from services.session_service import (
+    INVALID, REFRESH_ACCEPT_LEGACY, REFRESH_TOKEN_DAYS, open_session, revoke_family, rotate_session,
+)
+
+async def find_login_user(username_or_email: str, db: AsyncSession):
+    """
+    One indexed lookup: usernames cannot contain "@", so the input decides
+    whether to probe lower(email) or lower(username).
+    """
+    value = username_or_email.strip().lower()
+    column = User.email if "@" in value else User.username
+    users = (await db.exec(select(User).where(func.lower(column) == value).limit(2))).all()
+    if len(users) == 1:
+        return users[0]
+    # Legacy rows that differ only by case: require the exact spelling
+    for user in users:
+        if getattr(user, column.key) == username_or_email:
+            return user
+    return None
+
+async def authenticate_user(username_or_email: str, password: str, db: AsyncSession):
+    user = await find_login_user(username_or_email, db)
+    if not user:
+        raise HTTPException(401, "Incorrect username/email or password")
+    verified, new_hash = await verify_and_update_password_async(password, user.password)
+    if not verified:
         raise HTTPException(401, "Incorrect username/email or password")
     if not user.email_verified:
         raise HTTPException(403, "Email is not verified")
     if user.status != "active":
         raise HTTPException(403, f"Account is {user.status}")
 
-    from datetime import datetime
-    user.last_login = datetime.utcnow()
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    # last_login is written behind in batches instead of a commit per login
+    last_login_buffer.record(user.id, datetime.utcnow())
+    if new_hash:
+        # Stored hash used an outdated bcrypt cost; upgrade it with this login
+        user.password = new_hash
+        db.add(user)
+    session = open_session(db, user.id)
+    await db.commit()
 
-    claims = {"sub": str(user.id), "username": user.username, "role": user.role}
+    claims = {"sub": str(user.id), "username": user.username, "role": user.role, "ver": user.token_version}
     access_token = create_access_token(claims)
-    refresh_token = create_refresh_token(claims)
+    refresh_token = create_refresh_token(dict(claims, **session), expires_days=REFRESH_TOKEN_DAYS)
     return access_token, refresh_token
 
-def apply_creator(user: User, db: Session):
+async def refresh_tokens(refresh_token: str, db: AsyncSession):
+    """Exchanges a refresh token for a new access token and the next refresh token of its family."""
+    payload = decode_refresh_token(refresh_token)
+    if not payload:
+        raise HTTPException(401, INVALID)
+    if "jti" not in payload and not REFRESH_ACCEPT_LEGACY:
+        raise HTTPException(401, INVALID)
+
+    user_id = int(payload["sub"])
+    if AUTH_STATELESS and token_versions.is_current(user_id, payload.get("ver", 0)):
+        claims = {"sub": payload["sub"], "username": payload["username"], "role": payload["role"], "ver": payload.get("ver", 0)}
+    else:
+        # Claims may be stale (role change, suspension): re-issue from the current row
+        user = await db.get(User, user_id)
+        if not user or user.status != "active":
+            raise HTTPException(401, INVALID)
+        claims = {"sub": str(user.id), "username": user.username, "role": user.role, "ver": user.token_version}
+
+    if "jti" in payload:
+        session = await rotate_session(db, payload["jti"], payload["fam"])
+    else:
+        # Issued before sessions existed: start tracking it as a new family
+        session = open_session(db, user_id)
+    await db.commit()
+    access_token = create_access_token(claims)
+    new_refresh_token = create_refresh_token(dict(claims, **session), expires_days=REFRESH_TOKEN_DAYS)
+    return access_token, new_refresh_token
+
+async def logout_session(refresh_token: str, db: AsyncSession):
+    """Revokes the refresh token's family; unknown or invalid tokens are ignored."""
+    payload = decode_refresh_token(refresh_token) if refresh_token else None
+    if payload and "fam" in payload:
+        await revoke_family(db, payload["fam"])
+        await db.commit()
+
+async def logout_all_sessions(user_id: int, db: AsyncSession) -> int:
+    """Signs the user out everywhere: refresh sessions and access tokens alike."""
+    user = await lock_user(db, user_id)
+    if not user:
+        return 0
+    return await revoke_user_tokens(db, user)
+
+async def apply_creator(user: User, db: AsyncSession):
+    user = await lock_user(db, user.id)
     if user.role != "user":
         raise HTTPException(403, "Only users can apply for creator role")
     if user.creator_application_status == "pending":
         raise HTTPException(400, "Creator application already pending")
     if user.creator_application_status == "approved":
         raise HTTPException(400, "Already approved as creator")
+    await record_changes(db, ("creator_application_status", user.creator_application_status, "pending"))
     user.creator_application_status = "pending"
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, CREATOR_APPLIED)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_profile(user.username, user.id)
+    event_relay.wake()
     return True
\ No newline at end of file
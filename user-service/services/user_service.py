@@ -1,22 +1,58 @@
-from sqlmodel import Session, select
-from datetime import datetime, timedelta
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import datetime
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from utils.otp import generate_otp
-from utils.email import send_otp_email
 from models.users import User
 from schemas.user_schemas import UserCreate
-from utils.password import hash_password, verify_password
-from utils.image import upload_profile_photo
-from utils.email import send_password_reset_email
+from utils.password import hash_password_async, verify_password_async
+from utils.image import AVATAR_MAX_BYTES, resize_avatar, upload_profile_photo
+from utils.storage import get_storage
+from config.db import async_session_maker
+from utils.cache import invalidate_profile, invalidate_user, profile_cache
+from utils.token_versions import token_versions
+from utils.serialization import dumps
+from services.mail_service import mail_dispatcher, queue_otp_email, queue_password_reset_email
+from services.verification_codes import EMAIL_VERIFICATION, PASSWORD_RESET, CodeResult, code_store
+from services.user_stats import record_changes, record_signup
+from services.user_events import CREATED, PROFILE_UPDATED, TOKENS_REVOKED, VERIFIED, event_relay, record_event
+from services.session_service import revoke_user_sessions
 
-def create_user(user_in: UserCreate, db: Session) -> User:
-    hashed_pw = hash_password(user_in.password)
+async def lock_user(db: AsyncSession, user_id: int):
+    """
+    Re-reads the user's row FOR UPDATE, refreshing the instance already in
+    the session. Changes that record an event go through this, so the
+    snapshot can't overwrite a concurrent admin change with stale fields.
+    """
+    return (await db.exec(
+        select(User).where(User.id == user_id).with_for_update().execution_options(populate_existing=True)
+    )).first()
+
+async def revoke_user_tokens(db: AsyncSession, user: User) -> int:
+    """
+    Bumps token_version, so every access token issued so far is refused
+    (stateless mode included), and revokes all refresh sessions. Commits;
+    returns the number of sessions revoked.
+    """
+    user.token_version += 1
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, TOKENS_REVOKED)
+    db.add(user)
+    revoked = await revoke_user_sessions(db, [user.id])
+    await db.commit()
+    token_versions.note(user.id, user.token_version)
+    invalidate_user(user.id, user.username)
+    event_relay.wake()
+    return revoked
+
+async def create_user(user_in: UserCreate, db: AsyncSession) -> User:
+    hashed_pw = await hash_password_async(user_in.password)
     avatar_url = None
     if user_in.profile_photo_url:
-        avatar_url = upload_profile_photo(user_in.profile_photo_url, public_id=f"user_{user_in.username}")
+        avatar_url = await run_in_threadpool(upload_profile_photo, user_in.profile_photo_url, public_id=f"user_{user_in.username}")
 
     otp = generate_otp()
-    expiry = datetime.utcnow() + timedelta(minutes=10)
     user = User(
         username=user_in.username,
         email=user_in.email,
@@ -26,111 +62,189 @@ def create_user(user_in: UserCreate, db: Session) -> User:
         phone=user_in.phone,
         password=hashed_pw,
         profile_photo_url=avatar_url,
-        otp_code=otp,
-        otp_expiry=expiry,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
-    send_otp_email(user.email, otp)
+    await db.flush()  # assigns user.id for the code
+    await code_store.issue(db, user.id, EMAIL_VERIFICATION, otp)
+    await queue_otp_email(db, user.email, otp)
+    await record_signup(db, user)
+    record_event(db, user, CREATED)
+    await db.commit()
+    await db.refresh(user)
+    mail_dispatcher.wake()
+    event_relay.wake()
     return user
 
-def verify_otp(user: User, otp_from_user: str, db: Session):
+async def verify_otp(user: User, otp_from_user: str, db: AsyncSession):
+    user = await lock_user(db, user.id)
     if user.email_verified:
         raise HTTPException(400, "Email already verified!")
-    if not user.otp_code or not user.otp_expiry:
+    result = await code_store.consume(db, user.id, EMAIL_VERIFICATION, otp_from_user)
+    if result == CodeResult.missing:
         raise HTTPException(400, "No OTP pending for user")
-    if datetime.utcnow() > user.otp_expiry:
+    if result == CodeResult.expired:
         raise HTTPException(400, "OTP expired, please request a new one")
-    if user.otp_code != otp_from_user:
+    if result == CodeResult.invalid:
         raise HTTPException(400, "Invalid OTP")
+    await record_changes(db, ("email_verified", False, True))
     user.email_verified = True
-    user.otp_code = None
-    user.otp_expiry = None
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, VERIFIED)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    event_relay.wake()
     return True
 
-def resend_otp(user: User, db: Session):
+async def resend_otp(user: User, db: AsyncSession):
     if user.email_verified:
         raise HTTPException(400, "Email already verified!")
     otp = generate_otp()
-    expiry = datetime.utcnow() + timedelta(minutes=10)
-    user.otp_code = otp
-    user.otp_expiry = expiry
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    send_otp_email(user.email, otp)
+    await code_store.issue(db, user.id, EMAIL_VERIFICATION, otp)
+    await queue_otp_email(db, user.email, otp)
+    await db.commit()
+    mail_dispatcher.wake()
     return True
 
-def send_password_reset_otp(email: str, db: Session):
-    user = db.exec(select(User).where(User.email == email)).first()
+async def send_password_reset_otp(email: str, db: AsyncSession):
+    user = (await db.exec(select(User).where(User.email == email))).first()
     if not user:
         raise HTTPException(404, "User not found")
     otp = generate_otp()
-    expiry = datetime.utcnow() + timedelta(minutes=10)
-    user.reset_otp = otp
-    user.reset_otp_expiry = expiry
-    db.add(user)
-    db.commit()
-    send_password_reset_email(user.email, otp)
+    await code_store.issue(db, user.id, PASSWORD_RESET, otp)
+    await queue_password_reset_email(db, user.email, otp)
+    await db.commit()
+    mail_dispatcher.wake()
     return True
 
-def reset_password(email: str, otp: str, new_password: str, db: Session):
-    user = db.exec(select(User).where(User.email == email)).first()
-    if not user or not user.reset_otp or not user.reset_otp_expiry:
+async def reset_password(email: str, otp: str, new_password: str, db: AsyncSession):
+    user = (await db.exec(select(User).where(User.email == email))).first()
+    if not user:
         raise HTTPException(400, "No password reset requested")
-    if user.reset_otp != otp or datetime.utcnow() > user.reset_otp_expiry:
+    result = await code_store.consume(db, user.id, PASSWORD_RESET, otp)
+    if result == CodeResult.missing:
+        raise HTTPException(400, "No password reset requested")
+    if result != CodeResult.ok:
         raise HTTPException(400, "Invalid or expired OTP")
-    user.password = hash_password(new_password)
-    user.reset_otp = None
-    user.reset_otp_expiry = None
-    db.add(user)
-    db.commit()
+    user = await lock_user(db, user.id)
+    user.password = await hash_password_async(new_password)
+    # Whoever knew the old password may still hold a token
+    await revoke_user_tokens(db, user)
     return True
 
-def get_me(user: User):
+async def get_me(user: User):
     return user
 
-def update_me(user: User, update_data: dict, db: Session):
+async def update_me(user: User, update_data: dict, db: AsyncSession):
+    user = await lock_user(db, user.id)
+    if "country" in update_data:
+        await record_changes(db, ("country", user.country, update_data["country"]))
     for k, v in update_data.items():
         setattr(user, k, v)
+    user.updated_at = datetime.utcnow()
+    record_event(db, user, PROFILE_UPDATED)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    invalidate_profile(user.username, user.id)
+    event_relay.wake()
     return user
 
-def change_password(user: User, old_password: str, new_password: str, db: Session):
-    if not verify_password(old_password, user.password):
+async def change_password(user: User, old_password: str, new_password: str, db: AsyncSession):
+    user = await lock_user(db, user.id)
+    if not await verify_password_async(old_password, user.password):
         raise HTTPException(400, "Old password incorrect")
-    user.password = hash_password(new_password)
-    db.add(user)
-    db.commit()
+    user.password = await hash_password_async(new_password)
+    # Whoever knew the old password may still hold a token
+    await revoke_user_tokens(db, user)
     return True
 
-def update_avatar(user: User, file, db: Session):
-    avatar_url = upload_profile_photo(file, public_id=f"user_{user.id}")
-    user.profile_photo_url = avatar_url
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return avatar_url
+async def read_upload(file, max_bytes: int = AVATAR_MAX_BYTES) -> bytes:
+    """Reads an UploadFile in chunks, refusing it as soon as it exceeds max_bytes."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(64 * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(413, f"Avatar must be at most {max_bytes // (1024 * 1024)} MB")
+        chunks.append(chunk)
+    return b"".join(chunks)
 
-def get_public_profile(username: str, db: Session):
-    user = db.exec(select(User).where(User.username == username)).first()
-    if not user:
-        raise HTTPException(404, "User not found")
+async def update_avatar(user: User, file, background_tasks):
+    """
+    Resizes the upload locally and schedules the storage upload; the user's
+    profile_photo_url is updated by store_avatar once the upload is done.
+    """
+    data = await read_upload(file)
+    try:
+        image, content_type = await run_in_threadpool(resize_avatar, data)
+    except ValueError:
+        raise HTTPException(400, "Unsupported or corrupt image")
+    background_tasks.add_task(store_avatar, user.id, image, content_type)
+    return True
+
+async def store_avatar(user_id: int, image: bytes, content_type: str):
+    avatar_url = await run_in_threadpool(get_storage().save, image, f"user_{user_id}", content_type)
+    async with async_session_maker() as db:
+        user = await lock_user(db, user_id)
+        if not user:
+            return
+        user.profile_photo_url = avatar_url
+        user.updated_at = datetime.utcnow()
+        record_event(db, user, PROFILE_UPDATED)
+        db.add(user)
+        await db.commit()
+        invalidate_profile(user.username, user.id)
+        event_relay.wake()
+
+PUBLIC_PROFILE_COLUMNS = (
+    User.id,
+    User.username,
+    User.name,
+    User.country,
+    User.gender,
+    User.profile_photo_url,
+    User.role,
+    User.creator_application_status,
+    User.status,
+    User.updated_at,
+)
+
+def public_profile_dict(row) -> dict:
     # Only return public fields
     return {
-        "username": user.username,
-        "name": user.name,
-        "country": user.country,
-        "gender": user.gender,
-        "profile_photo_url": user.profile_photo_url,
-        "role": user.role,
-        "creator_application_status": user.creator_application_status,
-        "status": user.status,
+        "username": row.username,
+        "name": row.name,
+        "country": row.country,
+        "gender": row.gender,
+        "profile_photo_url": row.profile_photo_url,
+        "role": row.role,
+        "creator_application_status": row.creator_application_status,
+        "status": row.status,
         # Optionally: current standing, ranking, etc.
-    }
\ No newline at end of file
+    }
+
+def profile_etag(row) -> str:
+    # Changes whenever the row does: every profile mutation bumps updated_at
+    return f'"{row.id}-{int(row.updated_at.timestamp() * 1_000_000)}"'
+
+async def get_public_profile(username: str, db: AsyncSession):
+    row = (await db.exec(select(*PUBLIC_PROFILE_COLUMNS).where(User.username == username))).first()
+    if not row:
+        raise HTTPException(404, "User not found")
+    return public_profile_dict(row)
+
+async def get_public_profile_cached(username: str, db: AsyncSession):
+    """Read-through cache of the serialised profile; returns (etag, json bytes)."""
+    cached = profile_cache.get(username)
+    if cached is not None:
+        return cached
+    row = (await db.exec(select(*PUBLIC_PROFILE_COLUMNS).where(User.username == username))).first()
+    if not row:
+        raise HTTPException(404, "User not found")
+    cached = (profile_etag(row), dumps(public_profile_dict(row)))
+    profile_cache.set(username, cached)
+    return cached
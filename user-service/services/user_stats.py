@@ -0,0 +1,209 @@
+"""
+Admin dashboard statistics, kept as counters instead of scanning users.
+
+user_stat_counter holds one row per (dimension, value): users per role,
+status, creator_application_status, country, email_verified and signup_day
+(UTC date). Service functions that change one of those fields stage a delta
+upsert in their own transaction, so a counter moves exactly when the user
+row does. Reading the stats costs one small query over the counter table,
+cached for USER_STATS_CACHE_SECONDS.
+
+Anything that bypasses the services (manual SQL, bulk imports) makes the
+counters drift; the reconciler recounts the user table every
+USER_STATS_RECONCILE_SECONDS, one worker at a time, and adds the difference
+to the counters as an ordinary delta upsert. Writers are never blocked.
+"""
+import asyncio
+import os
+from collections import Counter
+from datetime import date, datetime, timedelta
+from enum import Enum
+from sqlalchemy import func, or_, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import async_engine, async_session_maker
+from models.user_stats import UserStatCounter
+from models.users import User
+from utils.cache import TTLCache
+
+USER_STATS_CACHE_SECONDS = float(os.getenv("USER_STATS_CACHE_SECONDS", "5"))
+USER_STATS_RECONCILE_SECONDS = float(os.getenv("USER_STATS_RECONCILE_SECONDS", "3600"))
+USER_STATS_MAX_DAYS = int(os.getenv("USER_STATS_MAX_DAYS", "365"))
+
+DIMENSIONS = ("role", "status", "creator_application_status", "country", "email_verified")
+SIGNUP_DAY = "signup_day"
+
+IS_POSTGRES = async_engine.dialect.name == "postgresql"
+_insert = postgresql.insert if IS_POSTGRES else sqlite.insert
+# Arbitrary constant: only one worker reconciles at a time
+_RECONCILE_LOCK_ID = 0x75737473
+
+stats_cache = TTLCache(maxsize=64, ttl=USER_STATS_CACHE_SECONDS)
+
+
+def stat_value(value) -> str:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+async def apply_deltas(db: AsyncSession, deltas: Counter):
+    """Stages `(dimension, value) -> delta` upserts in `db`; the caller commits."""
+    rows = [
+        {"dimension": dimension, "value": value, "count": delta}
+        for (dimension, value), delta in sorted(deltas.items())  # fixed order: no lock-order deadlocks
+        if delta
+    ]
+    if not rows:
+        return
+    stmt = _insert(UserStatCounter).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserStatCounter.dimension, UserStatCounter.value],
+        set_={"count": UserStatCounter.count + stmt.excluded.count},
+    )
+    await db.exec(stmt)
+
+
+async def record_signup(db: AsyncSession, user: User):
+    deltas = Counter({(d, stat_value(getattr(user, d))): 1 for d in DIMENSIONS})
+    deltas[(SIGNUP_DAY, stat_value(user.created_at))] += 1
+    await apply_deltas(db, deltas)
+
+
+def change_deltas(changes, deltas: Counter = None) -> Counter:
+    """Adds `(dimension, old, new)` changes to `deltas`."""
+    deltas = Counter() if deltas is None else deltas
+    for dimension, old, new in changes:
+        old, new = stat_value(old), stat_value(new)
+        if old != new:
+            deltas[(dimension, old)] -= 1
+            deltas[(dimension, new)] += 1
+    return deltas
+
+
+async def record_changes(db: AsyncSession, *changes):
+    """Stages counter moves for `(dimension, old value, new value)` changes of one user."""
+    await apply_deltas(db, change_deltas(changes))
+
+
+async def get_stats(db: AsyncSession, days: int = 30) -> dict:
+    cached = stats_cache.get(days)
+    if cached is not None:
+        return cached
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    rows = (await db.exec(
+        select(UserStatCounter.dimension, UserStatCounter.value, UserStatCounter.count)
+        .where(or_(UserStatCounter.dimension != SIGNUP_DAY, UserStatCounter.value >= since))
+    )).all()
+    stats = {d: {} for d in DIMENSIONS}
+    signups = {}
+    for dimension, value, count in rows:
+        if dimension == SIGNUP_DAY:
+            if count:
+                signups[value] = count
+        elif dimension in stats and count:
+            stats[dimension][value] = count
+    stats["total"] = sum(stats["role"].values())
+    stats["signups_per_day"] = [{"day": day, "count": signups[day]} for day in sorted(signups)]
+    stats["as_of"] = datetime.utcnow()
+    stats_cache.set(days, stats)
+    return stats
+
+
+def _grouped(column):
+    return select(column, func.count()).select_from(User).group_by(column)
+
+
+class StatsReconciler:
+    """Recomputes the counters from the user table every `interval` seconds."""
+
+    def __init__(self, interval: float = USER_STATS_RECONCILE_SECONDS):
+        self.interval = interval
+        self._task = None
+        self.runs = 0
+        self.corrected = 0
+        self.last_run = None
+
+    async def reconcile(self) -> int:
+        """Returns how many counters were wrong (0 if another worker is reconciling)."""
+        async with async_engine.connect() as lock_conn:
+            if IS_POSTGRES:
+                # Session-level, so it spans both transactions below
+                locked = (await lock_conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": _RECONCILE_LOCK_ID})).scalar()
+                await lock_conn.commit()
+                if not locked:
+                    return 0
+            try:
+                drift = await self._drift()
+                if drift:
+                    # Relative to whatever the counters hold now, so deltas committed
+                    # since the snapshot are kept
+                    async with async_session_maker() as db:
+                        await apply_deltas(db, drift)
+                        await db.commit()
+            finally:
+                if IS_POSTGRES:
+                    await lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _RECONCILE_LOCK_ID})
+                    await lock_conn.commit()
+        self.runs += 1
+        self.corrected += len(drift)
+        self.last_run = datetime.utcnow()
+        stats_cache.clear()
+        return len(drift)
+
+    async def _drift(self) -> Counter:
+        """
+        `(dimension, value) -> true count - counter` as of one snapshot. A
+        mutation updates its user row and its counters in one transaction,
+        so within a snapshot they agree unless something bypassed the
+        services; no lock is needed to compare them.
+        """
+        async with async_engine.connect() as conn:
+            if IS_POSTGRES:
+                await conn.execution_options(isolation_level="REPEATABLE READ")
+                await conn.begin()
+            else:
+                # pysqlite does not hold a snapshot across SELECTs; take SQLite's
+                # (database-wide, single-writer) lock for the duration instead
+                await conn.exec_driver_sql("BEGIN IMMEDIATE")
+            fresh = Counter()
+            for dimension in DIMENSIONS:
+                for value, count in (await conn.execute(_grouped(getattr(User, dimension)))).all():
+                    fresh[(dimension, stat_value(value))] = count
+            day = func.date(User.created_at)
+            for value, count in (await conn.execute(_grouped(day))).all():
+                fresh[(SIGNUP_DAY, stat_value(value))] = count
+            current = Counter({
+                (dimension, value): count
+                for dimension, value, count in (await conn.execute(
+                    select(UserStatCounter.dimension, UserStatCounter.value, UserStatCounter.count)
+                )).all()
+            })
+            await conn.commit()
+        return Counter({key: fresh[key] - current[key] for key in fresh.keys() | current.keys() if fresh[key] != current[key]})
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                corrected = await self.reconcile()
+                if corrected:
+                    print(f"user stats reconciliation corrected {corrected} counters")
+            except Exception as e:
+                print("user stats reconciliation failed:", e)
+
+
+stats_reconciler = StatsReconciler()
@@ -0,0 +1,199 @@
+"""
+Short-lived verification codes (email verification, password reset), kept
+out of the user row.
+
+Codes are stored as an HMAC keyed with the server secret, so a leaked table
+does not reveal them (six digits would be trivial to brute-force from a
+plain hash). The email carrying a code is the only other copy: the outbox
+empties its body once it is sent, fails or is superseded
+(services/mail_service.py).
+
+Each (user, purpose) has at most one pending code; issuing a new one
+replaces it. After VERIFICATION_CODE_MAX_ATTEMPTS wrong guesses the code is
+dropped.
+
+VERIFICATION_STORE selects the backend:
+
+- database: verification_code table; issue() joins the caller's transaction,
+  so a code and the email carrying it are committed together
+- memory:   per-process TTL dict, for single-node deployments
+
+A background sweeper purges expired codes in batches.
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+from datetime import datetime, timedelta
+from enum import Enum
+from sqlalchemy import delete, tuple_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from config.db import async_session_maker
+from models.verification_code import VerificationCode
+
+VERIFICATION_STORE = os.getenv("VERIFICATION_STORE", "database")
+VERIFICATION_CODE_TTL_SECONDS = int(os.getenv("VERIFICATION_CODE_TTL_SECONDS", "600"))
+VERIFICATION_CODE_MAX_ATTEMPTS = int(os.getenv("VERIFICATION_CODE_MAX_ATTEMPTS", "5"))
+VERIFICATION_SWEEP_SECONDS = float(os.getenv("VERIFICATION_SWEEP_SECONDS", "60"))
+VERIFICATION_SWEEP_BATCH = int(os.getenv("VERIFICATION_SWEEP_BATCH", "1000"))
+_SECRET = (os.getenv("VERIFICATION_CODE_SECRET") or os.getenv("SECRET_KEY", "super-secret")).encode()
+
+EMAIL_VERIFICATION = "email"
+PASSWORD_RESET = "reset"
+
+
+class CodeResult(str, Enum):
+    ok = "ok"
+    missing = "missing"
+    expired = "expired"
+    invalid = "invalid"
+
+
+def hash_code(user_id: int, purpose: str, code: str) -> str:
+    return hmac.new(_SECRET, f"{purpose}:{user_id}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+class DatabaseCodeStore:
+    async def issue(self, db: AsyncSession, user_id: int, purpose: str, code: str, ttl: int = VERIFICATION_CODE_TTL_SECONDS):
+        """Stages the code in `db`; the caller commits."""
+        now = datetime.utcnow()
+        await db.merge(VerificationCode(
+            user_id=user_id,
+            purpose=purpose,
+            code_hash=hash_code(user_id, purpose, code),
+            attempts=0,
+            expires_at=now + timedelta(seconds=ttl),
+            created_at=now,
+        ))
+
+    async def consume(self, db: AsyncSession, user_id: int, purpose: str, code: str) -> CodeResult:
+        """
+        Deletes the code if it matches (staged in `db`; the caller commits with
+        its own changes). A wrong guess is recorded and committed right away,
+        since the caller is about to reject the request.
+        """
+        now = datetime.utcnow()
+        key = (VerificationCode.user_id == user_id, VerificationCode.purpose == purpose)
+        # Matching and consuming in one statement: two concurrent requests cannot both use a code
+        result = await db.exec(delete(VerificationCode).where(
+            *key,
+            VerificationCode.code_hash == hash_code(user_id, purpose, code),
+            VerificationCode.expires_at > now,
+            VerificationCode.attempts < VERIFICATION_CODE_MAX_ATTEMPTS,
+        ))
+        if result.rowcount:
+            return CodeResult.ok
+        row = (await db.exec(select(VerificationCode.expires_at, VerificationCode.attempts).where(*key))).first()
+        if row is None:
+            return CodeResult.missing
+        if row.expires_at <= now:
+            return CodeResult.expired
+        if row.attempts + 1 >= VERIFICATION_CODE_MAX_ATTEMPTS:
+            await db.exec(delete(VerificationCode).where(*key))
+        else:
+            await db.exec(update(VerificationCode).where(*key).values(attempts=VerificationCode.attempts + 1))
+        await db.commit()
+        return CodeResult.invalid
+
+    async def purge_expired(self, batch: int) -> int:
+        now = datetime.utcnow()
+        expired = (
+            select(VerificationCode.user_id, VerificationCode.purpose)
+            .where(VerificationCode.expires_at <= now)
+            .limit(batch)
+        )
+        async with async_session_maker() as db:
+            result = await db.exec(delete(VerificationCode).where(
+                tuple_(VerificationCode.user_id, VerificationCode.purpose).in_(expired)
+            ))
+            await db.commit()
+        return result.rowcount
+
+
+class MemoryCodeStore:
+    """Codes live in this process only: use with a single worker."""
+
+    def __init__(self):
+        self._codes = {}  # (user_id, purpose) -> [code_hash, expires_at, attempts]
+        self._lock = threading.Lock()
+
+    async def issue(self, db, user_id: int, purpose: str, code: str, ttl: int = VERIFICATION_CODE_TTL_SECONDS):
+        with self._lock:
+            self._codes[(user_id, purpose)] = [hash_code(user_id, purpose, code), datetime.utcnow() + timedelta(seconds=ttl), 0]
+
+    async def consume(self, db, user_id: int, purpose: str, code: str) -> CodeResult:
+        key = (user_id, purpose)
+        with self._lock:
+            entry = self._codes.get(key)
+            if entry is None:
+                return CodeResult.missing
+            code_hash, expires_at, attempts = entry
+            if expires_at <= datetime.utcnow():
+                del self._codes[key]
+                return CodeResult.expired
+            if hmac.compare_digest(code_hash, hash_code(user_id, purpose, code)):
+                del self._codes[key]
+                return CodeResult.ok
+            if attempts + 1 >= VERIFICATION_CODE_MAX_ATTEMPTS:
+                del self._codes[key]
+            else:
+                entry[2] = attempts + 1
+            return CodeResult.invalid
+
+    async def purge_expired(self, batch: int) -> int:
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [k for k, (_, expires_at, _) in self._codes.items() if expires_at <= now][:batch]
+            for k in expired:
+                del self._codes[k]
+        return len(expired)
+
+
+class CodeSweeper:
+    """Purges expired codes every `interval` seconds, `batch` rows per statement."""
+
+    def __init__(self, store, interval: float = VERIFICATION_SWEEP_SECONDS, batch: int = VERIFICATION_SWEEP_BATCH):
+        self.store = store
+        self.interval = interval
+        self.batch = batch
+        self._task = None
+        self.purged = 0
+
+    async def sweep(self) -> int:
+        total = 0
+        while True:
+            deleted = await self.store.purge_expired(self.batch)
+            total += deleted
+            if deleted < self.batch:
+                break
+            # Yield between batches so a large backlog does not hog the loop or the table
+            await asyncio.sleep(0)
+        self.purged += total
+        return total
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print("verification code sweep failed:", e)
+
+
+_stores = {
+    "database": DatabaseCodeStore,
+    "memory": MemoryCodeStore,
+}
+
+code_store = _stores[VERIFICATION_STORE]()
+code_sweeper = CodeSweeper(code_store)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, bindparam, column, or_, update, values
+from config.db import async_engine
+from models.users import User
+
+LAST_LOGIN_FLUSH_SECONDS = float(os.getenv("LAST_LOGIN_FLUSH_SECONDS", "10"))
+LAST_LOGIN_MAX_PENDING = int(os.getenv("LAST_LOGIN_MAX_PENDING", "5000"))
+# Rows per statement; keeps bind parameters well under the driver limit (32767)
+FLUSH_CHUNK_ROWS = 5000
+
+
+class WriteBehindBuffer:
+    """
+    Buffers low-value per-user timestamp writes (e.g. last_login) in memory
+    and flushes them as one batched UPDATE every `interval` seconds, or sooner
+    once `max_pending` users are waiting. Values are lost only if the process
+    dies without running stop(); readers may lag by up to `interval`.
+    """
+
+    def __init__(self, column_name: str, interval: float, max_pending: int):
+        self.column_name = column_name
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._task = None
+        self._flush_now = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def record(self, user_id: int, ts: datetime):
+        current = self._pending.get(user_id)
+        if current is None or ts > current:
+            self._pending[user_id] = ts
+        if len(self._pending) >= self.max_pending and self._flush_now is not None:
+            self._flush_now.set()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        target = getattr(User, self.column_name)
+        items = list(batch.items())
+        try:
+            async with async_engine.begin() as conn:
+                if conn.dialect.name == "postgresql":
+                    # UPDATE "user" SET col = v.ts FROM (VALUES ...) AS v(id, ts) WHERE "user".id = v.id
+                    for i in range(0, len(items), FLUSH_CHUNK_ROWS):
+                        v = values(column("id", Integer), column("ts", DateTime), name="v").data(items[i:i + FLUSH_CHUNK_ROWS])
+                        stmt = (
+                            update(User)
+                            .where(User.id == v.c.id, or_(target.is_(None), target < v.c.ts))
+                            .values({self.column_name: v.c.ts})
+                        )
+                        await conn.execute(stmt)
+                else:
+                    stmt = (
+                        update(User)
+                        .where(User.id == bindparam("uid"), or_(target.is_(None), target < bindparam("ts")))
+                        .values({self.column_name: bindparam("ts")})
+                    )
+                    await conn.execute(stmt, [{"uid": k, "ts": ts} for k, ts in items])
+        except Exception:
+            # Put the batch back (keeping newer values recorded meanwhile) and retry next round
+            for user_id, ts in batch.items():
+                self.record(user_id, ts)
+            raise
+        self.flushes += 1
+        self.rows_written += len(batch)
+
+    async def start(self):
+        self._flush_now = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"{self.column_name} flush failed:", e)
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "flushes": self.flushes, "rows_written": self.rows_written}
+
+
+last_login_buffer = WriteBehindBuffer("last_login", LAST_LOGIN_FLUSH_SECONDS, LAST_LOGIN_MAX_PENDING)
@@ -0,0 +1,133 @@
+"""
+Test setup: a throwaway SQLite database (or TEST_DATABASE_URL), migrated once per run and emptied
+after every test. Settings are read from the environment at import time, so
+it is prepared here before any application module is imported.
+
+Async tests use the anyio plugin (@pytest.mark.anyio) and the `db` fixture,
+which also disposes the engine's pool so no connection outlives the test's
+event loop.
+"""
+import os
+import smtplib
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="user-service-tests-")
+# TEST_DATABASE_URL runs the suite against a scratch Postgres instead; it is emptied after every test
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(_tmp, "test.db")
+os.environ.update({
+    "SECRET_KEY": "test-secret",
+    "BCRYPT_ROUNDS": "4",
+    "PASSWORD_POOL_WORKERS": "0",
+    "JWT_ALGORITHM": "HS256",
+    "DB_AUTO_MIGRATE": "false",
+    "MAIL_DISPATCHER_ENABLED": "false",
+    "RATE_LIMIT_ENABLED": "false",
+    "RATE_LIMIT_STORAGE": "memory",
+    "AVATAR_STORAGE": "local",
+    "AVATAR_LOCAL_DIR": os.path.join(_tmp, "avatars"),
+    "METRICS_MULTIPROC_DIR": "",
+})
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel
+from config.db import async_engine, async_session_maker, get_sync_engine, init_db
+import main  # noqa: F401  (imports every model, so the metadata is complete)
+from models.users import User
+from services.session_service import session_revocations
+from utils.cache import lookup_cache, profile_cache, token_cache
+from utils.email import SMTPSession
+from utils.password import hash_password
+from utils.token_versions import token_versions
+
+init_db()
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    yield
+    with get_sync_engine().begin() as conn:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            conn.execute(text(f'DELETE FROM "{table.name}"'))
+    for cache in (token_cache, profile_cache, lookup_cache):
+        cache.clear()
+    session_revocations._families.clear()
+    session_revocations._watermark = None
+    token_versions._versions.clear()
+    token_versions._watermark = None
+
+
+@pytest.fixture
+async def db():
+    async with async_session_maker() as session:
+        yield session
+    await async_engine.dispose()
+
+
+def new_user(username: str, **fields) -> User:
+    """An active, verified user row (not yet added to a session)."""
+    fields = dict({
+        "email": f"{username}@example.com", "name": "Test User", "country": "RW",
+        "gender": "female", "password": hash_password("Password1!"), "email_verified": True,
+    }, **fields)
+    return User(username=username, **fields)
+
+
+@pytest.fixture
+def make_user(db):
+    """Inserts a user through the test's async session; returns the committed row."""
+
+    async def make(username: str, **fields):
+        user = new_user(username, **fields)
+        db.add(user)
+        await db.commit()
+        await db.refresh(user)
+        return user
+
+    return make
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as c:
+        yield c
+        c.portal.call(async_engine.dispose)
+
+
+@pytest.fixture
+def add_user():
+    """Inserts a user synchronously, for tests that drive the app through `client`."""
+
+    def add(username: str, **fields):
+        with Session(get_sync_engine(), expire_on_commit=False) as session:
+            user = new_user(username, **fields)
+            session.add(user)
+            session.commit()
+            return user
+
+    return add
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    """Replaces the SMTP connection: collects the messages sent, refusing @bounce.test recipients."""
+    sent = []
+
+    def send(self, msg):
+        if msg["To"].endswith("@bounce.test"):
+            raise smtplib.SMTPRecipientsRefused({msg["To"]: (550, b"no such user")})
+        sent.append(msg)
+
+    monkeypatch.setattr(SMTPSession, "send", send)
+    monkeypatch.setattr(SMTPSession, "close", lambda self: None)
+    return sent
@@ -0,0 +1,105 @@
+import pytest
+from fastapi import HTTPException
+from sqlmodel import select
+from models.users import User
+from schemas.user_schemas import BulkUserAction, UserFilter
+from services import admin_service
+from services.admin_service import bulk_approve_creators, bulk_set_status
+from utils.token_versions import token_versions
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def admin(make_user):
+    return await make_user("root", role="admin")
+
+
+async def versions(db) -> dict:
+    db.expire_all()
+    return {u.username: (u.token_version, u.role, u.status) for u in (await db.exec(select(User))).all()}
+
+
+async def test_mixed_targets_report_an_outcome_each(db, make_user, admin):
+    ann = await make_user("ann", creator_application_status="pending")
+    ben = await make_user("ben", creator_application_status="pending")
+    await make_user("cat")  # never applied
+
+    updated, results = await bulk_approve_creators(
+        BulkUserAction(usernames=["ben", "cat", "ghost", "ben"], ids=[ann.id, 99999]), admin, db,
+    )
+
+    assert updated == 2
+    assert sorted(results, key=repr) == sorted([
+        {"id": ann.id, "username": "ann", "outcome": "updated"},
+        {"id": ben.id, "username": "ben", "outcome": "updated"},
+        {"username": "cat", "outcome": "skipped"},
+        {"username": "ghost", "outcome": "not_found"},
+        {"id": 99999, "outcome": "not_found"},
+    ], key=repr)
+    after = await versions(db)
+    assert after["ann"][:2] == (1, "creator")
+    assert after["ben"][:2] == (1, "creator")
+    assert after["cat"][:2] == (0, "user")
+
+
+async def test_filter_target_bumps_token_version_of_every_affected_user(db, make_user, admin):
+    for name in ("ke1", "ke2", "ke3"):
+        await make_user(name, country="KE")
+    await make_user("rw1", country="RW")
+    before = await versions(db)
+
+    updated, results = await bulk_set_status(BulkUserAction(filter=UserFilter(country="KE")), "suspended", admin, db)
+
+    assert updated == 3
+    assert {r["username"] for r in results} == {"ke1", "ke2", "ke3"}
+    after = await versions(db)
+    for name in ("ke1", "ke2", "ke3"):
+        assert after[name] == (before[name][0] + 1, "user", "suspended")
+    assert after["rw1"] == before["rw1"]
+    # Applied to this worker's in-memory map right away, not only after its next refresh
+    ids = {r["username"]: r["id"] for r in results}
+    assert not token_versions.is_current(ids["ke1"], before["ke1"][0])
+
+
+@pytest.mark.parametrize("target, detail", [
+    (BulkUserAction(filter=UserFilter()), "Refusing a bulk action without any filter"),
+    (BulkUserAction(), "Provide usernames, ids or a filter"),
+])
+async def test_untargeted_bulk_action_is_refused(db, make_user, admin, target, detail):
+    await make_user("ann")
+
+    with pytest.raises(HTTPException) as exc:
+        await bulk_set_status(target, "blocked", admin, db)
+
+    assert (exc.value.status_code, exc.value.detail) == (400, detail)
+    assert (await versions(db))["ann"] == (0, "user", "active")
+
+
+async def test_filter_matching_more_than_the_cap_is_refused(db, make_user, admin, monkeypatch):
+    monkeypatch.setattr(admin_service, "BULK_MAX", 2)
+    for name in ("ke1", "ke2", "ke3"):
+        await make_user(name, country="KE")
+
+    with pytest.raises(HTTPException) as exc:
+        await bulk_set_status(BulkUserAction(filter=UserFilter(country="KE")), "blocked", admin, db)
+
+    assert exc.value.status_code == 413
+    assert {v[2] for v in (await versions(db)).values()} == {"active"}
+
+
+async def test_admins_are_skipped_unless_included_and_never_the_caller(db, make_user, admin):
+    await make_user("ops", role="admin")
+    await make_user("ann")
+    everyone = UserFilter(status="active")
+
+    updated, results = await bulk_set_status(BulkUserAction(filter=everyone), "suspended", admin, db)
+    assert (updated, [r["username"] for r in results]) == (1, ["ann"])
+
+    updated, results = await bulk_set_status(
+        BulkUserAction(usernames=["root", "ops"], include_admins=True), "suspended", admin, db,
+    )
+    assert updated == 1
+    assert {r["username"]: r["outcome"] for r in results} == {"ops": "updated", "root": "skipped"}
+    after = await versions(db)
+    assert (after["root"][2], after["ops"][2]) == ("active", "suspended")
@@ -0,0 +1,21 @@
+import jwt
+from utils import auth
+
+
+def hs256_token(secret=auth.JWT_SECRET):
+    return jwt.encode({"sub": "1", "role": "user", "type": "access"}, secret, algorithm="HS256")
+
+
+def test_legacy_hs256_tokens_are_refused_by_default_after_switching(monkeypatch):
+    assert auth.JWT_ACCEPT_LEGACY_HS256 is False
+    monkeypatch.setattr(auth, "JWT_ALGORITHM", "EdDSA")
+
+    assert auth.decode_access_token(hs256_token()) is None
+
+
+def test_legacy_hs256_tokens_are_accepted_while_enabled(monkeypatch):
+    monkeypatch.setattr(auth, "JWT_ALGORITHM", "EdDSA")
+    monkeypatch.setattr(auth, "JWT_ACCEPT_LEGACY_HS256", True)
+
+    assert auth.decode_access_token(hs256_token())["sub"] == "1"
+    assert auth.decode_access_token(hs256_token("super-secret")) is None
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlmodel import select
+from models.email_outbox import EmailOutbox, EmailStatus
+from services.mail_service import OutboxSweeper, mail_dispatcher, queue_email
+
+pytestmark = pytest.mark.anyio
+
+
+async def rows(db):
+    db.expire_all()
+    return {m.to_email: m for m in (await db.exec(select(EmailOutbox))).all()}
+
+
+async def test_bodies_are_emptied_once_sent_failed_or_superseded(db, smtp):
+    await queue_email(db, "a@example.com", "s", "first code 111111", dedupe_key="otp:a@example.com")
+    await db.commit()
+    await queue_email(db, "a@example.com", "s", "second code 222222", dedupe_key="otp:a@example.com")
+    # Last attempt: the next refusal marks it failed
+    db.add(EmailOutbox(to_email="x@bounce.test", subject="s", body="code 333333", attempts=4))
+    await db.commit()
+
+    await mail_dispatcher.drain()
+
+    assert [m.get_content().strip() for m in smtp] == ["second code 222222"]
+    db.expire_all()
+    outboxed = (await db.exec(select(EmailOutbox.status, EmailOutbox.body).order_by(EmailOutbox.id))).all()
+    assert outboxed == [
+        (EmailStatus.superseded, ""),
+        (EmailStatus.sent, ""),
+        (EmailStatus.failed, ""),
+    ]
+
+
+async def test_retry_keeps_the_body(db, smtp):
+    db.add(EmailOutbox(to_email="y@bounce.test", subject="s", body="code 444444"))
+    await db.commit()
+
+    await mail_dispatcher.drain()
+
+    row = (await rows(db))["y@bounce.test"]
+    assert row.status == EmailStatus.pending
+    assert row.body == "code 444444"
+
+
+async def test_sweep_deletes_only_old_finished_rows(db):
+    old = datetime.utcnow() - timedelta(days=8)
+    db.add_all([
+        EmailOutbox(to_email="old-sent@example.com", subject="s", body="", status=EmailStatus.sent, created_at=old),
+        EmailOutbox(to_email="old-failed@example.com", subject="s", body="", status=EmailStatus.failed, created_at=old),
+        EmailOutbox(to_email="old-superseded@example.com", subject="s", body="", status=EmailStatus.superseded, created_at=old),
+        EmailOutbox(to_email="old-pending@example.com", subject="s", body="b", status=EmailStatus.pending, created_at=old),
+        EmailOutbox(to_email="new-sent@example.com", subject="s", body="", status=EmailStatus.sent),
+    ])
+    await db.commit()
+    sweeper = OutboxSweeper(retention_days=7, batch=2)
+
+    assert await sweeper.sweep() == 3
+
+    assert set(await rows(db)) == {"old-pending@example.com", "new-sent@example.com"}
+    assert sweeper.purged == 3
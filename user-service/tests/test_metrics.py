@@ -0,0 +1,74 @@
+import json
+import os
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from utils import metrics
+from utils.metrics import Metric, MetricsExporter, MetricsMiddleware, _merge, http_requests, render
+
+
+def worker(requests=0, in_flight=0, latencies=()):
+    """One worker's snapshot with a counter, a gauge and a histogram."""
+    counter = Metric("req_total", "Requests.", "counter", ("route",))
+    gauge = Metric("in_flight", "In flight.", "gauge")
+    histogram = Metric("latency_seconds", "Latency.", "histogram", ("route",), (0.1, 1.0))
+    counter.inc("/x", amount=requests)
+    gauge.set(value=in_flight)
+    for value in latencies:
+        histogram.observe("/x", value=value)
+    return {m.name: m.snapshot() for m in (counter, gauge, histogram)}
+
+
+def test_exited_workers_keep_counters_and_histograms_but_not_gauges():
+    merged = _merge([
+        (worker(requests=2, in_flight=1, latencies=(0.05,)), True),
+        (worker(requests=3, in_flight=7, latencies=(0.5, 2.0)), False),
+    ])
+
+    assert merged["req_total"]["values"] == {("/x",): 5}
+    assert merged["in_flight"]["values"] == {(): 1}
+    # Per-bucket counts, then sum and count
+    assert merged["latency_seconds"]["values"] == {("/x",): [1, 1, 2.55, 3]}
+
+
+def test_histogram_buckets_are_cumulative_with_an_inf_overflow():
+    text = render(worker(latencies=(0.05, 0.5, 0.7, 2.0)))
+
+    assert 'latency_seconds_bucket{route="/x",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/x",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/x"} 4' in text
+    assert "# TYPE latency_seconds histogram" in text
+
+
+def test_scrape_merges_other_workers_and_skips_half_written_files(tmp_path, monkeypatch):
+    key = ("GET", "/merged", "200")
+    monkeypatch.setattr(http_requests, "values", {key: 1})
+    monkeypatch.setattr(metrics, "_alive", lambda pid: False)
+    exited = {"http_requests_total": dict(http_requests.snapshot(), values=[[list(key), 4]])}
+    (tmp_path / "metrics-1000001.json").write_text(json.dumps(exited))
+    (tmp_path / "metrics-1000002.json").write_text(json.dumps(exited)[:25])
+
+    text = MetricsExporter(str(tmp_path), interval=60).scrape()
+
+    assert 'http_requests_total{method="GET",route="/merged",status="200"} 5' in text
+    # This worker's own snapshot was written for the others to merge
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+
+def test_requests_are_labelled_with_the_route_template(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {}
+
+    app.add_middleware(MetricsMiddleware)
+    monkeypatch.setattr(http_requests, "values", {})
+    with TestClient(app) as client:
+        client.get("/items/1")
+        client.get("/items/2")
+        client.get("/no/such/path")
+
+    assert http_requests.values == {("GET", "/items/{item_id}", "200"): 2, ("GET", "unmatched", "404"): 1}
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from utils import auth
+from services.user_login import logout_all_sessions
+from services.user_service import change_password, reset_password
+from services.verification_codes import PASSWORD_RESET, code_store
+
+pytestmark = pytest.mark.anyio
+
+
+def bearer(user):
+    token = auth.create_access_token({"sub": str(user.id), "username": user.username, "role": "user", "ver": user.token_version})
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+async def refused(request, db) -> bool:
+    try:
+        await auth.get_current_principal(request, db)
+    except HTTPException as e:
+        return e.status_code == 401
+    return False
+
+
+@pytest.fixture
+def stateless(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_STATELESS", True)
+
+
+async def test_reset_password_revokes_earlier_access_tokens(db, make_user, stateless):
+    alice = await make_user("alice")
+    request = bearer(alice)
+    assert not await refused(request, db)
+    await code_store.issue(db, alice.id, PASSWORD_RESET, "123456")
+    await db.commit()
+
+    await reset_password("alice@example.com", "123456", "NewPassword1!", db)
+
+    assert await refused(request, db)
+    assert not await refused(bearer(alice), db)
+
+
+async def test_change_password_revokes_earlier_access_tokens(db, make_user, stateless):
+    alice = await make_user("alice")
+    request = bearer(alice)
+
+    await change_password(alice, "Password1!", "NewPassword1!", db)
+
+    assert await refused(request, db)
+
+
+async def test_logout_all_revokes_earlier_access_tokens(db, make_user, stateless):
+    alice = await make_user("alice")
+    request = bearer(alice)
+
+    await logout_all_sessions(alice.id, db)
+
+    assert await refused(request, db)
@@ -0,0 +1,26 @@
+import pytest
+from utils import password
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(password, "PASSWORD_POOL_WORKERS", 1)
+    password.start_password_pool()
+    yield password._executor
+    password.shutdown_password_pool()
+
+
+async def test_pool_workers_are_spawned_not_forked(pool):
+    assert pool._mp_context.get_start_method() == "spawn"
+
+    hashed = await password.hash_password_async("Password1!")
+
+    assert await password.verify_password_async("Password1!", hashed)
+    assert not await password.verify_password_async("wrong", hashed)
+
+
+def test_shutdown_drops_the_pool(pool):
+    password.shutdown_password_pool()
+    assert password._executor is None
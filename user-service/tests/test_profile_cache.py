@@ -0,0 +1,39 @@
+import orjson
+import pytest
+from services.admin_service import approve_creator, suspend_user
+from services.user_login import apply_creator
+from services.user_service import get_public_profile_cached
+
+pytestmark = pytest.mark.anyio
+
+
+async def profile(db, username):
+    etag, body = await get_public_profile_cached(username, db)
+    return etag, orjson.loads(body)
+
+
+async def test_creator_application_refreshes_the_cached_profile(db, make_user):
+    alice = await make_user("alice")
+    etag, body = await profile(db, "alice")
+    assert body["creator_application_status"] == "none"
+
+    await apply_creator(alice, db)
+    applied_etag, body = await profile(db, "alice")
+    assert body["creator_application_status"] == "pending"
+    assert applied_etag != etag
+
+    await approve_creator("alice", db)
+    approved_etag, body = await profile(db, "alice")
+    assert (body["role"], body["creator_application_status"]) == ("creator", "approved")
+    assert approved_etag != applied_etag
+
+
+async def test_admin_status_change_refreshes_the_cached_profile(db, make_user):
+    await make_user("bob")
+    etag, _ = await profile(db, "bob")
+
+    await suspend_user("bob", db)
+
+    suspended_etag, body = await profile(db, "bob")
+    assert body["status"] == "suspended"
+    assert suspended_etag != etag
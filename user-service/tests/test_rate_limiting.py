@@ -0,0 +1,81 @@
+import time
+from types import SimpleNamespace
+import pytest
+import rate_limiting
+from config.db import async_engine
+from rate_limiting import MemoryStorage, PostgresStorage, RateLimiter, SharedMemoryStorage
+
+pytestmark = pytest.mark.anyio
+
+WINDOW = 60
+T0 = 1_800_000_000  # a window boundary (multiple of 60)
+
+
+@pytest.fixture(params=["memory", "shm", "database"])
+def limiter(request, tmp_path, db):
+    if request.param == "memory":
+        storage = MemoryStorage()
+    elif request.param == "shm":
+        storage = SharedMemoryStorage(str(tmp_path / "ratelimit"), slots=1024)
+    else:
+        # rate_limit_counter in whatever DATABASE_URL points to (SQLite here, Postgres in CI)
+        storage = PostgresStorage()
+    return RateLimiter(storage)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freezes the limiter's wall clock; set clock.now to move it."""
+    clock = SimpleNamespace(now=T0 + 1.0, perf_counter=time.perf_counter)
+    clock.time = lambda: clock.now
+    monkeypatch.setattr(rate_limiting, "time", clock)
+    return clock
+
+
+async def hits(limiter, key, n, limit=3):
+    return [await limiter.check(key, limit, WINDOW) for _ in range(n)]
+
+
+async def test_allows_up_to_the_limit_then_reports_seconds_to_wait(limiter, clock):
+    clock.now = T0 + 15.0
+
+    assert await hits(limiter, "k", 3) == [0, 0, 0]
+    assert await limiter.check("k", 3, WINDOW) == 45
+
+
+async def test_keys_are_counted_separately(limiter, clock):
+    assert await hits(limiter, "a", 4) == [0, 0, 0, 59]
+
+    assert await hits(limiter, "b", 3) == [0, 0, 0]
+
+
+async def test_previous_window_weighs_in_until_it_has_slid_past(limiter, clock):
+    assert await hits(limiter, "k", 4) == [0, 0, 0, 59]
+
+    # Just after the boundary the 4 previous hits still count almost fully
+    clock.now = T0 + WINDOW + 1.0
+    assert await limiter.check("k", 3, WINDOW) == 59
+
+    # Near the end of the window they have mostly slid out
+    clock.now = T0 + 2 * WINDOW - 3.0
+    assert await limiter.check("k", 3, WINDOW) == 0
+
+    # Two windows later nothing is left of them
+    clock.now = T0 + 3 * WINDOW + 1.0
+    assert await hits(limiter, "k", 3) == [0, 0, 0]
+
+
+def test_route_answers_429_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(rate_limiting, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limiting, "limiter", RateLimiter(MemoryStorage()))
+
+    # forgot-password allows 3 requests per hour per email address
+    codes = [client.post("/api/auth/forgot-password", json={"email": "nobody@example.com"}).status_code for _ in range(4)]
+    assert codes == [404, 404, 404, 429]
+    r = client.post("/api/auth/forgot-password", json={"email": "NOBODY@example.com "})
+    assert r.status_code == 429
+    assert 0 < int(r.headers["Retry-After"]) <= 3600
+
+    # Another address has its own budget
+    r = client.post("/api/auth/forgot-password", json={"email": "someone@example.com"})
+    assert r.status_code == 404
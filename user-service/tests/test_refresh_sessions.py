@@ -0,0 +1,123 @@
+import logging
+import pytest
+from fastapi import HTTPException
+from services import session_service
+from services.admin_service import block_user
+from services.session_service import SessionRevocations, session_revocations
+from services.user_login import authenticate_user, logout_all_sessions, logout_session, refresh_tokens
+from utils.auth import create_refresh_token, decode_refresh_token
+
+pytestmark = pytest.mark.anyio
+
+
+async def login(db, username="alice"):
+    _, refresh = await authenticate_user(username, "Password1!", db)
+    return refresh
+
+
+async def refresh(db, token):
+    _, new_token = await refresh_tokens(token, db)
+    return new_token
+
+
+async def refused(db, token) -> bool:
+    try:
+        await refresh_tokens(token, db)
+    except HTTPException as e:
+        assert e.status_code == 401
+        await db.rollback()
+        return True
+    return False
+
+
+async def test_each_refresh_rotates_within_the_family(db, make_user):
+    await make_user("alice")
+    first = await login(db)
+
+    second = await refresh(db, first)
+    third = await refresh(db, second)
+
+    claims = [decode_refresh_token(t) for t in (first, second, third)]
+    assert len({c["jti"] for c in claims}) == 3
+    assert len({c["fam"] for c in claims}) == 1
+
+
+async def test_reuse_within_the_grace_window_is_refused_without_revoking(db, make_user):
+    await make_user("alice")
+    first = await login(db)
+    second = await refresh(db, first)
+
+    # A second tab refreshing with the same token at the same time
+    assert await refused(db, first)
+
+    assert await refresh(db, second)
+
+
+async def test_reuse_after_the_grace_window_revokes_the_family(db, make_user, monkeypatch, caplog):
+    monkeypatch.setattr(session_service, "REFRESH_REUSE_GRACE_SECONDS", -1)
+    await make_user("alice")
+    other_login = await login(db)
+    stolen = await login(db)
+    owners = await refresh(db, stolen)
+
+    with caplog.at_level(logging.WARNING, logger="services.session_service"):
+        assert await refused(db, stolen)
+
+    assert "refresh token reuse detected" in caplog.text
+    assert await refused(db, owners)
+    # Other logins of the same user are a different family
+    assert await refresh(db, other_login)
+
+
+async def test_logout_revokes_only_that_login(db, make_user):
+    alice = await make_user("alice")
+    phone, laptop = await login(db), await login(db)
+
+    await logout_session(phone, db)
+
+    assert await refused(db, phone)
+    laptop = await refresh(db, laptop)
+
+    assert await logout_all_sessions(alice.id, db)
+    assert await refused(db, laptop)
+
+
+async def test_revocations_reach_other_workers_on_their_next_sync(db, make_user):
+    await make_user("alice")
+    token = await login(db)
+    family = decode_refresh_token(token)["fam"]
+    other_worker = SessionRevocations()
+    await other_worker.sync()
+    assert not other_worker.is_revoked(family)
+
+    await block_user("alice", db)
+
+    assert session_revocations.is_revoked(family)
+    await other_worker.sync()
+    assert other_worker.is_revoked(family)
+    assert await refused(db, token)
+
+
+async def test_tokens_without_a_session_are_refused_by_default(db, make_user):
+    alice = await make_user("alice")
+    legacy = create_refresh_token({"sub": str(alice.id), "username": "alice", "role": "user", "ver": 0})
+
+    assert await refused(db, legacy)
+
+
+def test_refresh_endpoint_rotates_the_cookie(client, add_user):
+    add_user("alice")
+    r = client.post("/api/auth/login", json={"username_or_email": "alice", "password": "Password1!"})
+    assert r.status_code == 200
+    first = r.cookies["refresh_token"]
+
+    # The cookie is Secure, so the http:// test client has to be handed it explicitly
+    r = client.post("/api/auth/refresh-token", cookies={"refresh_token": first})
+    assert r.status_code == 200
+    second = r.cookies["refresh_token"]
+    assert second != first
+
+    r = client.post("/api/auth/logout", cookies={"refresh_token": second})
+    assert r.status_code == 200
+    r = client.post("/api/auth/refresh-token", cookies={"refresh_token": second})
+    assert r.status_code == 401
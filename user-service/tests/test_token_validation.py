@@ -0,0 +1,76 @@
+import pytest
+from models.users import UserRole
+from services.admin_service import assign_role
+from services.token_service import validate_tokens_batch
+from utils.auth import create_access_token
+from utils.token_versions import token_versions
+
+pytestmark = pytest.mark.anyio
+
+
+def token_for(user, **claims):
+    data = {"sub": str(user.id), "role": UserRole(user.role).value, "ver": user.token_version}
+    data.update(claims)
+    return create_access_token(data)
+
+
+async def test_batch_marks_malformed_sub_invalid_without_failing_the_rest(db, make_user):
+    alice = await make_user("alice")
+    tokens = [
+        token_for(alice),
+        token_for(alice, sub="not-a-number"),
+        token_for(alice, sub="1.5"),
+        "garbage",
+    ]
+
+    results = await validate_tokens_batch(tokens, db)
+
+    assert results[0] == {"valid": True, "userId": str(alice.id), "role": "user"}
+    assert results[1] == {"valid": False, "error": "Invalid token payload"}
+    assert results[2] == {"valid": False, "error": "Invalid token payload"}
+    assert results[3] == {"valid": False, "error": "Invalid or expired token"}
+
+
+async def test_batch_rejects_tokens_older_than_the_users_token_version(db, make_user):
+    alice = await make_user("alice")
+    token = token_for(alice)
+    assert (await validate_tokens_batch([token], db))[0]["valid"]
+
+    # Role change bumps token_version and drops the cached entry
+    await assign_role("alice", "user", db)
+
+    assert await validate_tokens_batch([token], db) == [{"valid": False, "error": "Token revoked"}]
+
+
+async def test_batch_sees_bumps_from_other_workers_through_the_version_map(db, make_user):
+    alice = await make_user("alice")
+    token = token_for(alice)
+    assert (await validate_tokens_batch([token], db))[0]["valid"]
+
+    # Another worker bumped the version: this worker's cache entry is still warm
+    token_versions.note(alice.id, 1)
+
+    assert await validate_tokens_batch([token], db) == [{"valid": False, "error": "Token revoked"}]
+
+
+async def test_batch_rejects_inactive_users(db, make_user):
+    mallory = await make_user("mallory", status="blocked")
+
+    results = await validate_tokens_batch([token_for(mallory)], db)
+
+    assert results == [{"valid": False, "error": "Account is not active"}]
+
+
+def test_validate_token_is_refused_after_suspension(client, add_user):
+    alice = add_user("alice")
+    admin = add_user("root", role="admin")
+    headers = {"Authorization": f"Bearer {token_for(alice)}"}
+    r = client.get("/api/token/validate-token", headers=headers)
+    assert r.status_code == 200
+    assert r.json() == {"userId": str(alice.id), "role": "user"}
+
+    r = client.put("/api/admin/users/alice/suspend", headers={"Authorization": f"Bearer {token_for(admin)}"})
+    assert r.status_code == 200
+
+    r = client.get("/api/token/validate-token", headers=headers)
+    assert (r.status_code, r.json()["detail"]) == (401, "Token revoked")
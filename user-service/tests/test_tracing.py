@@ -0,0 +1,47 @@
+import pytest
+from utils import tracing
+from utils.tracing import Trace, TracingMiddleware, span
+
+pytestmark = pytest.mark.anyio
+
+
+def test_spans_past_the_cap_are_counted_not_kept(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_MAX_SPANS", 3)
+    trace = Trace("GET /x")
+
+    for i in range(5):
+        trace.add("db", float(i), float(i) + 0.001)
+    trace.finish()
+
+    assert len(trace.spans) == 3
+    assert trace.to_dict()["dropped_spans"] == 2
+    assert trace.breakdown()["db"]["count"] == 3
+
+
+async def call(path, headers=()):
+    """Runs one request through the middleware; returns whether the app ran inside a trace."""
+    seen = []
+
+    async def app(scope, receive, send):
+        with span("work"):
+            seen.append(tracing._current.get() is not None)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": path, "headers": list(headers)}
+    await TracingMiddleware(app)(scope, None, send)
+    return seen[0]
+
+
+async def test_long_polls_and_streams_are_not_traced(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 0)
+
+    assert await call("/api/auth/me")
+    assert not await call("/api/internal/events")
+    assert not await call("/api/internal/events/stream")
+    assert not await call("/api/admin/users/export")
+    assert not await call("/api/anything", headers=[(b"accept", b"text/event-stream")])
@@ -0,0 +1,48 @@
+from datetime import timedelta
+import orjson
+import pytest
+from sqlmodel import select
+from config.db import async_session_maker
+from models.users import User
+from services.admin_service import suspend_user
+from services.user_events import EventRelay, read_events
+from services.user_login import apply_creator
+from services.user_service import update_me
+
+pytestmark = pytest.mark.anyio
+
+
+async def compacted_snapshots(user_id):
+    relay = EventRelay()
+    await relay.relay()
+    await relay.compact(older_than=timedelta(0))
+    return [orjson.loads(row.payload) for row in await read_events(0, 100) if row.user_id == user_id]
+
+
+async def stale_then_suspended(db, username):
+    """Loads the user, then lets an admin suspend them from another session."""
+    user = (await db.exec(select(User).where(User.username == username))).first()
+    async with async_session_maker() as admin_db:
+        await suspend_user(username, admin_db)
+    return user
+
+
+async def test_profile_edit_after_admin_suspend_keeps_the_status(db, make_user):
+    await make_user("alice")
+    alice = await stale_then_suspended(db, "alice")
+    assert alice.status == "active"
+
+    await update_me(alice, {"name": "Alice A."}, db)
+
+    [latest] = await compacted_snapshots(alice.id)
+    assert (latest["name"], latest["status"]) == ("Alice A.", "suspended")
+
+
+async def test_creator_application_after_admin_suspend_keeps_the_status(db, make_user):
+    await make_user("bob")
+    bob = await stale_then_suspended(db, "bob")
+
+    await apply_creator(bob, db)
+
+    [latest] = await compacted_snapshots(bob.id)
+    assert (latest["creator_application_status"], latest["status"]) == ("pending", "suspended")
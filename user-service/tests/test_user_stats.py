@@ -0,0 +1,48 @@
+import pytest
+from services.admin_service import assign_role
+from services.user_stats import StatsReconciler, get_stats, stats_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def stats(db):
+    stats_cache.clear()
+    result = await get_stats(db)
+    return {d: result[d] for d in ("role", "status", "country", "total")}
+
+
+async def test_reconcile_fixes_counters_of_rows_written_behind_the_services_back(db, make_user):
+    # make_user inserts rows directly, so no counter has moved
+    await make_user("ann", country="KE")
+    await make_user("ben", country="RW", role="admin")
+    reconciler = StatsReconciler()
+
+    assert await reconciler.reconcile() > 0
+
+    assert await stats(db) == {
+        "role": {"user": 1, "admin": 1},
+        "status": {"active": 2},
+        "country": {"KE": 1, "RW": 1},
+        "total": 2,
+    }
+    assert await reconciler.reconcile() == 0
+
+
+async def test_changes_committed_after_the_snapshot_are_kept(db, make_user, monkeypatch):
+    await make_user("ann")
+    await make_user("ben")
+    reconciler = StatsReconciler()
+    recount = reconciler._drift
+
+    async def recount_then_concurrent_change():
+        drift = await recount()
+        # Commits its own counter delta after the recount, before the correction
+        await assign_role("ann", "creator", db)
+        return drift
+
+    monkeypatch.setattr(reconciler, "_drift", recount_then_concurrent_change)
+    await reconciler.reconcile()
+
+    assert (await stats(db))["role"] == {"user": 1, "creator": 1}
+    monkeypatch.undo()
+    assert await reconciler.reconcile() == 0
@@ -0,0 +1,41 @@
+import re
+import pytest
+from sqlalchemy import text
+from sqlmodel import SQLModel
+from schemas.user_schemas import UserCreate
+from services.mail_service import mail_dispatcher
+from services.user_service import create_user, send_password_reset_otp
+
+pytestmark = pytest.mark.anyio
+
+
+TIMESTAMP = re.compile(r"\d{4}-\d\d-\d\d[ T]\d\d:\d\d:\d\d(\.\d+)?$")
+
+
+async def database_text(db) -> str:
+    """Every value stored in every table, as one string (timestamps left out: their microseconds look like codes)."""
+    values = []
+    for table in SQLModel.metadata.sorted_tables:
+        for row in (await db.exec(text(f'SELECT * FROM "{table.name}"'))).all():
+            values.extend(str(v) for v in row if not (isinstance(v, str) and TIMESTAMP.match(v)))
+    return "\n".join(values)
+
+
+def code_in(message) -> str:
+    return re.search(r"is: (\d{6})", message.get_content()).group(1)
+
+
+async def test_no_plaintext_code_is_left_in_the_database_after_dispatch(db, smtp):
+    await create_user(UserCreate(
+        username="alice", email="alice@example.com", name="Alice", country="RW",
+        gender="female", password="Password1!",
+    ), db)
+    await send_password_reset_otp("alice@example.com", db)
+
+    await mail_dispatcher.drain()
+
+    codes = [code_in(m) for m in smtp]
+    assert len(codes) == 2
+    dump = await database_text(db)
+    for code in codes:
+        assert code not in dump
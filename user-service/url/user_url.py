@@ -3,9 +3,17 @@ from controllers.user_controller import router as user_router
 from controllers.user_login_controller import router as user_login_router
 from controllers.admin_controller import router as admin_router
 from controllers.valide import router as validate_router
+from controllers.jwks_controller import router as jwks_router
+from controllers.search_controller import router as search_router
+from controllers.internal_controller import router as internal_router
+from controllers.metrics_controller import router as metrics_router
 
 api_router = APIRouter()
 api_router.include_router(user_router, prefix="/api/auth", tags=["Authentication"])
 api_router.include_router(user_login_router, prefix="/api/auth", tags=["Authentication"])
 api_router.include_router(admin_router, prefix="/api/admin", tags=["Admin "])
-api_router.include_router(validate_router, prefix="/api/token", tags=["Authentication"])
\ No newline at end of file
+api_router.include_router(validate_router, prefix="/api/token", tags=["Authentication"])
+api_router.include_router(jwks_router, tags=["Authentication"])
+api_router.include_router(search_router, prefix="/api/users", tags=["Users"])
+api_router.include_router(internal_router, prefix="/api/internal", tags=["Internal"])
+api_router.include_router(metrics_router, tags=["Monitoring"])
@@ -1,32 +1,66 @@
+import hmac
 import os
 from fastapi import Request, Depends, HTTPException
-from jose import JWTError
 import jwt
 from datetime import datetime, timedelta
 from typing import Optional
-from config.db import get_session
-from sqlmodel import Session, select
+from config.db import async_session_maker, get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.users import User
+from utils.token_versions import token_versions
+from utils.jwt_keys import JWT_ALGORITHM, get_keyring
+from utils.tracing import span
 
 JWT_SECRET = os.getenv("SECRET_KEY", "super-secret")
-JWT_REFRESH_SECRET = os.getenv("SECRET_KEY", "super-refresh-secret")
-JWT_ALGORITHM = "HS256"
+# Refresh tokens are only ever verified here, so they stay HS256 with their own secret
+JWT_REFRESH_SECRET = os.getenv("REFRESH_SECRET_KEY") or os.getenv("SECRET_KEY", "super-refresh-secret")
+JWT_REFRESH_ALGORITHM = "HS256"
+# While switching HS256 -> RS256/EdDSA, keep accepting access tokens minted
+# before the switch. Off by default: anyone holding SECRET_KEY can mint those
+JWT_ACCEPT_LEGACY_HS256 = os.getenv("JWT_ACCEPT_LEGACY_HS256", "false").lower() in ("1", "true", "yes")
+if JWT_ALGORITHM != "HS256" and JWT_ACCEPT_LEGACY_HS256 and not os.getenv("SECRET_KEY"):
+    # The fallback secret is public, so accepting HS256 with it would accept forged tokens
+    raise RuntimeError("JWT_ACCEPT_LEGACY_HS256 needs an explicit SECRET_KEY")
+# Authorise from token claims + the in-memory token_version map, without
+# loading the user row on every request
+AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() in ("1", "true", "yes")
+# Shared key other services send as X-Internal-Key to call /api/internal routes
+INTERNAL_API_KEY = os.getenv("INTERNAL_API_KEY")
 
 def create_access_token(data: dict, expires_minutes: int = 30):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
     to_encode.update({"exp": expire, "type": "access"})
-    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    with span("jwt.sign"):
+        if JWT_ALGORITHM == "HS256":
+            return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+        kid, key = get_keyring().signing_key()
+        return jwt.encode(to_encode, key, algorithm=JWT_ALGORITHM, headers={"kid": kid})
 
 def create_refresh_token(data: dict, expires_days: int = 7):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=expires_days)
     to_encode.update({"exp": expire, "type": "refresh"})
-    return jwt.encode(to_encode, JWT_REFRESH_SECRET, algorithm=JWT_ALGORITHM)
+    with span("jwt.sign"):
+        return jwt.encode(to_encode, JWT_REFRESH_SECRET, algorithm=JWT_REFRESH_ALGORITHM)
 
 def decode_access_token(token: str) -> Optional[dict]:
+    with span("jwt.verify"):
+        return _decode_access_token(token)
+
+def _decode_access_token(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid and JWT_ALGORITHM != "HS256":
+            key = get_keyring().public_key(kid)
+            if key is None:
+                return None
+            payload = jwt.decode(token, key, algorithms=[JWT_ALGORITHM])
+        elif JWT_ALGORITHM == "HS256" or JWT_ACCEPT_LEGACY_HS256:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        else:
+            return None
         if payload.get("type") != "access":
             return None
         return payload
@@ -35,29 +69,83 @@ def decode_access_token(token: str) -> Optional[dict]:
 
 def decode_refresh_token(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, JWT_REFRESH_SECRET, algorithms=[JWT_ALGORITHM])
+        with span("jwt.verify"):
+            payload = jwt.decode(token, JWT_REFRESH_SECRET, algorithms=[JWT_REFRESH_ALGORITHM])
         if payload.get("type") != "refresh":
             return None
         return payload
     except jwt.PyJWTError:
         return None
 
-def get_current_user(request: Request, db: Session = Depends(get_session)):
+class AuthPrincipal:
+    """The caller as described by a verified access token (no DB row loaded)."""
+
+    def __init__(self, id: int, username: str, role: str, token_version: int):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.token_version = token_version
+
+    async def load(self, db: AsyncSession) -> User:
+        user = await db.get(User, self.id)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        return user
+
+def _bearer_payload(request: Request) -> dict:
     auth: str = request.headers.get("Authorization")
     if not auth or not auth.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Not authenticated")
-    token = auth.split(" ")[1]
+    payload = decode_access_token(auth.split(" ")[1])
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except JWTError:
+        payload["sub"] = int(payload.get("sub"))
+    except (TypeError, ValueError):
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = db.exec(select(User).where(User.id == user_id)).first()
+    return payload
+
+async def get_current_principal(request: Request, db: AsyncSession = Depends(get_session)):
+    """
+    Identity and role of the caller. In stateless mode this never touches the
+    DB; otherwise it is the full user row, same as get_current_user.
+    """
+    if not AUTH_STATELESS:
+        return await get_current_user(request, db)
+    payload = _bearer_payload(request)
+    if not token_versions.is_current(payload["sub"], payload.get("ver", 0)):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return AuthPrincipal(payload["sub"], payload.get("username"), payload.get("role"), payload.get("ver", 0))
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_session)):
+    payload = _bearer_payload(request)
+    if AUTH_STATELESS and not token_versions.is_current(payload["sub"], payload.get("ver", 0)):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    user = (await db.exec(select(User).where(User.id == payload["sub"]))).first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    if payload.get("ver", 0) < user.token_version:
+        raise HTTPException(status_code=401, detail="Token revoked")
     return user    
 
-def require_admin(user=Depends(get_current_user)):
+async def require_admin(user=Depends(get_current_principal)):
     if user.role != "admin":
         raise HTTPException(403, "Admin privileges required")
-    return user
\ No newline at end of file
+    return user
+
+async def require_internal(request: Request):
+    """
+    Service-to-service routes: a valid X-Internal-Key, or else an admin bearer
+    token. Uses its own short session so long-polling callers do not keep a
+    pooled connection checked out.
+    """
+    key = request.headers.get("X-Internal-Key")
+    if key is not None:
+        if INTERNAL_API_KEY and hmac.compare_digest(key.encode(), INTERNAL_API_KEY.encode()):
+            return None
+        raise HTTPException(status_code=401, detail="Invalid internal key")
+    async with async_session_maker() as db:
+        principal = await get_current_principal(request, db)
+    if principal.role != "admin":
+        raise HTTPException(403, "Admin privileges required")
+    return principal
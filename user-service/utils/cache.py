@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, keys) -> dict:
+        """The live entries among `keys`, under one lock acquisition."""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None or entry[0] < now:
+                    self.misses += 1
+                    continue
+                self._data.move_to_end(key)
+                self.hits += 1
+                found[key] = entry[1]
+        return found
+
+    def set_many(self, items):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in items:
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# {userId, role, status, ver} of /api/token/validate-token, keyed by user id.
+# Every token_version bump invalidates the entry in this process; the TTL
+# (or, with AUTH_STATELESS, the token_version map) bounds how long other
+# workers can keep accepting a revoked token.
+token_cache = TTLCache(
+    maxsize=int(os.getenv("TOKEN_CACHE_MAXSIZE", "10000")),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL", "30")),
+)
+
+# Pre-serialised public profile JSON (etag, body bytes), keyed by username
+profile_cache = TTLCache(
+    maxsize=int(os.getenv("PROFILE_CACHE_MAXSIZE", "10000")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL", "60")),
+)
+
+# Display rows for the internal bulk lookup, stored under both the user id
+# (int) and the username (str) so either kind of key is a hit
+lookup_cache = TTLCache(
+    maxsize=int(os.getenv("LOOKUP_CACHE_MAXSIZE", "50000")),
+    ttl=float(os.getenv("LOOKUP_CACHE_TTL", "60")),
+)
+
+
+def invalidate_user(user_id, username=None):
+    token_cache.invalidate(user_id)
+    lookup_cache.invalidate(user_id)
+    if username is not None:
+        profile_cache.invalidate(username)
+        lookup_cache.invalidate(username)
+
+
+def invalidate_profile(username, user_id=None):
+    profile_cache.invalidate(username)
+    lookup_cache.invalidate(username)
+    if user_id is not None:
+        lookup_cache.invalidate(user_id)
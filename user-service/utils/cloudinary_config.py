@@ -1,9 +1,23 @@
-import cloudinary
 import os
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
\ No newline at end of file
+_configured = False
+
+def get_uploader():
+    """
+    Imports and configures the Cloudinary SDK on first use; it is slow to
+    import and only avatar uploads need it. Without CLOUDINARY_CLOUD_NAME the
+    SDK falls back to CLOUDINARY_URL.
+    """
+    global _configured
+    import cloudinary
+    import cloudinary.uploader
+    if not _configured:
+        if os.getenv("CLOUDINARY_CLOUD_NAME"):
+            cloudinary.config(
+                cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+                api_key=os.getenv("CLOUDINARY_API_KEY"),
+                api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+                secure=True
+            )
+        _configured = True
+    return cloudinary.uploader
@@ -1,31 +1,82 @@
 import smtplib
 import os
+import time
 from email.message import EmailMessage
-from dotenv import load_dotenv
-
-load_dotenv()
+from utils.metrics import outbound_latency
+from utils.tracing import span
 
 GMAIL_USER = os.getenv("GMAIL_USER")
 GMAIL_PASS = os.getenv("GMAIL_PASS")
+MAIL_FROM = os.getenv("MAIL_FROM", GMAIL_USER)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "true").lower() in ("1", "true", "yes")
+# Close pooled connections that sat unused longer than this (Gmail drops them anyway)
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
 
-def send_otp_email(to_email: str, otp_code: str):
-    msg = EmailMessage()
-    msg['Subject'] = 'Your Competa Arena Email Verification Code'
-    msg['From'] = GMAIL_USER
-    msg['To'] = to_email
-    msg.set_content(f'Your OTP code for Competa Arena registration is: {otp_code}\nThis code is valid for 10 minutes.')
+def otp_email(otp_code: str):
+    return (
+        'Your Competa Arena Email Verification Code',
+        f'Your OTP code for Competa Arena registration is: {otp_code}\nThis code is valid for 10 minutes.',
+    )
 
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-        smtp.login(GMAIL_USER, GMAIL_PASS)
-        smtp.send_message(msg)
+def password_reset_email(otp_code: str):
+    return (
+        'Your Competa Arena Password Reset Code',
+        f'Your OTP code for resetting your Competa Arena password is: {otp_code}\nThis code is valid for 10 minutes.',
+    )
 
-def send_password_reset_email(to_email: str, otp_code: str):
+def build_message(to_email: str, subject: str, body: str) -> EmailMessage:
     msg = EmailMessage()
-    msg['Subject'] = 'Your Competa Arena Password Reset Code'
-    msg['From'] = GMAIL_USER
+    msg['Subject'] = subject
+    msg['From'] = MAIL_FROM
     msg['To'] = to_email
-    msg.set_content(f'Your OTP code for resetting your Competa Arena password is: {otp_code}\nThis code is valid for 10 minutes.')
+    msg.set_content(body)
+    return msg
+
+
+class SMTPSession:
+    """
+    A reusable SMTP connection. Each mail worker owns one, so the TLS
+    handshake and login are paid once per connection instead of per message.
+    """
+
+    def __init__(self):
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        if SMTP_SSL:
+            self._smtp = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=30)
+        else:
+            self._smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+        if GMAIL_USER and GMAIL_PASS:
+            self._smtp.login(GMAIL_USER, GMAIL_PASS)
+
+    def send(self, msg: EmailMessage):
+        if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_TIMEOUT:
+            self.close()
+        if self._smtp is None:
+            with span("smtp.connect"), outbound_latency.time("smtp", "connect"):
+                self._connect()
+        try:
+            with span("smtp.send"), outbound_latency.time("smtp", "send"):
+                self._smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Server closed the idle connection on its side; retry once on a fresh one
+            self.close()
+            with span("smtp.connect"), outbound_latency.time("smtp", "connect"):
+                self._connect()
+            with span("smtp.send"), outbound_latency.time("smtp", "send"):
+                self._smtp.send_message(msg)
+        self._last_used = time.monotonic()
 
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-        smtp.login(GMAIL_USER, GMAIL_PASS)
-        smtp.send_message(msg)       
\ No newline at end of file
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._smtp = None
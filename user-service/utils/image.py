@@ -1,12 +1,46 @@
-import cloudinary.uploader
+import io
+import os
+from utils.cloudinary_config import get_uploader
+from utils.metrics import outbound_latency
+from utils.tracing import span
 
 def upload_profile_photo(file, public_id=None):
-    result = cloudinary.uploader.upload(
-        file,
-        folder="competa_arena/profiles",
-        public_id=public_id,  # e.g. f"user_{user_id}"
-        overwrite=True,
-        resource_type="image",
-        transformation=[{"width": 300, "height": 300, "crop": "fill"}]  # optional: resize
-    )
-    return result["secure_url"]
\ No newline at end of file
+    with span("cloudinary.upload"), outbound_latency.time("cloudinary", "upload"):
+        result = get_uploader().upload(
+            file,
+            folder="competa_arena/profiles",
+            public_id=public_id,  # e.g. f"user_{user_id}"
+            overwrite=True,
+            resource_type="image",
+            transformation=[{"width": 300, "height": 300, "crop": "fill"}]  # optional: resize
+        )
+    return result["secure_url"]
+
+AVATAR_SIZE = int(os.getenv("AVATAR_SIZE", "300"))
+AVATAR_FORMAT = os.getenv("AVATAR_FORMAT", "webp").lower()  # webp or jpeg
+AVATAR_QUALITY = int(os.getenv("AVATAR_QUALITY", "85"))
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+# Refuse decompression bombs: a small file that expands to a huge bitmap
+AVATAR_MAX_PIXELS = int(os.getenv("AVATAR_MAX_PIXELS", str(40_000_000)))
+
+def resize_avatar(data: bytes):
+    """
+    Center-crops and resizes an uploaded image to AVATAR_SIZE x AVATAR_SIZE and
+    re-encodes it. CPU bound; call it from a worker thread.
+    Returns (bytes, content_type); raises ValueError for unreadable images.
+    """
+    # Pillow is imported here so only avatar uploads pay for it
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    Image.MAX_IMAGE_PIXELS = AVATAR_MAX_PIXELS
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            img = ImageOps.fit(img.convert("RGB"), (AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(str(e))
+    out = io.BytesIO()
+    if AVATAR_FORMAT == "jpeg":
+        img.save(out, format="JPEG", quality=AVATAR_QUALITY, optimize=True)
+        return out.getvalue(), "image/jpeg"
+    img.save(out, format="WEBP", quality=AVATAR_QUALITY, method=4)
+    return out.getvalue(), "image/webp"
@@ -0,0 +1,87 @@
+"""
+Signing keys for asymmetric access tokens (RS256 / EdDSA).
+
+Keys live as PEM files in JWT_KEYS_DIR, one per key, named `<kid>.pem`.
+The newest kid (or JWT_ACTIVE_KID) signs; every key in the directory stays
+published in the JWKS so tokens signed before a rotation keep verifying.
+
+    python -m utils.jwt_keys generate          # add a key; rotate by restarting
+"""
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", "keys")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+
+
+class KeyRing:
+    def __init__(self, directory: str = JWT_KEYS_DIR, algorithm: str = JWT_ALGORITHM, active_kid: str = JWT_ACTIVE_KID):
+        self.algorithm = algorithm
+        self._private = {}
+        self._public = {}
+        self._jwks = []
+        for path in sorted(Path(directory).glob("*.pem")):
+            kid = path.stem
+            private_key = serialization.load_pem_private_key(path.read_bytes(), password=None)
+            public_key = private_key.public_key()
+            if algorithm == "EdDSA":
+                jwk = OKPAlgorithm.to_jwk(public_key, as_dict=True)
+            else:
+                jwk = RSAAlgorithm.to_jwk(public_key, as_dict=True)
+            jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+            self._private[kid] = private_key
+            self._public[kid] = public_key
+            self._jwks.append(jwk)
+        if not self._private:
+            raise RuntimeError(f"No signing keys in {directory}; run `python -m utils.jwt_keys generate`")
+        self.active_kid = active_kid or max(self._private)
+        if self.active_kid not in self._private:
+            raise RuntimeError(f"JWT_ACTIVE_KID {self.active_kid} not found in {directory}")
+
+    def signing_key(self):
+        return self.active_kid, self._private[self.active_kid]
+
+    def public_key(self, kid: str):
+        return self._public.get(kid)
+
+    def jwks(self) -> dict:
+        return {"keys": self._jwks}
+
+
+_keyring = None
+
+def get_keyring() -> KeyRing:
+    global _keyring
+    if _keyring is None:
+        _keyring = KeyRing()
+    return _keyring
+
+
+def generate_key(directory: str = JWT_KEYS_DIR, algorithm: str = JWT_ALGORITHM) -> str:
+    if algorithm == "EdDSA":
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    kid = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    path = Path(directory) / f"{kid}.pem"
+    path.write_bytes(private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ))
+    os.chmod(path, 0o600)
+    return kid
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["generate"]:
+        print(generate_key())
+    else:
+        print("usage: python -m utils.jwt_keys generate")
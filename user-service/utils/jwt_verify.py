@@ -0,0 +1,60 @@
+"""
+Local verification of user-service access tokens for other (Python) services.
+
+    verifier = JWKSVerifier("http://user-services:8000/.well-known/jwks.json")
+    claims = verifier.verify(token)   # None if invalid
+
+Parsed keys are cached by kid; the JWKS is only re-fetched when it expires
+or a token shows up with a kid we have not seen (a rotation), at most once
+per `min_refresh_interval`.
+"""
+import json
+import threading
+import time
+import urllib.request
+from typing import Optional
+import jwt
+
+
+class JWKSVerifier:
+    def __init__(self, jwks_url: str, ttl: float = 300, min_refresh_interval: float = 30, leeway: float = 0):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.leeway = leeway
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self):
+        with urllib.request.urlopen(self.jwks_url, timeout=5) as resp:
+            data = json.loads(resp.read())
+        # PyJWK parses the key material once; verification reuses the key object
+        self._keys = {k["kid"]: jwt.PyJWK(k) for k in data.get("keys", []) if "kid" in k}
+        self._fetched_at = time.monotonic()
+
+    def _key(self, kid: str):
+        now = time.monotonic()
+        key = self._keys.get(kid)
+        if key is not None and now - self._fetched_at < self.ttl:
+            return key
+        with self._lock:
+            key = self._keys.get(kid)
+            stale = now - self._fetched_at >= self.ttl
+            if (key is None or stale) and now - self._fetched_at >= self.min_refresh_interval:
+                self._fetch()
+                key = self._keys.get(kid)
+        return key
+
+    def verify(self, token: str) -> Optional[dict]:
+        try:
+            header = jwt.get_unverified_header(token)
+            key = self._key(header.get("kid"))
+            if key is None:
+                return None
+            payload = jwt.decode(token, key.key, algorithms=[key.algorithm_name], leeway=self.leeway)
+        except (jwt.PyJWTError, OSError, ValueError):
+            return None
+        if payload.get("type") != "access":
+            return None
+        return payload
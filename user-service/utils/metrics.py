@@ -0,0 +1,344 @@
+"""
+Prometheus metrics, served as text at GET /metrics.
+
+Request rate and latency come from MetricsMiddleware, labelled with the
+route template (e.g. /api/auth/{username}) so label sets stay bounded.
+Stage timings (bcrypt, SMTP, Cloudinary, DB pool checkouts) are observed
+where the work happens. Values that already exist elsewhere, such as pool
+occupancy, threadpool depth and cache hit counters, are read when the
+metrics are collected.
+
+Several workers: with METRICS_MULTIPROC_DIR set, every worker writes a
+snapshot of its metrics there every METRICS_FLUSH_SECONDS and on shutdown.
+Whichever worker answers a scrape merges the snapshots:
+- counters and histograms are summed, including those of workers that have
+  exited, so totals never go backwards
+- gauges are summed over live workers only
+Empty the directory when the service is redeployed.
+"""
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+
+class Metric:
+    """One metric family; values are keyed by the tuple of label values."""
+
+    def __init__(self, name: str, help: str, kind: str, labels=(), buckets=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets else None
+        self.values = {}
+        # Observed from threadpool threads too (SMTP, Cloudinary)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set(self, *labels, value: float):
+        self.values[labels] = value
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            state = self.values.get(labels)
+            if state is None:
+                # One count per bucket (non-cumulative), then sum and count
+                state = self.values[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = [[list(k), list(v) if isinstance(v, list) else v] for k, v in self.values.items()]
+        return {"help": self.help, "kind": self.kind, "labels": list(self.labels),
+                "buckets": list(self.buckets) if self.buckets else None, "values": values}
+
+
+class _Timer:
+    __slots__ = ("metric", "labels", "start")
+
+    def __init__(self, metric: Metric, labels):
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metric.observe(*self.labels, value=time.perf_counter() - self.start)
+        return False
+
+
+_registry = {}
+
+
+def _metric(name, help, kind, labels=(), buckets=None) -> Metric:
+    metric = _registry[name] = Metric(name, help, kind, labels, buckets)
+    return metric
+
+
+http_requests = _metric("http_requests_total", "HTTP requests by route template and status.", "counter", ("method", "route", "status"))
+http_latency = _metric("http_request_duration_seconds", "HTTP request latency by route template.", "histogram", ("method", "route"), LATENCY_BUCKETS)
+http_in_flight = _metric("http_requests_in_flight", "HTTP requests being served.", "gauge")
+http_queries = _metric("http_request_queries", "SQL statements executed per HTTP request.", "histogram", ("method", "route"), QUERY_BUCKETS)
+db_pool_size = _metric("db_pool_size", "Connections the pool keeps open.", "gauge")
+db_pool_checked_out = _metric("db_pool_checked_out", "Connections currently checked out of the pool.", "gauge")
+db_pool_overflow = _metric("db_pool_overflow", "Connections open above the pool size.", "gauge")
+db_pool_wait = _metric("db_pool_checkout_seconds", "Time to get a connection from the pool (waiting and connecting).", "histogram", (), LATENCY_BUCKETS)
+threadpool_busy = _metric("threadpool_busy_threads", "Threadpool threads running sync work.", "gauge")
+threadpool_waiting = _metric("threadpool_queued_tasks", "Sync calls waiting for a free threadpool thread.", "gauge")
+threadpool_size = _metric("threadpool_size", "Threadpool thread limit.", "gauge")
+password_pending = _metric("bcrypt_pending", "bcrypt calls queued or running in the password pool.", "gauge")
+bcrypt_latency = _metric("bcrypt_duration_seconds", "bcrypt hash/verify calls, including time queued for the pool.", "histogram", ("op",),
+                         (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0))
+outbound_latency = _metric("outbound_request_duration_seconds", "Calls to external services (SMTP, Cloudinary).", "histogram", ("service", "op"), LATENCY_BUCKETS)
+cache_hits = _metric("cache_hits_total", "In-process cache hits.", "counter", ("cache",))
+cache_misses = _metric("cache_misses_total", "In-process cache misses.", "counter", ("cache",))
+
+_queries = ContextVar("queries", default=None)
+
+
+def register_engine(engine):
+    """Counts statements per request and reports the engine's pool occupancy."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter = _queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    def _collect_pool():
+        pool = sync_engine.pool
+        if not hasattr(pool, "checkedout"):
+            return  # NullPool/StaticPool: nothing to report
+        db_pool_size.set(value=pool.size())
+        db_pool_checked_out.set(value=pool.checkedout())
+        db_pool_overflow.set(value=max(pool.overflow(), 0))
+
+    _collectors.append(_collect_pool)
+
+
+def _collect_threadpool():
+    from anyio.to_thread import current_default_thread_limiter
+    limiter = current_default_thread_limiter()
+    threadpool_busy.set(value=limiter.borrowed_tokens)
+    threadpool_waiting.set(value=limiter.statistics().tasks_waiting)
+    threadpool_size.set(value=limiter.total_tokens)
+
+
+def _collect_caches():
+    from utils.cache import lookup_cache, profile_cache, token_cache
+    from services.user_stats import stats_cache
+    for name, cache in (("token", token_cache), ("profile", profile_cache), ("lookup", lookup_cache), ("stats", stats_cache)):
+        cache_hits.set(name, value=cache.hits)
+        cache_misses.set(name, value=cache.misses)
+
+
+def _collect_password_pool():
+    from utils.password import password_pool_stats
+    password_pending.set(value=password_pool_stats()["pending"])
+
+
+_collectors = [_collect_threadpool, _collect_caches, _collect_password_pool]
+
+
+def snapshot() -> dict:
+    """This worker's metrics, with the read-at-collection values refreshed (call on the event loop)."""
+    for collect in _collectors:
+        try:
+            collect()
+        except Exception as e:
+            print("metrics collection failed:", e)
+    return {name: metric.snapshot() for name, metric in _registry.items()}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(snapshots) -> dict:
+    """Sums per-worker snapshots: (snapshot, alive) pairs."""
+    merged = {}
+    for snap, alive in snapshots:
+        for name, family in snap.items():
+            if family["kind"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, dict(family, values={}))
+            values = target["values"]
+            for labels, value in family["values"]:
+                key = tuple(labels)
+                if isinstance(value, list):
+                    current = values.get(key)
+                    values[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    values[key] = values.get(key, 0) + value
+    return merged
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(families: dict) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        names = family["labels"]
+        items = family["values"].items() if isinstance(family["values"], dict) else ((tuple(k), v) for k, v in family["values"])
+        for labels, value in sorted(items):
+            if family["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            # Observations above the last bound are only in the count
+            for bound, count in zip(list(family["buckets"]) + [float("inf")], value[:-2] + [value[-1] - sum(value[:-2])]):
+                cumulative += count
+                le = 'le="%s"' % _number(float(bound))
+                lines.append(f"{name}_bucket{_labels(names, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(float(value[-2]))}")
+            lines.append(f"{name}_count{_labels(names, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Writes this worker's snapshot to METRICS_MULTIPROC_DIR every `interval` seconds and merges them on scrape."""
+
+    def __init__(self, directory: str = METRICS_MULTIPROC_DIR, interval: float = METRICS_FLUSH_SECONDS):
+        self.directory = directory
+        self.interval = interval
+        self._task = None
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def write(self, snap: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snap, f)
+        os.replace(tmp, path)
+
+    def _read_others(self):
+        own = self._path(os.getpid())
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            if path == own:
+                continue
+            try:
+                pid = int(os.path.basename(path)[len("metrics-"):-len(".json")])
+                with open(path) as f:
+                    yield json.load(f), _alive(pid)
+            except (ValueError, OSError):
+                # Half-written by a worker that died mid-write, or removed meanwhile
+                continue
+
+    def scrape(self) -> str:
+        snap = snapshot()
+        if not self.directory:
+            return render(snap)
+        self.write(snap)
+        return render(_merge([(snap, True), *self._read_others()]))
+
+    async def start(self):
+        if self.directory:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            # Counters of an exiting worker still count towards the totals
+            self.write(snapshot())
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.write(snapshot())
+            except Exception as e:
+                print("metrics snapshot failed:", e)
+
+
+metrics_exporter = MetricsExporter()
+
+
+class MetricsMiddleware:
+    """Pure ASGI: request count, latency, in-flight requests and SQL statements per request, by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_counted(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = [0]
+        token = _queries.set(queries)
+        http_in_flight.inc(amount=1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.inc(amount=-1)
+            _queries.reset(token)
+            route = scope.get("route")
+            # Unmatched paths are not used as labels: scanners would blow up the series count
+            template = route.path if route is not None and hasattr(route, "path") else "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, template, str(status))
+            http_latency.observe(method, template, value=elapsed)
+            http_queries.observe(method, template, value=queries[0])
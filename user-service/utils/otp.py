@@ -1,6 +1,5 @@
-import random
+import secrets
 
 def generate_otp():
     """Generate a 6-digit OTP code."""
-    return f"{random.randint(100000, 999999)}"
-
+    return f"{100000 + secrets.randbelow(900000)}"
@@ -1,9 +1,136 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from passlib.context import CryptContext
+from utils.metrics import bcrypt_latency
+from utils.tracing import span
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 0 workers runs hashing on the threadpool instead (handy for local dev)
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", str(max(PASSWORD_POOL_WORKERS, 1) * 8)))
+PASSWORD_POOL_RETRY_AFTER = os.getenv("PASSWORD_POOL_RETRY_AFTER", "2")
+# Never "fork": a forked worker inherits the event loop, DB pool sockets and
+# any locks held by other threads at that moment
+PASSWORD_POOL_START_METHOD = os.getenv("PASSWORD_POOL_START_METHOD", "spawn")
+
+# Hashes made with another cost are reported by needs_update/verify_and_update
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password, hashed_password) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+# Worker-side entry points: run inside the pool and report their own CPU time
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+def _hash_job(password):
+    return _timed(pwd_context.hash, password)
+
+def _verify_job(plain_password, hashed_password):
+    return _timed(pwd_context.verify, plain_password, hashed_password)
+
+def _verify_and_update_job(plain_password, hashed_password):
+    return _timed(pwd_context.verify_and_update, plain_password, hashed_password)
+
+
+_executor = None
+_pending = 0
+_stats = {}
+
+
+def start_password_pool():
+    """Creates the worker pool; called from the app's startup hook."""
+    global _executor
+    if _executor is None and PASSWORD_POOL_WORKERS > 0:
+        _executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_POOL_WORKERS,
+            mp_context=multiprocessing.get_context(PASSWORD_POOL_START_METHOD),
+        )
+
+
+def _get_executor():
+    # Scripts that hash outside the app (benchmarks, tooling) get the pool on first use
+    if _executor is None:
+        start_password_pool()
+    return _executor
+
+
+def _record(op: str, total_ms: float, run_ms: float):
+    s = _stats.setdefault(op, {"count": 0, "total_ms": 0.0, "run_ms": 0.0, "max_ms": 0.0})
+    s["count"] += 1
+    s["total_ms"] += total_ms
+    s["run_ms"] += run_ms
+    s["max_ms"] = max(s["max_ms"], total_ms)
+    bcrypt_latency.observe(op, value=total_ms / 1000)
+
+
+async def _submit(op: str, job, *args):
+    global _pending
+    if _pending >= PASSWORD_POOL_MAX_PENDING:
+        s = _stats.setdefault("rejected", {"count": 0})
+        s["count"] += 1
+        raise HTTPException(503, "Server busy, please retry", headers={"Retry-After": PASSWORD_POOL_RETRY_AFTER})
+    _pending += 1
+    start = time.perf_counter()
+    try:
+        with span(f"bcrypt.{op}"):
+            if PASSWORD_POOL_WORKERS > 0:
+                loop = asyncio.get_running_loop()
+                result, run_ms = await loop.run_in_executor(_get_executor(), job, *args)
+            else:
+                result, run_ms = await run_in_threadpool(job, *args)
+    finally:
+        _pending -= 1
+    _record(op, (time.perf_counter() - start) * 1000, run_ms)
+    return result
+
+
+async def hash_password_async(password: str) -> str:
+    return await _submit("hash", _hash_job, password)
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await _submit("verify", _verify_job, plain_password, hashed_password)
+
+async def verify_and_update_password_async(plain_password, hashed_password):
+    """Returns (verified, new_hash); new_hash is set when the stored hash uses an outdated cost."""
+    return await _submit("verify", _verify_and_update_job, plain_password, hashed_password)
+
+
+def password_pool_stats() -> dict:
+    ops = {}
+    for op, s in _stats.items():
+        if op == "rejected":
+            continue
+        ops[op] = {
+            "count": s["count"],
+            "avg_ms": round(s["total_ms"] / s["count"], 2),
+            "avg_run_ms": round(s["run_ms"] / s["count"], 2),
+            "avg_queue_ms": round((s["total_ms"] - s["run_ms"]) / s["count"], 2),
+            "max_ms": round(s["max_ms"], 2),
+        }
+    return {
+        "workers": PASSWORD_POOL_WORKERS,
+        "max_pending": PASSWORD_POOL_MAX_PENDING,
+        "pending": _pending,
+        "rejected": _stats.get("rejected", {}).get("count", 0),
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "ops": ops,
+    }
+
+
+def shutdown_password_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,62 @@
+"""
+Fast JSON path for hot responses.
+
+Handlers that return FastJSONResponse skip FastAPI's response_model round
+trip (build the model, validate it again, dump to JSON-able Python,
+json.dumps). The response_model stays on the route for the OpenAPI schema.
+Rows and ORM objects are read through an attrgetter over the schema's
+fields (compiled once at import) and encoded by orjson, which handles enums
+and datetimes natively; the output matches the response_model JSON.
+"""
+from operator import attrgetter
+import orjson
+from fastapi.responses import Response
+from schemas.user_schemas import PublicUserProfile, UserDetail
+
+PUBLIC_PROFILE_FIELDS = tuple(PublicUserProfile.model_fields)
+_public_profile_values = attrgetter(*PUBLIC_PROFILE_FIELDS)
+USER_DETAIL_FIELDS = tuple(UserDetail.model_fields)
+_user_detail_values = attrgetter(*USER_DETAIL_FIELDS)
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson; pre-encoded bytes pass through untouched."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return orjson.dumps(content)
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def public_profile_rows(rows) -> list:
+    """Rows carrying the PublicUserProfile columns (extra columns ignored) as plain dicts."""
+    return [dict(zip(PUBLIC_PROFILE_FIELDS, _public_profile_values(r))) for r in rows]
+
+
+def dump_user_page(rows, next_cursor) -> bytes:
+    """A UserPage body straight from query rows."""
+    return orjson.dumps({"items": public_profile_rows(rows), "next_cursor": next_cursor})
+
+
+def dump_user_detail(user) -> bytes:
+    # Re-validating a loaded User (TypeAdapter, from_attributes) costs ~10x more and checks nothing new
+    return orjson.dumps(dict(zip(USER_DETAIL_FIELDS, _user_detail_values(user))))
+
+
+def dump_columnar(fields, rows, extra: dict) -> bytes:
+    """{"<field>": [one value per row], ...} plus `extra`: field names are sent once, not per row."""
+    columns = dict(zip(fields, map(list, zip(*rows)))) if rows else {f: [] for f in fields}
+    columns.update(extra)
+    return orjson.dumps(columns)
+
+
+def dump_ndjson(fields, rows, trailer: dict) -> bytes:
+    """One object per row, then `trailer` as the last line."""
+    lines = [orjson.dumps(dict(zip(fields, r)), option=orjson.OPT_APPEND_NEWLINE) for r in rows]
+    lines.append(orjson.dumps(trailer, option=orjson.OPT_APPEND_NEWLINE))
+    return b"".join(lines)
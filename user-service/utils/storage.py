@@ -0,0 +1,58 @@
+import os
+import io
+from pathlib import Path
+from utils.cloudinary_config import get_uploader
+from utils.metrics import outbound_latency
+from utils.tracing import span
+
+# "cloudinary" in production, "local" for tests and offline development
+AVATAR_STORAGE = os.getenv("AVATAR_STORAGE", "cloudinary")
+AVATAR_LOCAL_DIR = os.getenv("AVATAR_LOCAL_DIR", "static/avatars")
+AVATAR_LOCAL_BASE_URL = os.getenv("AVATAR_LOCAL_BASE_URL", "/static/avatars")
+
+
+class CloudinaryStorage:
+    def save(self, data: bytes, key: str, content_type: str) -> str:
+        with span("cloudinary.upload"), outbound_latency.time("cloudinary", "upload"):
+            result = get_uploader().upload(
+                io.BytesIO(data),
+                folder="competa_arena/profiles",
+                public_id=key,
+                overwrite=True,
+                resource_type="image",
+            )
+        return result["secure_url"]
+
+
+class LocalStorage:
+    def __init__(self, directory: str = AVATAR_LOCAL_DIR, base_url: str = AVATAR_LOCAL_BASE_URL):
+        self.directory = Path(directory)
+        self.base_url = base_url.rstrip("/")
+
+    def save(self, data: bytes, key: str, content_type: str) -> str:
+        ext = content_type.split("/")[-1]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filename = f"{key}.{ext}"
+        tmp = self.directory / f".{filename}.tmp"
+        tmp.write_bytes(data)
+        tmp.replace(self.directory / filename)
+        return f"{self.base_url}/{filename}"
+
+
+_backends = {
+    "cloudinary": CloudinaryStorage,
+    "local": LocalStorage,
+}
+
+_storage = None
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = _backends[AVATAR_STORAGE]()
+    return _storage
+
+def set_storage(storage):
+    """Swap the backend (e.g. a LocalStorage pointed at a temp dir in tests)."""
+    global _storage
+    _storage = storage
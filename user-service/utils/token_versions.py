@@ -0,0 +1,73 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from sqlmodel import select
+from config.db import async_session_maker
+from models.users import User
+
+TOKEN_VERSION_REFRESH_SECONDS = float(os.getenv("TOKEN_VERSION_REFRESH_SECONDS", "2"))
+# Re-read a little before the watermark so rows written by hosts with a
+# slightly different clock are not missed
+TOKEN_VERSION_OVERLAP_SECONDS = float(os.getenv("TOKEN_VERSION_OVERLAP_SECONDS", "5"))
+
+
+class TokenVersionMap:
+    """
+    In-memory copy of users.token_version for users whose version was ever
+    bumped (everyone else is implicitly at 0). Refreshed incrementally on
+    updated_at, so staleness across workers is bounded by the refresh interval;
+    changes made by this process are applied immediately via note().
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._watermark = None
+        self._task = None
+
+    def current(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def is_current(self, user_id: int, token_version: int) -> bool:
+        return token_version >= self._versions.get(user_id, 0)
+
+    def note(self, user_id: int, version: int):
+        if version > self._versions.get(user_id, 0):
+            self._versions[user_id] = version
+
+    async def refresh(self):
+        stmt = select(User.id, User.token_version, User.updated_at)
+        if self._watermark is None:
+            # First load: only users that were ever bumped
+            watermark = datetime.utcnow()
+            stmt = stmt.where(User.token_version > 0)
+        else:
+            watermark = self._watermark
+            stmt = stmt.where(User.updated_at >= self._watermark - timedelta(seconds=TOKEN_VERSION_OVERLAP_SECONDS))
+        async with async_session_maker() as db:
+            rows = (await db.exec(stmt)).all()
+        for user_id, version, updated_at in rows:
+            if version:
+                self.note(user_id, version)
+            if updated_at > watermark:
+                watermark = updated_at
+        self._watermark = watermark
+
+    async def start(self):
+        await self.refresh()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(TOKEN_VERSION_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print("Token version refresh failed:", e)
+
+
+token_versions = TokenVersionMap()
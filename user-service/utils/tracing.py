@@ -0,0 +1,340 @@
+"""
+Per-request tracing spans, a slow-request log and an on-demand sampling
+profiler.
+
+TracingMiddleware opens a Trace for each request when TRACE_ENABLED is set,
+or when the profiler picks the request. The expensive stages wrap
+themselves in span():
+
+- bcrypt: utils/password.py
+- SQL statements: engine events, see instrument_engine()
+- SMTP: utils/email.py
+- Cloudinary uploads: utils/storage.py and utils/image.py
+- JWT signing and verification: utils/auth.py
+
+With no trace in the current context, span() returns a shared no-op, so
+each stage pays one ContextVar lookup when tracing is off.
+
+Traces slower than TRACE_SLOW_MS are printed with their span breakdown and
+kept for GET /api/admin/traces/slow.
+
+The profiler is switched on with POST /api/admin/profiler. A background
+thread samples the requests it picked every `interval_ms`. If the request
+holds the event loop, it records the frames that are running; otherwise it
+records the await chain the request is suspended on. Samples are kept as
+collapsed stacks ("outer;inner;leaf" -> count), which flamegraph.pl and
+speedscope read directly. All of this state is per worker process.
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "false").lower() in ("1", "true", "yes")
+# 0 turns the slow-request log off
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "500"))
+TRACE_SLOW_KEEP = int(os.getenv("TRACE_SLOW_KEEP", "100"))
+# Long-polls and streams are slow on purpose, and would collect spans for as
+# long as the connection stays open: they are never traced (nor are requests
+# that accept text/event-stream)
+TRACE_IGNORE = tuple(p for p in os.getenv("TRACE_IGNORE", "/api/internal/events,/api/admin/users/export").split(",") if p)
+# Spans kept per trace; later ones are only counted
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "1000"))
+PROFILER_KEEP = int(os.getenv("PROFILER_KEEP", "50"))
+PROFILER_MAX_DEPTH = 64
+
+_current = ContextVar("trace", default=None)
+
+
+class Trace:
+    __slots__ = ("name", "start", "spans", "dropped", "duration_ms", "status", "samples")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+        self.dropped = 0
+        self.duration_ms = None
+        self.status = None
+        self.samples = None
+
+    def add(self, name: str, start: float, end: float):
+        # list.append is atomic: spans may also end on threadpool threads (the
+        # cap may then be overshot by a span or two, which is harmless)
+        if len(self.spans) >= TRACE_MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append((name, start, end))
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+
+    def breakdown(self) -> dict:
+        """{span name: {count, ms}}, slowest stage first."""
+        totals = {}
+        for name, start, end in self.spans:
+            count, ms = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, ms + (end - start) * 1000)
+        return {
+            name: {"count": count, "ms": round(ms, 2)}
+            for name, (count, ms) in sorted(totals.items(), key=lambda item: -item[1][1])
+        }
+
+    def to_dict(self) -> dict:
+        spans = self.breakdown()
+        accounted = sum(s["ms"] for s in spans.values())
+        return {
+            "name": self.name,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms or 0.0, 2),
+            "spans": spans,
+            # Includes the time of dropped spans
+            "unaccounted_ms": round(max((self.duration_ms or 0.0) - accounted, 0.0), 2),
+            "dropped_spans": self.dropped,
+            "timeline": [
+                [name, round((start - self.start) * 1000, 2), round((end - start) * 1000, 2)]
+                for name, start, end in self.spans
+            ],
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str):
+    """Times the `with` block as stage `name` of the current trace, if there is one."""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+slow_traces = deque(maxlen=TRACE_SLOW_KEEP)
+
+
+def _finish(trace: Trace):
+    if not TRACE_SLOW_MS or trace.duration_ms < TRACE_SLOW_MS:
+        return
+    slow_traces.append(trace.to_dict())
+    stages = ", ".join(f"{name} {s['ms']} ms x{s['count']}" for name, s in trace.breakdown().items())
+    status = f" -> {trace.status}" if trace.status is not None else ""
+    dropped = f", {trace.dropped} more spans dropped" if trace.dropped else ""
+    print(f"slow {trace.name}{status}: {trace.duration_ms:.1f} ms ({stages or 'no spans'}{dropped})")
+
+
+@contextmanager
+def traced(name: str):
+    """Traces a unit of background work (e.g. a mail batch) like a request, when TRACE_ENABLED."""
+    if not TRACE_ENABLED:
+        yield None
+        return
+    trace = Trace(name)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+        trace.finish()
+        _finish(trace)
+
+
+def instrument_engine(engine):
+    """Records every SQL statement run inside a trace as a "db" span."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("trace_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        trace = _current.get()
+        starts = conn.info.get("trace_query_start")
+        if trace is not None and starts:
+            trace.add("db", starts.pop(), time.perf_counter())
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _running_stack(frame, root):
+    """The thread's frames from `root` inward, or None if `root` is not on the thread's stack."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        if frame is root:
+            return frames[::-1]
+        frame = frame.f_back
+    return None
+
+
+def _awaiting_stack(task, root):
+    """The suspended await chain of `task` from `root` inward."""
+    frames = []
+    awaitable = task.get_coro()
+    while awaitable is not None and len(frames) < PROFILER_MAX_DEPTH * 4:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "ag_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            break
+        if frame is root or frames:
+            frames.append(frame)
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return frames or None
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampler for a fraction (`sample_rate`) of requests, one stack
+    per profiled request every `interval_ms`. Keeps the last PROFILER_KEEP
+    profiled requests.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.interval = 0.005
+        self.samples_taken = 0
+        self._active = {}
+        self._done = deque(maxlen=PROFILER_KEEP)
+        self._thread = None
+
+    def configure(self, enabled: bool, sample_rate: float = None, interval_ms: float = None):
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if interval_ms is not None:
+            self.interval = interval_ms / 1000
+        self.enabled = enabled
+        if enabled and (self._thread is None or not self._thread.is_alive()):
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def pick(self) -> bool:
+        return self.enabled and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def begin(self, trace: Trace, root):
+        """Starts sampling the current task from frame `root` (the middleware's own) inward."""
+        trace.samples = Counter()
+        self._active[trace] = (root, threading.get_ident(), asyncio.current_task())
+
+    def end(self, trace: Trace):
+        if self._active.pop(trace, None) is not None:
+            self._done.append(trace)
+
+    def _sample(self):
+        frames = sys._current_frames()
+        for trace, (root, thread_id, task) in list(self._active.items()):
+            try:
+                stack = _running_stack(frames.get(thread_id), root)
+                if stack is None and task is not None:
+                    stack = _awaiting_stack(task, root)
+            except Exception:
+                # The loop thread may be rewiring the chain we are reading
+                continue
+            if stack:
+                trace.samples[";".join(_label(f) for f in stack[:PROFILER_MAX_DEPTH])] += 1
+        self.samples_taken += 1
+
+    def _run(self):
+        while self.enabled:
+            time.sleep(self.interval)
+            if self._active:
+                self._sample()
+
+    def report(self, last: int = None) -> dict:
+        traces = list(self._done)[-last:] if last else list(self._done)
+        stacks = Counter()
+        for trace in traces:
+            stacks.update(trace.samples)
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "interval_ms": round(self.interval * 1000, 3),
+            "samples_taken": self.samples_taken,
+            "requests": [dict(trace.to_dict(), samples=sum(trace.samples.values())) for trace in traces],
+            "stacks": dict(stacks.most_common()),
+        }
+
+    def collapsed(self, last: int = None) -> str:
+        """The report's stacks in flamegraph.pl's input format."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.report(last)["stacks"].items())
+
+
+profiler = SamplingProfiler()
+
+
+def _untraced(scope) -> bool:
+    if scope["path"].startswith(TRACE_IGNORE):
+        return True
+    return any(name == b"accept" and b"text/event-stream" in value for name, value in scope["headers"])
+
+
+class TracingMiddleware:
+    """Pure ASGI, so a request that is neither traced nor profiled costs two attribute checks."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (TRACE_ENABLED or profiler.enabled) or _untraced(scope):
+            return await self.app(scope, receive, send)
+        profiled = profiler.pick()
+        if not (TRACE_ENABLED or profiled):
+            return await self.app(scope, receive, send)
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+            await send(message)
+
+        token = _current.set(trace)
+        if profiled:
+            profiler.begin(trace, sys._getframe())
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            trace.finish()
+            _current.reset(token)
+            if profiled:
+                profiler.end(trace)
+            # Group by route template rather than by concrete path
+            route = scope.get("route")
+            if route is not None and hasattr(route, "path"):
+                trace.name = f"{scope['method']} {route.path}"
+            _finish(trace)